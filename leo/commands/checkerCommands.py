@@ -17,6 +17,7 @@ try:
 except ImportError:
     pyflakes = None
 # import os
+import re
 import shlex
 # import subprocess
 import sys
@@ -230,13 +231,28 @@ class Flake8Command:
                 parse_argv=False,
                 config_file=config_file,
             )
-            report = style.check_files(paths=paths)
+            # Check each file separately, skipping unchanged clean files.
+            # flake8 prints messages as it goes, so only clean results are cached.
+            cacher = g.app.lint_cacher
+            config = g.readFileIntoEncodedString(config_file)
+            version = getattr(flake8, '__version__', '')
+            report = style.options.report
+            report.start()
+            for path in paths:
+                contents = g.readFileIntoEncodedString(path)
+                if cacher.get('flake8', version, config, contents) == 0:
+                    continue
+                if style.input_file(path) == 0:
+                    cacher.put('flake8', version, config, contents, 0)
+            report.stop()
             # Set statistics here, instead of from the command line.
             options = style.options
             options.statistics = True
             options.total_errors = True
             # options.benchmark = True
             main.print_report(report, style)
+            if 'cache' in g.app.debug:
+                g.es_print(cacher.stats())
     #@+node:ekr.20160517133049.3: *3* flake8.find
     def find(self, p):
         '''Return True and add p's path to self.seen if p is a Python @<file> node.'''
@@ -341,6 +357,16 @@ class PyflakesCommand:
                     g.es(s)
             else:
                 g.es(s)
+    #@+node:ekr.20190801064417.7: *3* class RecordingStream
+    class RecordingStream:
+
+        '''A stream that records pyflakes output for g.app.lint_cacher.'''
+
+        def __init__(self):
+            self.lines = []
+
+        def write(self, s):
+            self.lines.append(s)
     #@+node:ekr.20160516072613.6: *3* pyflakes.check_all
     def check_all(self, log_flag, paths, pyflakes_errors_only, roots=None):
         '''Run pyflakes on all files in paths.'''
@@ -348,6 +374,8 @@ class PyflakesCommand:
             from pyflakes import api, reporter
         except Exception: # ModuleNotFoundError
             return True # Pretend all is fine.
+        cacher = g.app.lint_cacher
+        version = getattr(pyflakes, '__version__', '')
         total_errors = 0
         # pylint: disable=cell-var-from-loop
         for fn_n, fn in enumerate(sorted(paths)):
@@ -357,12 +385,21 @@ class PyflakesCommand:
             if s and s.strip():
                 if not pyflakes_errors_only:
                     g.es('Pyflakes: %s' % sfn)
+                # Pyflakes messages contain sfn, so sfn is part of the key.
+                cached = cacher.get('pyflakes', version, sfn, s)
+                if cached is None:
+                    recorder = self.RecordingStream()
+                    r = reporter.Reporter(
+                        errorStream=recorder,
+                        warningStream=recorder,
+                    )
+                    cached = api.check(s, sfn, r), recorder.lines
+                    cacher.put('pyflakes', version, sfn, s, cached)
                 # Send all output to the log pane.
-                r = reporter.Reporter(
-                    errorStream=self.LogStream(fn_n, roots),
-                    warningStream=self.LogStream(fn_n, roots),
-                )
-                errors = api.check(s, sfn, r)
+                errors, lines = cached
+                stream = self.LogStream(fn_n, roots)
+                for line in lines:
+                    stream.write(line)
                 total_errors += errors
         return total_errors
     #@+node:ekr.20171228013625.1: *3* pyflakes.check_script
@@ -424,6 +461,8 @@ class PyflakesCommand:
                     len(paths), g.plural(paths), g.timeSince(t1)))
             elif not pyflakes_errors_only:
                 g.es('OK: pyflakes')
+            if 'cache' in g.app.debug:
+                g.es_print(g.app.lint_cacher.stats())
             ok = total_errors == 0
         else:
             ok = True
@@ -525,6 +564,18 @@ class PylintCommand:
     def run_pylint(self, fn, p):
         '''Run pylint on fn with the given pylint configuration file.'''
         c, rc_fn = self.c, self.rc_fn
+        #
+        # Use the cached report if fn, the rc file and pylint are unchanged.
+        cacher = g.app.lint_cacher
+        key = self.get_cache_key(fn)
+        lines = cacher.get(*key)
+        if lines is not None:
+            self.put_cached_report(fn, p, lines)
+            return
+
+        def on_end(lines, key=key):
+            cacher.put(*key, lines)
+
         #
         # Invoke pylint directly.
         is_win = sys.platform.startswith('win')
@@ -543,6 +594,7 @@ class PylintCommand:
             kind='pylint',
             link_pattern = self.regex,
             link_root = p,
+            on_end = on_end,
         )
         
         # Old code: Invoke g.run_pylint.
@@ -550,6 +602,31 @@ class PylintCommand:
             # # When shell is True, it's recommended to pass a string, not a sequence.
             # command = '%s -c "import leo.core.leoGlobals as g; g.run_pylint(%s)"' % (
                 # sys.executable, ','.join(args))
+    #@+node:ekr.20190801064417.8: *3* 6. pylint.get_cache_key
+    def get_cache_key(self, fn):
+        '''Return the (tool, version, config, contents) key for fn.'''
+        import pylint
+        version = getattr(pylint, '__version__', '')
+        config = g.readFileIntoEncodedString(self.rc_fn)
+        contents = g.readFileIntoEncodedString(fn)
+        return 'pylint', version, config, contents
+    #@+node:ekr.20190801064417.9: *3* 7. pylint.put_cached_report
+    def put_cached_report(self, fn, p, lines):
+        '''Put a cached pylint report to the log, with clickable links.'''
+        g.es_print('pylint: %s (cached)' % g.shortFileName(fn))
+        pattern = re.compile(self.regex)
+        unl = p.get_UNL(with_proto=True, with_count=True)
+        for s in lines:
+            s = s.rstrip()
+            if not s:
+                continue
+            m = pattern.match(s)
+            if m:
+                g.es_print(s, nodeLink="%s,%d" % (unl, -int(m.group(1))))
+            else:
+                g.es_print(s)
+        if 'cache' in g.app.debug:
+            g.es_print(g.app.lint_cacher.stats())
     #@-others
 #@-others
 #@@language python
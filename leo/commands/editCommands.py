@@ -225,6 +225,7 @@ class EditCommandsClass(BaseEditCommandsClass):
         '''Clear all of Leo's file caches.'''
         g.app.global_cacher.clear()
         g.app.commander_cacher.clear()
+        g.app.lint_cacher.clear()
         
     @cmd('dump-caches')
     def dumpCaches(self, event=None):
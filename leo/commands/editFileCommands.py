@@ -9,6 +9,7 @@ import difflib
 import os
 import leo.core.leoGlobals as g
 import leo.core.leoCommands as leoCommands
+import leo.core.leoCompare as leoCompare
 from leo.commands.baseCommands import BaseEditCommandsClass as BaseEditCommandsClass
 #@-<< imports >>
 
@@ -524,7 +525,7 @@ class GitDiffController:
         s2 = self.get_file_from_branch(branch2, fn)
         lines1 = g.splitLines(s1)
         lines2 = g.splitLines(s2)
-        diff_list = list(difflib.unified_diff(
+        diff_list = list(leoCompare.unified_diff(
             lines1,
             lines2,
             branch1 ,
@@ -610,7 +611,7 @@ class GitDiffController:
         s2 = self.get_file_from_rev(rev2, fn)
         lines1 = g.splitLines(s1)
         lines2 = g.splitLines(s2)
-        diff_list = list(difflib.unified_diff(
+        diff_list = list(leoCompare.unified_diff(
             lines1,
             lines2,
             rev1 or 'uncommitted',
@@ -647,7 +648,7 @@ class GitDiffController:
                 # Organizer node: contains diff
                 organizer = parent.insertAsLastChild()
                 organizer.h = v2.h
-                body = list(difflib.unified_diff(
+                body = list(leoCompare.unified_diff(
                     g.splitLines(v1.b),
                     g.splitLines(v2.b),
                     rev1 or 'uncommitted',
@@ -6,7 +6,12 @@
 
 #@+<< imports >>
 #@+node:ekr.20150514050530.1: ** << imports >> (spellCommands.py)
+import hashlib
+import multiprocessing
+import os
 import re
+import sys
+import time
 import leo.core.leoGlobals as g
 from leo.commands.baseCommands import BaseEditCommandsClass as BaseEditCommandsClass
 try:
@@ -20,6 +25,15 @@ except Exception: # May throw WinError(!)
 def cmd(name):
     '''Command decorator for the SpellCommandsClass class.'''
     return g.new_cmd_decorator(name, ['c', 'spellCommands',])
+
+re_word = re.compile(
+    # Don't include underscores in words. It just complicates things.
+    # [^\W\d_] means any unicode char except underscore or digit.
+    r"[^\W\d_]+(?:['`][^\W\d_]+)?",
+    flags=re.UNICODE)
+re_digit = re.compile(r"\d", flags=re.UNICODE)
+report_check = None
+    # The check_word method used by spell-report's worker processes.
 #@+others
 #@+node:ekr.20180207071908.1: ** class BaseSpellWrapper
 class BaseSpellWrapper:
@@ -61,6 +75,30 @@ class BaseSpellWrapper:
         except Exception:
             g.error('unexpected error creating: %s' % (fn))
             g.es_exception()
+    #@+node:ekr.20190813062512.1: *3* spell.check_word
+    def check_word(self, word):
+        """Return True if the word is properly spelled."""
+        d = self.d
+        if not d:
+            return True
+        if d.check(word):
+            return True
+        # Speed doesn't matter here. The more we find, the more convenient.
+        word = ''.join([i for i in word if not i.isdigit()])
+            # Remove all digits.
+        if d.check(word) or d.check(word.lower()):
+            return True
+        if word.find('_') > -1:
+            # Snake case.
+            words = word.split('_')
+        else:
+            words = g.unCamel(word)
+        if words:
+            for word2 in words:
+                if not d.check(word2) and not d.check(word2.lower()):
+                    return False
+            return True
+        return False
     #@+node:ekr.20180207072351.1: *3* spell.find_user_dict
     def find_user_dict(self):
         '''Return the full path to the local dictionary.'''
@@ -89,39 +127,33 @@ class BaseSpellWrapper:
         Check the word. Return None if the word is properly spelled.
         Otherwise, return a list of alternatives.
         """
-        d = self.d
-        if not d:
-            return None
-        if d.check(word):
+        if self.check_word(word):
             return None
-        # Speed doesn't matter here. The more we find, the more convenient.
         word = ''.join([i for i in word if not i.isdigit()])
             # Remove all digits.
-        if d.check(word) or d.check(word.lower()):
-            return None
-        if word.find('_') > -1:
-            # Snake case.
-            words = word.split('_')
-            for word2 in words:
-                if not d.check(word2) and not d.check(word2.lower()):
-                    return d.suggest(word)
-            return None
-        words = g.unCamel(word)
-        if words:
-            for word2 in words:
-                if not d.check(word2) and not d.check(word2.lower()):
-                    return d.suggest(word)
-            return None
-        return d.suggest(word)
+        return self.d.suggest(word)
     #@-others
 #@+node:ekr.20180207075606.1: ** class DefaultDict (object)
 class DefaultDict:
     '''A class with the same interface as the enchant dict class.'''
     
+    max_distance = 2
+        # The maximum edit distance of suggestions.
+    prefix_length = 5
+        # The length of the word prefixes in the deletion index.
+
     def __init__(self, words=None):
         self.added_words = set()
         self.ignored_words = set()
         self.words = set() if words is None else set(words)
+        self.dict_files = []
+            # The dictionary files from which words were added.
+        self.index = None
+            # The deletion index, created by init_index.
+            # Keys are prefixes with up to max_distance deletions.
+            # Values are lists of prefixes.
+        self.prefixes = None
+            # Keys are word prefixes, values are lists of words.
 
     #@+others
     #@+node:ekr.20180207075740.1: *3* dict.add
@@ -129,12 +161,19 @@ class DefaultDict:
         '''Add a word to the dictionary.'''
         self.words.add(word)
         self.added_words.add(word)
+        if self.index is not None:
+            self.add_to_index(word)
     #@+node:ekr.20180207101513.1: *3* dict.add_words_from_dict
     def add_words_from_dict(self, kind, fn, words):
         '''For use by DefaultWrapper.'''
+        if fn:
+            self.dict_files.append(fn)
         for word in words or []:
             self.words.add(word)
             self.words.add(word.lower())
+        if self.index is not None:
+            self.index = None
+                # Recreate the index when needed.
     #@+node:ekr.20180207075751.1: *3* dict.add_to_session
     def add_to_session(self, word):
 
@@ -148,18 +187,128 @@ class DefaultDict:
         return False
     #@+node:ekr.20180207081634.1: *3* dict.suggest & helpers
     def suggest(self, word):
+        '''
+        Return the sorted list of the dictionary words closest to word,
+        at most max_distance edits away.
+        '''
+        assert word not in self.words, repr(word)
+        if self.index is None:
+            self.init_index()
+        index, prefixes = self.index, self.prefixes
+        best, result, seen = self.max_distance + 1, [], set()
+        # All words within max_distance of word have a prefix that shares
+        # a deletion with word's prefix.
+        for key in self.deletes(word[:self.prefix_length]):
+            for prefix in index.get(key, []):
+                if prefix in seen:
+                    continue
+                seen.add(prefix)
+                for word2 in prefixes.get(prefix, []):
+                    n = self.distance(word, word2, min(best, self.max_distance))
+                    if n < best:
+                        best, result = n, [word2]
+                    elif n == best:
+                        result.append(word2)
+        return sorted(result)
+    #@+node:ekr.20190812090318.1: *4* dict.add_to_index
+    def add_to_index(self, word):
+        '''Add word to the deletion index.'''
+        prefix = word[:self.prefix_length]
+        words = self.prefixes.get(prefix)
+        if words is None:
+            self.prefixes[prefix] = [word]
+            self.index_prefix(prefix)
+        elif word not in words:
+            words.append(word)
+    #@+node:ekr.20190812090318.2: *4* dict.deletes
+    def deletes(self, s):
+        '''Return the set of strings made by deleting up to max_distance characters from s.'''
+        result, edge = {s}, {s}
+        for i in range(self.max_distance):
+            edge = {z[:j] + z[j+1:] for z in edge for j in range(len(z))}
+            result |= edge
+        return result
+    #@+node:ekr.20190812090318.3: *4* dict.distance
+    def distance(self, s1, s2, limit):
+        '''
+        Return the optimal string alignment distance between s1 and s2,
+        or limit + 1 if the distance exceeds limit.
         
-        def known(words):
-            '''Return the words that are in the dictionary.'''
-            return [z for z in list(set(words)) if z in self.words]
+        Transposing adjacent characters counts as one edit.
+        '''
+        n1, n2 = len(s1), len(s2)
+        if abs(n1 - n2) > limit:
+            return limit + 1
+        prev2, prev = None, list(range(n2 + 1))
+        for i in range(1, n1 + 1):
+            ch = s1[i-1]
+            row = [i] + [0] * n2
+            row_min = i
+            for j in range(1, n2 + 1):
+                n = min(prev[j] + 1, row[j-1] + 1, prev[j-1] + (ch != s2[j-1]))
+                if i > 1 and j > 1 and ch == s2[j-2] and s1[i-2] == s2[j-1]:
+                    n = min(n, prev2[j-2] + 1)
+                row[j] = n
+                row_min = min(row_min, n)
+            if row_min > limit:
+                return limit + 1
+            prev2, prev = prev, row
+        return prev[n2] if prev[n2] <= limit else limit + 1
+    #@+node:ekr.20190812090318.4: *4* dict.init_index & helpers
+    def init_index(self):
+        '''
+        Create the deletion index for all words.
+        
+        The index depends only on the word prefixes, so it is cached in
+        g.app.db for the dictionary files used.
+        '''
+        self.prefixes = prefixes = {}
+        for word in self.words:
+            prefix = word[:self.prefix_length]
+            words = prefixes.get(prefix)
+            if words is None:
+                prefixes[prefix] = [word]
+            else:
+                words.append(word)
+        key = self.index_key()
+        data = g.app.db.get('spell-index') if key and g.app.db is not None else None
+        if data and data.get('key') == key:
+            self.index = data.get('index')
+            if 'cache' in g.app.debug:
+                g.trace('loaded spelling index: %s keys' % len(self.index))
+        else:
+            self.index = {}
+        # Index the prefixes that are not yet in the index.
+        n = 0
+        for prefix in prefixes:
+            if prefix not in self.index.get(prefix, []):
+                self.index_prefix(prefix)
+                n += 1
+        if n and key and g.app.db is not None:
+            g.app.db['spell-index'] = {'key': key, 'index': self.index}
+            if 'cache' in g.app.debug:
+                g.trace('saved spelling index: %s new prefixes' % n)
 
-        assert not known([word]), repr(word)
-        suggestions = (
-            known(self.edits1(word)) or
-            known(self.edits2(word))
-            # [word] # Fall back to the unknown word itself.
-        )
-        return suggestions
+    def index_key(self):
+        '''Return the key for the cached index, or None.'''
+        if not self.dict_files:
+            return None
+        key = [self.prefix_length, self.max_distance]
+        for fn in self.dict_files:
+            if not g.os_path_exists(fn):
+                return None
+            key.append((fn, g.os_path_getmtime(fn), os.path.getsize(fn)))
+        return hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+
+    def index_prefix(self, prefix):
+        '''Add the deletions of prefix to the index.'''
+        index = self.index
+        for key in self.deletes(prefix):
+            prefixes = index.get(key)
+            if prefixes is None:
+                index[key] = [prefix]
+            else:
+                prefixes.append(prefix)
     #@+node:ekr.20180207085717.1: *4* dict.edits1 & edits2
     def edits1(self, word):
         "All edits that are one edit away from `word`."
@@ -397,30 +546,11 @@ class EnchantWrapper(BaseSpellWrapper):
         Check the word. Return None if the word is properly spelled.
         Otherwise, return a list of alternatives.
         """
-        d = self.d
-        if not d:
-            return None
-        if d.check(word):
+        if self.check_word(word):
             return None
-        # Speed doesn't matter here. The more we find, the more convenient.
         word = ''.join([i for i in word if not i.isdigit()])
             # Remove all digits.
-        if d.check(word) or d.check(word.lower()):
-            return None
-        if word.find('_') > -1:
-            # Snake case.
-            words = word.split('_')
-            for word2 in words:
-                if not d.check(word2) and not d.check(word2.lower()):
-                    return d.suggest(word)
-            return None
-        words = g.unCamel(word)
-        if words:
-            for word2 in words:
-                if not d.check(word2) and not d.check(word2.lower()):
-                    return d.suggest(word)
-            return None
-        return d.suggest(word)
+        return self.d.suggest(word)
     #@+node:ekr.20180209142310.1: *3* spell.show_info
     def show_info(self):
 
@@ -552,6 +682,152 @@ class SpellCommandsClass(BaseEditCommandsClass):
         # This is not a great idea. There is no indication of focus.
             # if self.handler and self.handler.tab:
                 # self.handler.tab.setFocus()
+    #@+node:ekr.20190813062512.2: *4* spell-report & spell-report-docs
+    @cmd('spell-report')
+    def spellReport(self, event=None):
+        '''
+        Check the spelling of all bodies in the outline and create a
+        "Spelling report" node listing the nodes containing each misspelled word.
+        '''
+        self.report()
+
+    @cmd('spell-report-docs')
+    def spellReportDocs(self, event=None):
+        '''Like spell-report, for the bodies in @rst, @auto-rst, @auto-md and @md trees.'''
+        self.report(docs_only=True)
+    #@+node:ekr.20190813062512.3: *5* spell.report & helpers
+    report_kinds = ('@auto-md', '@auto-rst', '@md', '@rst')
+        # The kinds of trees checked by spell-report-docs.
+    report_parallel_size = 1000000
+        # The total size of the bodies above which worker processes are used.
+
+    def report(self, docs_only=False, sc=None, workers=None):
+        '''
+        Check the spelling of all unique bodies at once and create a report node.
+        
+        sc: the spell controller, if not the Spell tab's controller.
+        workers: the number of worker processes, None for the default.
+        
+        Return the report node, or None.
+        '''
+        t1 = time.time()
+        sc = sc or self.report_controller()
+        if not sc:
+            return None
+        vnodes = self.report_vnodes(docs_only)
+        words = self.find_misspellings(sc, vnodes, workers)
+        n = len(set(v for aList in words.values() for v in aList))
+        g.es_print('%s misspelled word%s in %s of %s node%s in %4.2f sec.' % (
+            len(words), g.plural(len(words)), n, len(vnodes), g.plural(len(vnodes)),
+            time.time() - t1))
+        if not words:
+            return None
+        return self.create_report_node(words, n, len(vnodes))
+    #@+node:ekr.20190813062512.4: *6* spell.create_report_node
+    def create_report_node(self, words, n, n_vnodes):
+        '''
+        Create the report node as the last top-level node.
+        
+        words: a dict whose keys are misspelled words and whose values
+        are lists of the vnodes containing them.
+        '''
+        c, u = self.c, self.c.undoer
+        result = [
+            '@nocolor-node\n',
+            '%s misspelled words in %s of %s nodes\n' % (len(words), n, n_vnodes),
+        ]
+        for word in sorted(words, key=lambda z: (z.lower(), z)):
+            result.append('\n%s\n' % word)
+            for v in words[word]:
+                p = c.vnode2position(v)
+                if p:
+                    result.append('    %s\n' % p.get_UNL(with_file=False, with_index=False))
+        undoType = 'Spell Report'
+        undoData = u.beforeInsertNode(c.p)
+        p = c.lastTopLevel().insertAfter()
+        p.h = 'Spelling report'
+        p.b = ''.join(result)
+        u.afterInsertNode(p, undoType, undoData, dirtyVnodeList=[])
+        c.setChanged(True)
+        c.selectPosition(p)
+        c.redraw()
+        return p
+    #@+node:ekr.20190813062512.5: *6* spell.find_misspellings
+    def find_misspellings(self, sc, vnodes, workers=None):
+        '''
+        Return a dict whose keys are the misspelled words in the bodies of the
+        given vnodes, and whose values are lists of the vnodes containing them.
+        
+        Worker processes check large outlines if the default spell checker is
+        in use and the fork start method is available.
+        '''
+        global report_check
+        items = [(i, v.b) for i, v in enumerate(vnodes)]
+        if workers is None:
+            size = sum(len(s) for i, s in items)
+            workers = (os.cpu_count() or 1) if size > self.report_parallel_size else 1
+        parallel = (
+            workers > 1 and len(items) > 1 and
+            isinstance(sc.d, DefaultDict) and
+            sys.platform != 'darwin' and
+            'fork' in multiprocessing.get_all_start_methods()
+        )
+        if parallel:
+            # The workers inherit report_check, so sc is never pickled.
+            n = max(1, len(items) // (4 * workers))
+            chunks = [items[i: i + n] for i in range(0, len(items), n)]
+            report_check = sc.check_word
+            try:
+                pool = multiprocessing.get_context('fork').Pool(workers)
+                try:
+                    results = []
+                    for aList in pool.map(find_misspellings, chunks):
+                        results.extend(aList)
+                finally:
+                    pool.close()
+                    pool.join()
+            finally:
+                report_check = None
+        else:
+            results = find_misspellings(items, sc.check_word)
+        d = {}
+        for i, words in results:
+            for word in words:
+                d.setdefault(word, []).append(vnodes[i])
+        return d
+    #@+node:ekr.20190813062512.6: *6* spell.report_controller
+    def report_controller(self):
+        '''Return the spell controller for spell-report, or None.'''
+        c = self.c
+        sc = self.handler and getattr(self.handler, 'spellController', None)
+        if sc:
+            return sc
+        if enchant:
+            return EnchantWrapper(c)
+        sc = DefaultWrapper(c)
+        if not sc.main_fn:
+            sc.show_info()
+            return None
+        return sc
+    #@+node:ekr.20190813062512.7: *6* spell.report_vnodes
+    def report_vnodes(self, docs_only):
+        '''Return the list of the unique vnodes to be checked, in outline order.'''
+        c = self.c
+        if not docs_only:
+            return list(c.all_unique_nodes())
+        result, seen = [], set()
+        p = c.rootPosition()
+        while p:
+            words = p.h.split(None, 1)
+            if words and words[0] in self.report_kinds:
+                for p2 in p.self_and_subtree(copy=False):
+                    if p2.v not in seen:
+                        seen.add(p2.v)
+                        result.append(p2.v)
+                p.moveToNodeAfterTree()
+            else:
+                p.moveToThreadNext()
+        return result
     #@+node:ekr.20150514063305.492: *3* as_you_type_* commands
     #@+node:ekr.20150514063305.493: *4* as_you_type_toggle
     @cmd('spell-as-you-type-toggle')
@@ -693,14 +969,12 @@ class SpellTabHandler:
         self.c = c
         self.body = c.frame.body
         self.currentWord = None
-        self.re_word = re.compile(
-            # Don't include underscores in words. It just complicates things.
-            # [^\W\d_] means any unicode char except underscore or digit.
-            r"([^\W\d_]+)(['`][^\W\d_]+)?",
-            flags=re.UNICODE)
+        self.re_word = re_word
         self.outerScrolledFrame = None
         self.seen = set()
             # Adding a word to seen will ignore it until restart.
+        self.checked = set()
+            # The sha1 hashes of bodies known to contain no misspellings.
         self.workCtrl = g.app.gui.plainTextWidget(c.frame.top)
             # A text widget for scanning.
             # Must have a parent frame even though it is not packed.
@@ -797,7 +1071,14 @@ class SpellTabHandler:
                     return
                 self.seen.add(word)
             # No more misspellings in p
+            if ins == 0:
+                # Hash p.b, as below: s may have been stripped.
+                self.checked.add(self.bodyHash(p.b))
             p.moveToThreadNext()
+            # Skip bodies that have already been checked.
+            # Adding words to the dictionary never makes them misspelled.
+            while p and self.bodyHash(p.b) in self.checked:
+                p.moveToThreadNext()
             if p:
                 ins = 0
                 s = p.b
@@ -808,6 +1089,10 @@ class SpellTabHandler:
                 c.invalidateFocus()
                 c.bodyWantsFocus()
                 return
+    #@+node:ekr.20190825062512.9: *5* bodyHash
+    def bodyHash(self, s):
+        '''Return the sha1 hash of s, a body text.'''
+        return hashlib.sha1(g.toEncodedString(s)).hexdigest()
     #@+node:ekr.20160415033936.1: *5* showMisspelled
     def showMisspelled(self, p):
         '''Show the position p, contracting the tree as needed.'''
@@ -868,6 +1153,50 @@ def clean_user_spell_dict(event):
     c = event and event.get('c')
     if c:
         DefaultWrapper(c).save_user_dict(trace=True)
+#@+node:ekr.20190813062512.8: ** find_misspellings
+def find_misspellings(items, check=None):
+    '''
+    Return a list of tuples (i, words) for each tuple (i, s) in items, where
+    words is the sorted list of the misspelled words in s. Each distinct word
+    is checked only once.
+    
+    check: a check_word method. Worker processes use report_check.
+    '''
+    check = check or report_check
+    good, misspelled = set(), set()
+    result = []
+    for i, s in items:
+        bad = set(re_word.findall(s)) - good
+            # Not -=, which would iterate over all good words.
+        if not bad:
+            continue
+        for word in bad - misspelled:
+            if check(word):
+                good.add(word)
+            else:
+                misspelled.add(word)
+        bad &= misspelled
+        if not bad:
+            continue
+        if not re_digit.search(s):
+            # No word can be next to a number.
+            result.append((i, sorted(bad)))
+            continue
+        words = set()
+        for m in re_word.finditer(s):
+            word = m.group(0)
+            if word not in bad:
+                continue
+            # Ignore the word if numbers precede or follow it.
+            k1, k2 = m.start() - 1, m.end()
+            if k1 >= 0 and s[k1].isdigit():
+                continue
+            if k2 < len(s) and s[k2].isdigit():
+                continue
+            words.add(word)
+        if words:
+            result.append((i, sorted(words)))
+    return result
 #@-others
 #@@language python
 #@@tabwidth -4
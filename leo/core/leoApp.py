@@ -7,6 +7,7 @@
 import leo.core.leoGlobals as g
 import leo.core.leoExternalFiles as leoExternalFiles
 import base64
+import bisect
 import importlib
 import io
 StringIO = io.StringIO
@@ -244,6 +245,8 @@ class LeoApp:
             # The singleton IdleTimeManager instance.
         self.ipk = None
             # python kernel instance
+        self.lint_cacher = None
+            # The singleton leoCacher.LintCacher instance.
         self.loadManager = None
             # The singleton LoadManager instance.
         # self.logManager = None
@@ -1136,6 +1139,7 @@ class LeoApp:
         g.app.db = g.app.global_cacher.db
         g.app.commander_cacher = leoCache.CommanderCacher()
         g.app.commander_db = g.app.commander_cacher.db
+        g.app.lint_cacher = leoCache.LintCacher()
     #@+node:ekr.20031218072017.1978: *4* app.setLeoID & helpers
     def setLeoID(self, useDialog=True, verbose=True):
         '''Get g.app.leoID from various sources.'''
@@ -1376,6 +1380,7 @@ class LeoApp:
             g.app.global_cacher.commit_and_close()
             g.app.commander_cacher.commit()
             g.app.commander_cacher.close()
+            g.app.lint_cacher.close()
         if g.app.ipk:
             g.app.ipk.cleanup_consoles()
         g.app.destroyAllOpenWithFiles()
@@ -1766,6 +1771,11 @@ class LoadManager:
             # Dictionary of user options. Keys are option names.
         self.old_argv = []
             # A copy of sys.argv for debugging.
+        self.startup_time = None
+            # The time at which the present startup phase started.
+        self.startup_times = []
+            # A list of (phase, start, end) tuples, reported by
+            # --trace=startup and --startup-report.
         self.more_cmdline_files = False
             # True when more files remain on the command line to be
             # loaded.  If the user is answering "No" to each file as Leo asks
@@ -2313,7 +2323,7 @@ class LoadManager:
         c.openDirectory = frame.openDirectory = g.os_path_dirname(fn)
         g.app.gui = oldGui
         return c if ok else None
-    #@+node:ekr.20120213081706.10382: *4* LM.readGlobalSettingsFiles
+    #@+node:ekr.20120213081706.10382: *4* LM.readGlobalSettingsFiles & helpers
     def readGlobalSettingsFiles(self):
         '''Read leoSettings.leo and myLeoSettings.leo using a null gui.'''
         trace = 'themes' in g.app.debug
@@ -2321,6 +2331,8 @@ class LoadManager:
         # Open the standard settings files with a nullGui.
         # Important: their commanders do not exist outside this method!
         paths = [lm.computeLeoSettingsPath(), lm.computeMyLeoSettingsPath()]
+        if lm.readSettingsSnapshot(paths):
+            return
         old_commanders = g.app.commanders()
         commanders = [lm.openSettingsFile(path) for path in paths]
         commanders = [z for z in commanders if z]
@@ -2363,6 +2375,101 @@ class LoadManager:
         for c in commanders:
             if c not in old_commanders:
                 g.app.forgetOpenFile(c.fileName())
+        lm.writeSettingsSnapshot(paths, theme_path)
+    #@+node:ekr.20190806070245.1: *5* LM.readSettingsSnapshot
+    # These GlobalConfigManager ivars are set when reading global settings files.
+    snapshot_config_ivars = (
+        'context_menus',
+        'enabledPluginsFileName', 'enabledPluginsString',
+        'menusFileName', 'menusList',
+        'modeCommandsDict',
+    )
+
+    def readSettingsSnapshot(self, paths):
+        '''
+        Set the global settings and bindings dicts from the snapshot in
+        g.app.db, if the snapshot is still valid. Return True if so.
+
+        This avoids opening the global settings files in null-gui commanders.
+        '''
+        lm = self
+        if not g.app.db or g.app.trace_binding or g.app.trace_setting:
+            return False
+        trace = 'cache' in g.app.debug or 'startup' in g.app.debug
+        try:
+            d = g.app.db.get('settings-snapshot')
+            env_names = d and d.get('env_names')
+            if not d or d.get('key') != lm.settingsSnapshotKey(paths, env_names):
+                if trace: g.trace('invalid settings snapshot')
+                return False
+            lm.globalSettingsDict = d.get('settings_d')
+            lm.globalBindingsDict = d.get('bindings_d')
+            for ivar, val in d.get('config').items():
+                setattr(g.app.config, ivar, val)
+            # The theme file depends on the settings.
+            theme_path = lm.computeThemeFilePath()
+            if d.get('theme') != lm.settingsSnapshotKey([theme_path], env_names):
+                if trace: g.trace('invalid theme in settings snapshot')
+                lm.globalSettingsDict = lm.globalBindingsDict = None
+                return False
+        except Exception:
+            g.es_exception()
+            lm.globalSettingsDict = lm.globalBindingsDict = None
+            return False
+        if theme_path:
+            g.app.theme_directory = g.os_path_dirname(theme_path)
+        if trace: g.trace('using settings snapshot')
+        return True
+    #@+node:ekr.20190806070245.2: *5* LM.settingsSnapshotKey
+    def settingsSnapshotKey(self, paths, env_names=None):
+        '''
+        Return a key describing Leo's version, the code that parses settings
+        files, and the modification times and sizes of the given paths.
+
+        @ifplatform, @ifhostname and @ifenv nodes depend on the platform,
+        the machine name and the environment variables in env_names, so the
+        key includes them too.
+        '''
+        import leo.core.leoVersion as leoVersion
+        lm = self
+        config_path = g.os_path_finalize_join(g.app.loadDir, 'leoConfig.py')
+        result = [leoVersion.version, sys.platform, lm.computeMachineName()]
+        for name in sorted(env_names or []):
+            result.append((name, os.getenv(name)))
+        for path in [config_path] + paths:
+            if path and g.os_path_exists(path):
+                stat = os.stat(path)
+                result.append((path, stat.st_mtime, stat.st_size))
+            else:
+                result.append((path, None, None))
+        return result
+    #@+node:ekr.20190806070245.3: *5* LM.writeSettingsSnapshot
+    def writeSettingsSnapshot(self, paths, theme_path):
+        '''Save the global settings and bindings dicts in g.app.db.'''
+        lm = self
+        config = g.app.config
+        if not g.app.db or g.app.trace_binding or g.app.trace_setting:
+            return
+        if config.atCommonButtonsList or config.atCommonCommandsList:
+            # These lists contain positions.
+            # Read the settings files every time.
+            g.app.db['settings-snapshot'] = None
+            return
+        # The names of the environment variables used by @ifenv nodes.
+        env_names = sorted(config.ifEnvNames)
+        try:
+            g.app.db['settings-snapshot'] = {
+                'bindings_d': lm.globalBindingsDict,
+                'config': {z: getattr(config, z, None) for z in self.snapshot_config_ivars
+                    if hasattr(config, z)},
+                'env_names': env_names,
+                'key': lm.settingsSnapshotKey(paths, env_names),
+                'settings_d': lm.globalSettingsDict,
+                'theme': lm.settingsSnapshotKey([theme_path], env_names),
+            }
+        except Exception:
+            g.es_exception()
+            g.app.db['settings-snapshot'] = None
     #@+node:ekr.20120214165710.10838: *4* LM.traceSettingsDict
     def traceSettingsDict(self, d, verbose=False):
         if verbose:
@@ -2390,6 +2497,7 @@ class LoadManager:
         '''Load the indicated file'''
         lm = self
         t1 = time.clock()
+        lm.startup_time = time.perf_counter()
         # Phase 1: before loading plugins.
         # Scan options, set directories and read settings.
         print('') # Give some separation for the coming traces.
@@ -2411,14 +2519,17 @@ class LoadManager:
         if g.app.killed:
             return
         g.app.idleTimeManager.start()
+        lm.endStartupPhase('load plugins')
         #
         # Phase 3: after loading plugins. Create one or more frames.
         if lm.options.get('script') and not self.files:
             ok = True
         else:
             ok = lm.doPostPluginsInit()
+            lm.endStartupPhase('finish open')
             # Fix #579: Key bindings don't take for commands defined in plugins
             g.app.makeAllBindings()
+            lm.endStartupPhase('make bindings')
             if ok and g.app.diff:
                 lm.doDiff()
         if not ok:
@@ -2429,9 +2540,86 @@ class LoadManager:
         if 'startup' in g.app.debug:
             t2 = time.clock()
             g.es_print('startup time: %5.2f sec' % (t2-t1))
+            lm.printStartupTimes()
+        if lm.options.get('startup_report'):
+            lm.writeStartupReport(lm.options.get('startup_report'))
         g.app.gui.runMainLoop()
         # For scripts, the gui is a nullGui.
         # and the gui.setScript has already been called.
+    #@+node:ekr.20190806070245.4: *4* LM.endStartupPhase & printStartupTimes
+    def endStartupPhase(self, phase):
+        '''Record the time taken by the startup phase that has just ended.'''
+        t = time.perf_counter()
+        if self.startup_time is not None:
+            self.startup_times.append((phase, self.startup_time, t))
+        self.startup_time = t
+
+    def printStartupTimes(self):
+        '''Print the times recorded by lm.endStartupPhase.'''
+        for phase, start, end in self.startup_times:
+            g.es_print('%20s: %5.2f sec' % (phase, end - start))
+    #@+node:ekr.20190808062731.7: *4* LM.computeStartupReport & writeStartupReport
+    def computeStartupReport(self, timer):
+        '''
+        Return a dict describing the startup phases and the modules imported
+        during each phase. timer is a leoImportTimes.ImportTimer or None.
+
+        Modules imported before lm.load starts belong to the 'import leo'
+        phase. Modules imported after startup belong to the 'after startup'
+        phase. All times are in seconds.
+        '''
+        phases = [('import leo', timer.start_time if timer else None, None)]
+        if self.startup_times:
+            phases[0] = ('import leo', phases[0][1], self.startup_times[0][1])
+        phases.extend(self.startup_times)
+        ends = [end for phase, start, end in phases if end is not None]
+        d = {}
+        modules = []
+        for name, start, self_time, cumulative in (timer.modules if timer else []):
+            n = bisect.bisect_left(ends, start)
+            phase = phases[n][0] if n < len(phases) else 'after startup'
+            modules.append({
+                'module': name,
+                'phase': phase,
+                'self': round(self_time, 6),
+                'cumulative': round(cumulative, 6),
+            })
+            n_imports, t = d.get(phase, (0, 0.0))
+            d[phase] = n_imports + 1, t + self_time
+        result = []
+        for phase, start, end in phases:
+            n_imports, t = d.get(phase, (0, 0.0))
+            result.append({
+                'phase': phase,
+                'seconds': None if start is None or end is None else round(end - start, 6),
+                'imports': n_imports,
+                'import_seconds': round(t, 6),
+            })
+        import leo.core.leoVersion as leoVersion
+        return {
+            'leo_version': leoVersion.version,
+            'python': sys.version.split()[0],
+            'phases': result,
+            'modules': modules,
+        }
+
+    def writeStartupReport(self, fn):
+        '''
+        Write the startup report, in json format, to the file fn.
+        This is the --startup-report=fn command-line option.
+        '''
+        import json
+        import leo.core.leoImportTimes as leoImportTimes
+        timer = leoImportTimes.timer
+        if timer:
+            timer.uninstall()
+        d = self.computeStartupReport(timer)
+        try:
+            with open(fn, 'w') as f:
+                json.dump(d, f, indent=1)
+            g.es_print('wrote startup report: %s' % fn)
+        except IOError:
+            g.es_print('can not write startup report: %s' % fn)
     #@+node:ekr.20150225133846.7: *4* LM.doDiff
     def doDiff(self):
         '''Support --diff option after loading Leo.'''
@@ -2492,9 +2680,11 @@ class LoadManager:
         # Do the final inits.
         g.app.logInited = True
         g.app.initComplete = True
+        lm.endStartupPhase('open files')
         if c:
             c.setLog()
             c.redraw()
+        lm.endStartupPhase('first redraw')
         p = c.p if c else None
         g.doHook("start2", c=c, p=p, fileName=fileName)
         if c:
@@ -2565,18 +2755,23 @@ class LoadManager:
         # Init the app.
         lm.initApp(verbose)
         g.app.setGlobalDb()
+        lm.createAllImporetersData()
+            # Can be done early. Uses g.app.loadDir and g.app.db.
         lm.reportDirectories(verbose)
+        lm.endStartupPhase('init app')
         # Read settings *after* setting g.app.config and *before* opening plugins.
         # This means if-gui has effect only in per-file settings.
         lm.readGlobalSettingsFiles()
             # reads only standard settings files, using a null gui.
             # uses lm.files[0] to compute the local directory
             # that might contain myLeoSettings.leo.
+        lm.endStartupPhase('read settings')
         # Read the recent files file.
         localConfigFile = lm.files[0] if lm.files else None
         g.app.recentFilesManager.readRecentFiles(localConfigFile)
         # Create the gui after reading options and settings.
         lm.createGui(pymacs)
+        lm.endStartupPhase('create gui')
         # We can't print the signon until we know the gui.
         g.app.computeSignon() # Set app.signon/signon1 for commanders.
     #@+node:ekr.20170302093006.1: *5* LM.createAllImporetersData & helpers (new)
@@ -2588,128 +2783,142 @@ class LoadManager:
         '''
         assert g.app.loadDir
             # This is the only data required.
-        self.createWritersData()
+        manifest = self.getPluginManifest()
+        self.createWritersData(manifest)
             # Was an AtFile method.
-        self.createImporterData()
+        self.createImporterData(manifest)
             # Was a LeoImportCommands method.
-    #@+node:ekr.20140724064952.18037: *6* LM.createImporterData & helper
-    def createImporterData(self):
-        '''Create the data structures describing importer plugins.'''
-        # Allow plugins to be defined in ~/.leo/plugins.
-        plugins1 = g.os_path_finalize_join(g.app.homeDir, '.leo', 'plugins')
-        plugins2 = g.os_path_finalize_join(g.app.loadDir, '..', 'plugins')
-        for kind, plugins in (('home', plugins1), ('leo', plugins2)):
-            pattern = g.os_path_finalize_join(
-                g.app.loadDir, '..', 'plugins', 'importers', '*.py')
-            for fn in g.glob_glob(pattern):
-                sfn = g.shortFileName(fn)
-                if sfn != '__init__.py':
-                    try:
-                        module_name = sfn[: -3]
-                        # Important: use importlib to give imported modules
-                        # their fully qualified names.
-                        m = importlib.import_module(
-                            'leo.plugins.importers.%s' % module_name)
-                        self.parse_importer_dict(sfn, m)
-                        # print('createImporterData', m.__name__)
-                    except Exception:
-                        g.warning('can not import leo.plugins.importers.%s' % (
-                            module_name))
-    #@+node:ekr.20140723140445.18076: *7* LM.parse_importer_dict
-    def parse_importer_dict(self, sfn, m):
+    #@+node:ekr.20140724064952.18037: *6* LM.createImporterData
+    def createImporterData(self, manifest):
         '''
         Set entries in g.app.classDispatchDict, g.app.atAutoDict and
-        g.app.atAutoNames using entries in m.importer_dict.
-        '''
-        importer_d = getattr(m, 'importer_dict', None)
-        if importer_d:
-            at_auto = importer_d.get('@auto', [])
-            scanner_class = importer_d.get('class', None)
-            # scanner_name = scanner_class.__name__
-            extensions = importer_d.get('extensions', [])
-            if at_auto:
-                # Make entries for each @auto type.
-                d = g.app.atAutoDict
-                for s in at_auto:
+        g.app.atAutoNames using the importers in the plugin manifest.
+
+        The entries are LazyPluginClass objects: the importer modules are
+        imported only when first used.
+        '''
+        for module_name, class_name, at_auto, extensions in manifest.get('importers'):
+            scanner_class = LazyPluginClass(module_name, 'importer_dict', class_name)
+            # Make entries for each @auto type.
+            for s in at_auto:
+                g.app.atAutoDict[s] = scanner_class
+                g.app.atAutoNames.add(s)
+            # Make entries for each extension.
+            for ext in extensions:
+                g.app.classDispatchDict[ext] = scanner_class
+    #@+node:ekr.20140728040812.17990: *6* LM.createWritersData
+    def createWritersData(self, manifest):
+        '''
+        Set entries in g.app.writersDispatchDict and g.app.atAutoWritersDict
+        using the writers in the plugin manifest.
+
+        The entries are LazyPluginClass objects: the writer modules are
+        imported only when first used.
+        '''
+        g.app.writersDispatchDict = {}
+        g.app.atAutoWritersDict = {}
+        for module_name, class_name, at_auto, extensions in manifest.get('writers'):
+            sfn = module_name.split('.')[-1] + '.py'
+            scanner_class = LazyPluginClass(module_name, 'writer_dict', class_name)
+            # Make entries for each @auto type.
+            d = g.app.atAutoWritersDict
+            for s in at_auto:
+                aClass = d.get(s)
+                if aClass:
+                    g.trace('%s: duplicate %s class %s in %s:' % (
+                        sfn, s, aClass.__name__, aClass.module_name))
+                else:
                     d[s] = scanner_class
-                    g.app.atAutoDict[s] = scanner_class
                     g.app.atAutoNames.add(s)
-            if extensions:
-                # Make entries for each extension.
-                d = g.app.classDispatchDict
-                for ext in extensions:
+            # Make entries for each extension.
+            d = g.app.writersDispatchDict
+            for ext in extensions:
+                aClass = d.get(ext)
+                if aClass:
+                    g.trace('%s: duplicate %s class' % (sfn, ext),
+                        aClass, scanner_class)
+                else:
                     d[ext] = scanner_class
-        elif sfn not in (
-            # These are base classes, not real plugins.
-            'basescanner.py',
-            'linescanner.py',
-        ):
-            g.warning('leo/plugins/importers/%s has no importer_dict' % sfn)
-    #@+node:ekr.20140728040812.17990: *6* LM.createWritersData & helper
-    def createWritersData(self):
-        '''Create the data structures describing writer plugins.'''
-        trace = False and 'createWritersData' not in g.app.debug_dict
-            # Do *not* remove this trace.
-        if trace:
-            # Suppress multiple traces.
-            g.app.debug_dict['createWritersData'] = True
-        g.app.writersDispatchDict = {}
-        g.app.atAutoWritersDict = {}
-        plugins1 = g.os_path_finalize_join(g.app.homeDir, '.leo', 'plugins')
-        plugins2 = g.os_path_finalize_join(g.app.loadDir, '..', 'plugins')
-        for kind, plugins in (('home', plugins1), ('leo', plugins2)):
-            pattern = g.os_path_finalize_join(g.app.loadDir,
-                '..', 'plugins', 'writers', '*.py')
-            for fn in g.glob_glob(pattern):
+    #@+node:ekr.20190807064512.1: *6* LM.getPluginManifest & helpers
+    def getPluginManifest(self):
+        '''
+        Return a dict describing all importer and writer plugins.
+
+        The manifest is cached in g.app.db. It is regenerated, by importing
+        all importer and writer modules, when any file in
+        leo/plugins/importers or leo/plugins/writers changes.
+        '''
+        trace = 'plugins' in g.app.debug or 'startup' in g.app.debug
+        key = self.pluginManifestKey()
+        d = g.app.db and g.app.db.get('plugin-manifest')
+        if d and d.get('key') == key:
+            return d.get('manifest')
+        if trace: g.trace('regenerating the plugin manifest')
+        manifest, ok = self.computePluginManifest()
+        if ok and g.app.db:
+            # Don't cache errors: report them on every startup.
+            g.app.db['plugin-manifest'] = {'key': key, 'manifest': manifest}
+        return manifest
+    #@+node:ekr.20190807064512.2: *7* LM.computePluginManifest
+    def computePluginManifest(self):
+        '''
+        Import all importer and writer plugins.
+
+        Return (manifest, ok). The manifest is a dict with 'importers' and
+        'writers' keys. Values are lists of tuples:
+        (module_name, class_name, @auto names, extensions).
+        '''
+        manifest, ok = {}, True
+        table = (
+            # Base classes are not real plugins.
+            ('importers', 'importer_dict', ('basescanner.py', 'linescanner.py')),
+            ('writers', 'writer_dict', ('basewriter.py',)),
+        )
+        for kind, dict_name, base_classes in table:
+            manifest[kind] = aList = []
+            for fn in self.pluginManifestFiles(kind):
                 sfn = g.shortFileName(fn)
-                if sfn != '__init__.py':
-                    try:
-                        # Important: use importlib to give imported modules their fully qualified names.
-                        m = importlib.import_module('leo.plugins.writers.%s' % sfn[: -3])
-                        self.parse_writer_dict(sfn, m)
-                    except Exception:
-                        g.es_exception()
-                        g.warning('can not import leo.plugins.writers.%s' % sfn)
-        if trace:
-            g.trace('LM.writersDispatchDict')
-            g.printDict(g.app.writersDispatchDict)
-            g.trace('LM.atAutoWritersDict')
-            g.printDict(g.app.atAutoWritersDict)
-        # Creates problems: See #40.
-    #@+node:ekr.20140728040812.17991: *7* LM.parse_writer_dict
-    def parse_writer_dict(self, sfn, m):
+                module_name = 'leo.plugins.%s.%s' % (kind, sfn[: -3])
+                try:
+                    # Important: use importlib to give imported modules
+                    # their fully qualified names.
+                    m = importlib.import_module(module_name)
+                except Exception:
+                    g.es_exception()
+                    g.warning('can not import %s' % module_name)
+                    ok = False
+                    continue
+                d = getattr(m, dict_name, None)
+                if d:
+                    aClass = d.get('class', None)
+                    aList.append((
+                        module_name,
+                        aClass.__name__,
+                        d.get('@auto', []),
+                        d.get('extensions', []),
+                    ))
+                elif sfn not in base_classes:
+                    g.warning('leo/plugins/%s/%s has no %s' % (kind, sfn, dict_name))
+        return manifest, ok
+    #@+node:ekr.20190807064512.3: *7* LM.pluginManifestFiles & pluginManifestKey
+    def pluginManifestFiles(self, kind):
+        '''Return the list of .py files in leo/plugins/<kind>.'''
+        pattern = g.os_path_finalize_join(g.app.loadDir, '..', 'plugins', kind, '*.py')
+        return sorted(z for z in g.glob_glob(pattern)
+            if g.shortFileName(z) != '__init__.py')
+
+    def pluginManifestKey(self):
         '''
-        Set entries in g.app.writersDispatchDict and g.app.atAutoWritersDict
-        using entries in m.writers_dict.
-        '''
-        writer_d = getattr(m, 'writer_dict', None)
-        if writer_d:
-            at_auto = writer_d.get('@auto', [])
-            scanner_class = writer_d.get('class', None)
-            extensions = writer_d.get('extensions', [])
-            if at_auto:
-                # Make entries for each @auto type.
-                d = g.app.atAutoWritersDict
-                for s in at_auto:
-                    aClass = d.get(s)
-                    if aClass and aClass != scanner_class:
-                        g.trace('%s: duplicate %s class %s in %s:' % (
-                            sfn, s, aClass.__name__, m.__file__))
-                    else:
-                        d[s] = scanner_class
-                        g.app.atAutoNames.add(s)
-            if extensions:
-                # Make entries for each extension.
-                d = g.app.writersDispatchDict
-                for ext in extensions:
-                    aClass = d.get(ext)
-                    if aClass and aClass != scanner_class:
-                        g.trace('%s: duplicate %s class' % (sfn, ext),
-                            aClass, scanner_class)
-                    else:
-                        d[ext] = scanner_class
-        elif sfn not in ('basewriter.py',):
-            g.warning('leo/plugins/writers/%s has no writer_dict' % sfn)
+        Return a key describing Leo's version and the names, modification
+        times and sizes of all importer and writer plugins.
+        '''
+        import leo.core.leoVersion as leoVersion
+        result = [leoVersion.version]
+        for kind in ('importers', 'writers'):
+            for fn in self.pluginManifestFiles(kind):
+                stat = os.stat(fn)
+                result.append((fn, stat.st_mtime, stat.st_size))
+        return result
     #@+node:ekr.20120219154958.10478: *5* LM.createGui
     def createGui(self, pymacs):
         lm = self
@@ -2777,8 +2986,6 @@ class LoadManager:
     #@+node:ekr.20120219154958.10484: *5* LM.initApp
     def initApp(self, verbose):
 
-        self.createAllImporetersData()
-            # Can be done early. Uses only g.app.loadDir
         assert g.app.loadManager
         import leo.core.leoBackground as leoBackground
         import leo.core.leoConfig as leoConfig
@@ -2845,6 +3052,8 @@ class LoadManager:
             'script': script,
             'select': options.select and options.select.strip('"'),
                 # --select=headline
+            'startup_report': options.startup_report and options.startup_report.strip('"'),
+                # --startup-report=fn
             'theme_path': options.theme,
                 # --theme=name
             'version': options.version,
@@ -2885,6 +3094,7 @@ class LoadManager:
         add_bool('--script-window', 'execute script using default gui')
         add_other('--select',       'headline or gnx of node to select', m='ID')
         add_bool('--silent',        'disable all log messages')
+        add_other('--startup-report', 'write startup and import times to PATH', m='PATH')
         add_other('--theme',        'use the named theme file', m='NAME')
         add_other('--trace',        'add one or more strings to g.app.debug', m=trace_m)
         add_other('--trace-binding', 'trace commands bound to a key', m='KEY')
@@ -3388,6 +3598,38 @@ class LoadManager:
             c.fileCommands.getLeoFile(theFile, fn, checkOpenFiles=False)
                 # Closes the file.
     #@-others
+#@+node:ekr.20190807064512.4: ** class LazyPluginClass
+class LazyPluginClass:
+    '''
+    A stand-in for the class in the importer_dict or writer_dict of an
+    importer or writer plugin. The plugin is imported when first needed.
+    '''
+
+    def __init__(self, module_name, dict_name, class_name):
+        '''Ctor for the LazyPluginClass class.'''
+        self.aClass = None
+        self.dict_name = dict_name
+        self.module_name = module_name
+        self.__name__ = class_name
+
+    def __call__(self, *args, **kwargs):
+        return self.resolve()(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # Called only for attributes that don't exist.
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return getattr(self.resolve(), name)
+
+    def __repr__(self):
+        return '<LazyPluginClass %s.%s>' % (self.module_name, self.__name__)
+
+    def resolve(self):
+        '''Import the plugin if necessary and return the actual class.'''
+        if self.aClass is None:
+            m = importlib.import_module(self.module_name)
+            self.aClass = getattr(m, self.dict_name).get('class')
+        return self.aClass
 #@+node:ekr.20120223062418.10420: ** class PreviousSettings
 class PreviousSettings:
     '''A class holding the settings and shortcuts dictionaries
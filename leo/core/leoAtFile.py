@@ -9,10 +9,14 @@
 import leo.core.leoGlobals as g
 import leo.core.leoBeautify as leoBeautify
 import leo.core.leoNodes as leoNodes
+import hashlib
 import os
 import re
+import shutil
 import sys
+import tempfile
 import time
+import weakref
 #@-<< imports >>
 #@+others
 #@+node:ekr.20160514120655.1: ** class AtFile
@@ -53,6 +57,9 @@ class AtFile:
         self.canCancelFlag = False
         self.cancelFlag = False
         self.yesToAll = False
+        # Not inited in initCommonIvars: the cache persists between writes.
+        self.bodyCache = weakref.WeakKeyDictionary()
+            # Keys are vnodes; values are tuples (key, output) for at.putBody.
         # User options: set in reloadSettings.
         self.checkPythonCodeOnWrite = False
         self.runPyFlakesOnWrite = False
@@ -408,8 +415,8 @@ class AtFile:
                 import leo.core.leoNodes as leoNodes
                 for parent_v in v.parents:
                     assert isinstance(parent_v, leoNodes.VNode), parent_v
-                    if v in parent_v.children:
-                        childIndex = parent_v.children.index(v)
+                    childIndex = parent_v.indexOfChild(v)
+                    if childIndex >= 0:
                         v._cutLink(childIndex, parent_v)
                         v._addLink(len(child.v.children), child.v)
                     else:
@@ -999,6 +1006,7 @@ class AtFile:
     def writeAtShadowNodesHelper(self, writeDirtyOnly=True): 
         """Write @shadow nodes in the selected outline"""
         at = self; c = at.c
+        c.resolveDirtyVnodes()
         p = c.p; after = p.nodeAfterTree()
         found = False
         while p and p != after:
@@ -1043,6 +1051,7 @@ class AtFile:
     def writeAll(self, all=False, dirty=False):
         """Write @file nodes in all or part of the outline"""
         at, c = self, self.c
+        c.resolveDirtyVnodes()
         at.sameFiles = 0
         # This is the *only* place where these are set.
         # promptForDangerousWrite sets cancelFlag only if canCancelFlag is True.
@@ -1249,6 +1258,44 @@ class AtFile:
         finally:
             if hasattr(at, ivar):
                 delattr(at, ivar)
+    #@+node:ekr.20190824062512.1: *5* at.writeAtAutoStream
+    def writeAtAutoStream(self, writer, fileName, root):
+        '''
+        Write root, an @auto node, using the given writer function.
+
+        Unlike at.writeAtAutoContents, send the output to a StreamingOutput
+        object. Replace the external file only if its contents change.
+        Return True if the node was written successfully, or None if the
+        temp file can not be created.
+        '''
+        at = self
+        try:
+            stream = StreamingOutput(
+                g.os_path_realpath(fileName), at.encoding, at.output_newline)
+        except OSError:
+            return None
+        at.openOutputStream()
+        try:
+            at.outputList = stream
+                # at.os appends to at.outputList.
+            ok = writer(root)
+            stream.close()
+        except Exception:
+            stream.remove()
+            raise
+        finally:
+            at.outputList = []
+        if stream.encodingError:
+            g.error("Error converting %s from unicode to %s encoding" % (
+                g.shortFileName(fileName), at.encoding))
+            ok = False
+        if not ok or at.errors:
+            stream.remove()
+            g.es("not written:", fileName)
+            at.addToOrphanList(root)
+            return False
+        at.replaceFileFromStream(stream, root)
+        return True
     #@+node:ekr.20190111153522.1: *5* at.writeX...
     #@+node:ekr.20041005105605.154: *6* at.asisWrite & helper
     def asisWrite(self, root):
@@ -1373,6 +1420,13 @@ class AtFile:
                 return False
             if c.persistenceController:
                 c.persistenceController.update_before_write_foreign_file(root)
+            junk, ext = g.os_path_splitext(fileName)
+            writer = at.dispatch(ext, root)
+            if writer and not root.isAtAutoRstNode():
+                # Don't keep the output of writers in memory.
+                ok = at.writeAtAutoStream(writer, fileName, root)
+                if ok is not None:
+                    return ok
             contents = at.writeAtAutoContents(fileName, root)
             if contents is None:
                 g.es("not written:", fileName)
@@ -1388,6 +1442,7 @@ class AtFile:
     def writeAtAutoNodesHelper(self, writeDirtyOnly=True):
         """Write @auto nodes in the selected outline"""
         at = self; c = at.c
+        c.resolveDirtyVnodes()
         p = c.p; after = p.nodeAfterTree()
         found = False
         while p and p != after:
@@ -1687,11 +1742,20 @@ class AtFile:
             if not s.endswith('\n'):
                 s = s + '\n'
         at.raw = False # Bug fix.
+        #
+        # Reuse the previous output if nothing affecting it has changed.
+        key = at.bodyCacheKey(s)
+        data = at.bodyCache.get(p.v)
+        if data and data[0] == key:
+            at.outputList.append(data[1])
+            return False
+        n, errors = len(at.outputList), at.errors
         i = 0
         status = g.Bunch(
             at_comment_seen = False,
             at_delims_seen = False,
             at_warning_given = False,
+            cacheable = True,
             has_at_others = False,
             in_code = True,
         )
@@ -1705,7 +1769,24 @@ class AtFile:
             # g.bunch *does* have .in_code and has_at_others members.
         if not status.in_code:
             at.putEndDocLine()
+        if status.cacheable and not at.raw and at.errors == errors:
+            at.bodyCache[p.v] = key, ''.join(at.outputList[n:])
         return status.has_at_others
+    #@+node:ekr.20190818062512.1: *6* at.bodyCacheKey
+    def bodyCacheKey(self, s):
+        '''
+        Return a key describing everything that affects the output of at.putBody
+        for body text s, provided s contains no @others, @all, @delims or
+        section references.
+        '''
+        at = self
+        return (
+            s, at.indent, at.language, at.tab_width,
+            at.startSentinelComment, at.endSentinelComment,
+            at.sentinels, hasattr(at, 'force_sentinels'),
+            at.force_newlines_in_at_nosent_bodies,
+            at.underindentEscapeString, len(g.globalDirectiveList),
+        )
     #@+node:ekr.20041005105605.163: *6* at.putLine
     def putLine(self, i, kind, p, s, status):
         '''Put the line at s[i:] of the given kind, updating the status.'''
@@ -1717,6 +1798,7 @@ class AtFile:
                 else:
                     name, n1, n2 = at.findSectionName(s, i)
                     if name:
+                        status.cacheable = False
                         at.putRefLine(s, i, n1, n2, name, p)
                     else:
                         at.putCodeLine(s, i)
@@ -1743,6 +1825,7 @@ class AtFile:
             status.in_code = True
         elif kind == at.allDirective:
             if status.in_code:
+                status.cacheable = False
                 if p == self.root:
                     at.putAtAllLine(s, i, p)
                 else:
@@ -1750,6 +1833,7 @@ class AtFile:
             else: at.putDocLine(s, i)
         elif kind == at.othersDirective:
             if status.in_code:
+                status.cacheable = False
                 if status.has_at_others:
                     at.error('multiple @others in: %s' % (p.h))
                 else:
@@ -1776,6 +1860,8 @@ class AtFile:
                 status.at_comment_seen = True
             elif g.match_word(s, i, '@delims'):
                 status.at_delims_seen = True
+                status.cacheable = False
+                    # The new delims affect later nodes.
             if (
                 status.at_comment_seen and
                 status.at_delims_seen and not
@@ -2695,6 +2781,82 @@ class AtFile:
         at.checkPythonCode(contents, fileName, root)
             # Check *after* writing the file.
         return ok
+    #@+node:ekr.20190824062512.2: *6* at.replaceFileFromStream
+    def replaceFileFromStream(self, stream, root):
+        '''
+        Replace the external file with the temp file created by stream,
+        a closed StreamingOutput object, unless the contents are the same.
+        Return True if the original file was changed.
+        '''
+        at, c = self, self.c
+        if root:
+            root.clearDirty()
+        fileName = stream.fileName
+        sfn = g.shortFileName(fileName)
+        #
+        # Create the timestamp (only for messages).
+        if c.config.getBool('log-show-save-time', default=False):
+            format = c.config.getString('log-timestamp-format') or "%H:%M:%S"
+            timestamp = time.strftime(format) + ' '
+        else:
+            timestamp = ''
+        #
+        # If file does not exist, create it from the temp file.
+        if not g.os_path_exists(fileName):
+            ok = stream.replace()
+            if ok:
+                c.setFileTimeStamp(fileName)
+                if not g.unitTesting:
+                    g.es('%screated: %s' % (timestamp, fileName))
+                if root:
+                    at.rememberReadPath(fileName, root)
+            else:
+                at.addToOrphanList(root)
+            return False
+        #
+        # Compare the hashes of the old and new contents.
+        old_digest, old_digest_no_cr = at.hashFile(fileName)
+        new_digest, new_digest_no_cr = at.hashFile(stream.tempName)
+        unchanged = (
+            new_digest == old_digest or
+            not at.explicitLineEnding and new_digest_no_cr == old_digest_no_cr)
+        if unchanged:
+            stream.remove()
+            at.sameFiles += 1
+            if not g.unitTesting and c.config.getBool('report-unchanged-files', default=True):
+                g.es('%sunchanged: %s' % (timestamp, sfn))
+            return False
+        #
+        # Warn if we are only adjusting the line endings.
+        if at.explicitLineEnding and new_digest_no_cr == old_digest_no_cr:
+            g.warning("correcting line endings in:", fileName)
+        #
+        # Write a changed file.
+        ok = stream.replace()
+        if ok:
+            c.setFileTimeStamp(fileName)
+            if not g.unitTesting:
+                g.es('%swrote: %s' % (timestamp, sfn))
+        else:
+            g.error('error writing', sfn)
+            g.es('not written:', sfn)
+            at.addToOrphanList(root)
+        return ok
+    #@+node:ekr.20190824062512.3: *6* at.hashFile
+    def hashFile(self, fileName):
+        '''
+        Return the digests of the file's contents, with and without carriage
+        returns, reading and hashing the file in blocks.
+        '''
+        h, h_no_cr = hashlib.sha1(), hashlib.sha1()
+        try:
+            with open(fileName, 'rb') as f:
+                for block in iter(lambda: f.read(StreamingOutput.chunk_size), b''):
+                    h.update(block)
+                    h_no_cr.update(block.replace(b'\r', b''))
+        except IOError:
+            return None, None
+        return h.hexdigest(), h_no_cr.hexdigest()
     #@+node:ekr.20190114061452.27: *6* at.compareIgnoringBlankLines
     def compareIgnoringBlankLines(self, s1, s2):
         '''Compare two strings, ignoring blank lines.'''
@@ -3043,8 +3205,17 @@ class FastAtRead:
     #@+node:ekr.20180602103135.3: *3* fast_at.get_patterns
     #@@nobeautify
 
+    pattern_names = (
+        'after', 'all', 'code', 'comment', 'delims', 'doc', 'end_raw',
+        'first', 'last', 'node_start', 'others', 'raw', 'ref')
+
     def get_patterns(self, delims):
-        '''Create regex patterns for the given comment delims.'''
+        '''
+        Create regex patterns for the given comment delims.
+        
+        The last pattern matches any line matched by one of the others.
+        m.lastgroup is the name of that pattern, from fast_at.pattern_names.
+        '''
         # This must be a function, because of @comments & @delims.
         delim_start, delim_end = delims
         delims = re.escape(delim_start), re.escape(delim_end or '')
@@ -3067,8 +3238,11 @@ class FastAtRead:
             r'^(\s*)%s@(\+|-)%s\s*%s$'%(                # section ref
                 delim_start, g.angleBrackets('(.*)'), delim_end)
         )
+        sentinel_pattern = '|'.join(
+            '(?P<%s>%s)' % (name, pattern)
+                for name, pattern in zip(self.pattern_names, patterns))
         # Return the compiled patterns, in alphabetical order.
-        return (re.compile(pattern) for pattern in patterns)
+        return [re.compile(pattern) for pattern in patterns + (sentinel_pattern,)]
     #@+node:ekr.20180603060721.1: *3* fast_at.post_pass
     def post_pass(self, gnx2body, gnx2vnode, root_v):
         '''Set all body text.'''
@@ -3154,6 +3328,11 @@ class FastAtRead:
             # Needed to handle #1065 so reads will not create spurious child nodes.
         sentinel = delim_start + '@'
             # Faster than a regex!
+        candidates = [j for j, z in enumerate(lines) if sentinel in z]
+            # The indices of all lines that might be sentinels.
+            # All other lines are plain lines, handled in bulk.
+        candidate_i = 0
+            # Index into candidates.
         stack = []
             # Entries are (gnx, indent, body)
             # Updated when at+others, at+<section>, or at+all is seen.
@@ -3202,7 +3381,8 @@ class FastAtRead:
         # get the patterns.
         after_pat, all_pat, code_pat, comment_pat, delims_pat,\
         doc_pat, end_raw_pat, first_pat, last_pat, \
-        node_start_pat, others_pat, raw_pat, ref_pat = self.get_patterns(delims)
+        node_start_pat, others_pat, raw_pat, ref_pat, \
+        sentinel_pat = self.get_patterns(delims)
         #@-<< init scan_lines >>
         #@+<< define dump_v >>
         #@+node:ekr.20180613061743.1: *4* << define dump_v >>
@@ -3220,8 +3400,28 @@ class FastAtRead:
             print('PARENTS...')
             g.printObj([v4.h for v4 in v.parents])
         #@-<< define dump_v >>
-        i = 0 # To keep pylint happy.
-        for i, line in enumerate(lines[start:]):
+        i, n = start, len(lines)
+        while i < n:
+            #@+<< 0. add plain lines in bulk >>
+            #@+node:ekr.20190819062512.1: *4* << 0. add plain lines in bulk >>
+            # Only the following sections can handle a line that does not contain the sentinel.
+            # They would add such lines to the body, adjusting the indentation.
+            if not verbatim and not in_doc:
+                while candidate_i < len(candidates) and candidates[candidate_i] < i:
+                    candidate_i += 1
+                j = candidates[candidate_i] if candidate_i < len(candidates) else n
+                if j > i:
+                    if indent:
+                        body.extend([
+                            z[indent:] if z[:indent].isspace() and len(z) > indent else z
+                                for z in lines[i:j]])
+                    else:
+                        body.extend(lines[i:j])
+                    i = j
+                    continue
+            #@-<< 0. add plain lines in bulk >>
+            line = lines[i]
+            i += 1
             # Order matters.
             #@+<< 1. common code for all lines >>
             #@+node:ekr.20180602103135.10: *4* << 1. common code for all lines >>
@@ -3271,10 +3471,15 @@ class FastAtRead:
                 # lstrip() is faster than using a regex!
                 body.append(line)
                 continue
+            #
+            # The patterns are mutually exclusive, so at most one can match.
+            # Try only that one. kind is None for all other lines.
+            m = sentinel_pat.match(line)
+            kind = m and m.lastgroup
             #@-<< 2. short-circuit later tests >>
             #@+<< 3. handle @others >>
             #@+node:ekr.20180602103135.14: *4* << 3. handle @others >>
-            m = others_pat.match(line)
+            m = others_pat.match(line) if kind == 'others' else None
             if m:
                 in_doc = False
                 if m.group(2) == '+': # opening sentinel
@@ -3290,7 +3495,7 @@ class FastAtRead:
  # clears in_doc
             #@+<< 4. handle section refs >>
             #@+node:ekr.20180602103135.18: *4* << 4. handle section refs >>
-            m = ref_pat.match(line)
+            m = ref_pat.match(line) if kind == 'ref' else None
             if m:
                 in_doc = False
                 if m.group(2) == '+':
@@ -3309,7 +3514,7 @@ class FastAtRead:
             # Order doesn't matter, but match more common sentinels first.
             #@+<< handle node_start >>
             #@+node:ekr.20180602103135.19: *4* << handle node_start >>
-            m = node_start_pat.match(line)
+            m = node_start_pat.match(line) if kind == 'node_start' else None
             if m:
                 in_doc, in_raw = False, False
                 gnx, head = m.group(2), m.group(5)
@@ -3385,13 +3590,13 @@ class FastAtRead:
                     continue
                 #
                 # Check for @c or @code.
-                m = code_pat.match(line)
+                m = code_pat.match(line) if kind == 'code' else None
                 if m:
                     in_doc = False 
                     body.append('@code\n' if m.group(1) else '@c\n')
                     continue
             else:
-                m = doc_pat.match(line)
+                m = doc_pat.match(line) if kind == 'doc' else None
                 if m:
                     # @+at or @+doc?
                     doc = '@doc' if m.group(1) == 'doc' else '@'
@@ -3406,7 +3611,7 @@ class FastAtRead:
             #@-<< handle end of @doc & @code parts >>
             #@+<< handle @all >>
             #@+node:ekr.20180602103135.13: *4* << handle @all >>
-            m = all_pat.match(line)
+            m = all_pat.match(line) if kind == 'all' else None
             if m:
                 # @all tells Leo's *write* code not to check for undefined sections.
                 # Here, in the read code, we merely need to add it to the body.
@@ -3422,7 +3627,7 @@ class FastAtRead:
             #@-<< handle @all >>
             #@+<< handle afterref >>
             #@+node:ekr.20180603063102.1: *4* << handle afterref >>
-            m = after_pat.match(line)
+            m = after_pat.match(line) if kind == 'after' else None
             if m:
                 afterref = True
                 verbatim = True
@@ -3431,7 +3636,7 @@ class FastAtRead:
             #@-<< handle afterref >>
             #@+<< handle @first and @last >>
             #@+node:ekr.20180606053919.1: *4* << handle @first and @last >>
-            m = first_pat.match(line)
+            m = first_pat.match(line) if kind == 'first' else None
             if m:
                 if 0 <= first_i < len(first_lines):
                     body.append('@first ' + first_lines[first_i])
@@ -3439,7 +3644,7 @@ class FastAtRead:
                 else:
                     g.trace('too many @first lines')
                 continue
-            m = last_pat.match(line)
+            m = last_pat.match(line) if kind == 'last' else None
             if m:
                 n_last_lines += 1
                 continue
@@ -3447,7 +3652,7 @@ class FastAtRead:
             #@+<< handle @comment >>
             #@+node:ekr.20180621050901.1: *4* << handle @comment >>
             # http://leoeditor.com/directives.html#part-4-dangerous-directives
-            m = comment_pat.match(line)
+            m = comment_pat.match(line) if kind == 'comment' else None
             if m:
                 # <1, 2 or 3 comment delims>
                 delims = m.group(1).strip()
@@ -3469,19 +3674,22 @@ class FastAtRead:
                 doc_skip = (delim_start + '\n', delim_end + '\n')
                 is_cweb = delim_start == '@q@' and delim_end == '@>'
                 sentinel = delim_start + '@'
+                candidates = [j for j, z in enumerate(lines) if sentinel in z]
+                candidate_i = 0
                 #
                 # Recalculate the patterns.
                 delims = delim_start, delim_end
                 (
                     after_pat, all_pat, code_pat, comment_pat, delims_pat,
                     doc_pat, end_raw_pat, first_pat, last_pat,
-                    node_start_pat, others_pat, raw_pat, ref_pat
+                    node_start_pat, others_pat, raw_pat, ref_pat,
+                    sentinel_pat,
                 ) = self.get_patterns(delims)
                 continue
             #@-<< handle @comment >>
             #@+<< handle @delims >>
             #@+node:ekr.20180608104836.1: *4* << handle @delims >>
-            m = delims_pat.match(line)
+            m = delims_pat.match(line) if kind == 'delims' else None
             if m:
                 # Get 1 or 2 comment delims
                 # Whatever happens, retain the original @delims line.
@@ -3506,20 +3714,23 @@ class FastAtRead:
                 doc_skip = (delim_start + '\n', delim_end + '\n')
                 is_cweb = delim_start == '@q@' and delim_end == '@>'
                 sentinel = delim_start + '@'
+                candidates = [j for j, z in enumerate(lines) if sentinel in z]
+                candidate_i = 0
                 #
                 # Recalculate the patterns
                 delims = delim_start, delim_end
                 (
                     after_pat, all_pat, code_pat, comment_pat, delims_pat,
                     doc_pat, end_raw_pat, first_pat, last_pat,
-                    node_start_pat, others_pat, raw_pat, ref_pat
+                    node_start_pat, others_pat, raw_pat, ref_pat,
+                    sentinel_pat,
                 ) = self.get_patterns(delims)
                 continue
             #@-<< handle @delims >>
             #@+<< handle @raw >>
             #@+node:ekr.20180606080200.1: *4* << handle @raw >>
             # http://leoeditor.com/directives.html#part-4-dangerous-directives
-            m = raw_pat.match(line)
+            m = raw_pat.match(line) if kind == 'raw' else None
             if m:
                 in_raw = True
                 verbatim = True
@@ -3529,7 +3740,6 @@ class FastAtRead:
             #@+<< handle @-leo >>
             #@+node:ekr.20180602103135.20: *4* << handle @-leo >>
             if line.startswith(delim_start + '@-leo'):
-                i += 1
                 break
             #@-<< handle @-leo >>
             # These must be last, in this order.
@@ -3570,7 +3780,7 @@ class FastAtRead:
             # No @-leo sentinel
             return None, []
         # Handle @last lines.
-        last_lines = lines[start+i:]
+        last_lines = lines[i:]
         if last_lines:
             last_lines = ['@last ' + z for z in last_lines]
             gnx2body[root_gnx] = gnx2body[root_gnx] + last_lines
@@ -3604,6 +3814,83 @@ class FastAtRead:
             g.trace('%5.3f sec. %s' % ((t2-t1), path))
         return True
     #@-others
+#@+node:ekr.20190824062512.4: ** class StreamingOutput
+class StreamingOutput:
+    '''
+    A replacement for at.outputList that writes the output of @auto
+    writers to a temp file, so the output is never all in memory.
+
+    at.os calls at.outputList.append, so writers need not change.
+    at.replaceFileFromStream compares the hashes of the temp file and the
+    external file and replaces the external file only if they differ.
+
+    Like g.writeFile, stream.replace writes the external file in place,
+    so its links, owner and permissions do not change.
+    '''
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, fileName, encoding, newline):
+        self.fileName = fileName
+        # Raises OSError if the temp file can not be created.
+        fd, self.tempName = tempfile.mkstemp(
+            prefix='leo-%s-' % os.path.basename(fileName),
+            suffix='.tmp')
+        # The file encodes the strings and translates newlines in chunks.
+        self.textFile = open(fd, 'w',
+            buffering=self.chunk_size,
+            encoding=encoding or 'utf-8',
+            newline=newline)
+        self.encodingError = False
+            # True: the encoding can not represent some strings.
+        self.stripCR = newline != '\n'
+            # True: remove '\r' characters, as at.replaceFile does when
+            # at.output_newline is not '\n'.
+
+    #@+others
+    #@+node:ekr.20190825062512.5: *3* stream.append
+    def append(self, s):
+        '''
+        Write s to the temp file.
+
+        Writers catch all exceptions, so remember encoding errors instead
+        of raising them. at.writeAtAutoStream reports them and does not
+        replace the external file.
+        '''
+        if self.stripCR:
+            s = s.replace('\r', '')
+        try:
+            self.textFile.write(s)
+        except UnicodeEncodeError:
+            self.encodingError = True
+    #@+node:ekr.20190824062512.6: *3* stream.close
+    def close(self):
+        '''Write all strings to the temp file and close it.'''
+        self.textFile.close()
+    #@+node:ekr.20190824062512.8: *3* stream.remove
+    def remove(self):
+        '''Close and delete the temp file.'''
+        if not self.textFile.closed:
+            self.textFile.close()
+        if os.path.exists(self.tempName):
+            os.remove(self.tempName)
+    #@+node:ekr.20190824062512.9: *3* stream.replace
+    def replace(self):
+        '''
+        Copy the temp file to the external file, then delete the temp file.
+        Return True if all went well.
+        '''
+        try:
+            with open(self.tempName, 'rb') as inFile:
+                with open(self.fileName, 'wb') as outFile:
+                    shutil.copyfileobj(inFile, outFile, self.chunk_size)
+            return True
+        except Exception:
+            g.es_exception()
+            return False
+        finally:
+            self.remove()
+    #@-others
 #@-others
 #@@language python
 #@@tabwidth -4
@@ -65,7 +65,7 @@ class BackgroundProcessManager:
     class ProcessData:
         '''A class to hold data about running or queued processes.'''
 
-        def __init__(self, c, kind, fn, link_pattern, link_root, shell):
+        def __init__(self, c, kind, fn, link_pattern, link_root, shell, on_end=None):
             '''Ctor for the ProcessData class.'''
             self.c = c
             self.callback = None
@@ -73,6 +73,8 @@ class BackgroundProcessManager:
             self.kind = kind
             self.link_pattern = None
             self.link_root = link_root
+            self.on_end = on_end
+                # Called with the list of output lines when the process ends.
             self.shell = shell
             #
             # Check and compile the link pattern.
@@ -108,7 +110,9 @@ class BackgroundProcessManager:
     def end(self):
         '''End the present process.'''
         # Send the output to the log.
+        lines = []
         for s in self.pid.stdout:
+            lines.append(s)
             self.put_log(s)
         # Terminate the process properly.
         try:
@@ -116,6 +120,8 @@ class BackgroundProcessManager:
         except OSError:
             pass
         self.pid = None
+        if self.data and self.data.on_end:
+            self.data.on_end(lines)
     #@+node:ekr.20161028063800.1: *4* bpm.start_next
     def start_next(self):
         '''The previous process has finished. Start the next one.'''
@@ -198,10 +204,16 @@ class BackgroundProcessManager:
         fn=None,
         link_pattern=None,
         link_root=None,
+        on_end=None,
         shell=False,
     ):
-        '''Start or queue a process described by command and fn.'''
-        data = self.ProcessData(c, kind, fn, link_pattern, link_root, shell)
+        '''
+        Start or queue a process described by command and fn.
+        
+        If on_end is given, it is called with the list of the process's
+        output lines when the process ends normally.
+        '''
+        data = self.ProcessData(c, kind, fn, link_pattern, link_root, shell, on_end)
             # 2019/06/05: don't set self.data unless we start the process!
         if self.pid:
             # A process is already active.  Add a new callback.
@@ -17,6 +17,7 @@ except ImportError:
     g.command = command
 import ast
 # import itertools
+import concurrent.futures
 import optparse
 import os
 import sys
@@ -113,7 +114,183 @@ def beautifyPythonTree(event):
         else:
             g.es_print('beautified total %s node%s in %4.2f sec.' % (
                 pp.n_changed_nodes, g.plural(pp.n_changed_nodes), t2 - t1))
+#@+node:ekr.20190802071536.1: *3* beautify-tree-parallel
+@g.command('beautify-tree-parallel')
+@g.command('pretty-print-tree-parallel')
+def beautifyPythonTreeParallel(event):
+    '''
+    Beautify the Python code in the selected outline, beautifying the nodes
+    of each @<file> tree in a separate worker process.
+    '''
+    c = event.get('c')
+    p0 = c and c.p
+    if not p0 or should_kill_beautify(p0):
+        return
+    t1 = time.time()
+    pp = PythonTokenBeautifier(c)
+    groups = find_beautify_groups(c, p0)
+    # Create the jobs. Only the body text goes to the workers.
+    settings = (pp.tab_width, pp.delete_blank_lines)
+    jobs = [[(p.gnx, p.b) for p in aList] for root, aList in groups]
+    results = run_beautify_jobs(jobs, settings)
+    # Apply the results in one undo group.
+    for (root, aList), (elapsed, data) in zip(groups, results):
+        d = {p.gnx: p for p in aList}
+        prev_changed = pp.n_changed_nodes
+        for gnx, s, error in data:
+            p = d.get(gnx)
+            if error:
+                pp.skip_message(error, p)
+            elif s is not None:
+                pp.replace_body(p, s)
+        if not g.unitTesting:
+            n = pp.n_changed_nodes - prev_changed
+            g.es_print('%s: beautified %s node%s in %4.2f sec.' % (
+                root.h, n, g.plural(n), elapsed))
+    pp.end_undo()
+    if not g.unitTesting:
+        g.es_print('beautified total %s node%s in %s file%s in %4.2f sec.' % (
+            pp.n_changed_nodes, g.plural(pp.n_changed_nodes),
+            len(groups), g.plural(len(groups)), time.time() - t1))
 #@+node:ekr.20150528091356.1: **  top-level functions (leoBeautifier.py)
+#@+node:ekr.20190802071536.2: *3* beautify_body & beautify_job (pure functions)
+def beautify_body(s, tab_width, delete_blank_lines):
+    '''
+    Beautify s, the body text of a single node.
+
+    Return (s2, error). s2 is None if s is unchanged or can not be beautified.
+    error is None or the reason why s can not be beautified.
+
+    This is a pure function of its arguments, so it may run in any process.
+    '''
+    if not s:
+        # Pretty printing might add text!
+        return None, None
+    if not s.strip():
+        return '', None
+    # Replace Leonine syntax with special comments.
+    comment_string, s0 = comment_leo_lines_in_string(s)
+    try:
+        node1 = ast.parse(g.toEncodedString(s0), filename='before', mode='exec')
+    except IndentationError:
+        return None, 'IndentationError'
+    except SyntaxError:
+        return None, 'SyntaxError'
+    except Exception:
+        return None, 'Exception'
+    readlines = g.ReadLinesClass(s0).next
+    tokens = list(tokenize.generate_tokens(readlines))
+    beautifier = PythonTokenBeautifier(c=None)
+    beautifier.tab_width = tab_width
+    beautifier.delete_blank_lines = delete_blank_lines
+    s2 = beautifier.run(tokens)
+    try:
+        node2 = ast.parse(g.toEncodedString(s2), filename='before', mode='exec')
+        ok = compare_ast(node1, node2)
+    except Exception:
+        ok = False
+    if not ok:
+        return None, 'BeautifierError'
+    # Restore the tags after the compare
+    s3 = uncomment_leo_lines(comment_string, None, s2)
+    return (None if s3 == s else s3), None
+
+def beautify_job(job, settings):
+    '''
+    Beautify all the (gnx, body) tuples in job, a list.
+    Return (elapsed_time, [(gnx, s2, error),...]).
+    '''
+    t1 = time.time()
+    tab_width, delete_blank_lines = settings
+    result = []
+    for gnx, s in job:
+        s2, error = beautify_body(s, tab_width, delete_blank_lines)
+        if s2 is not None or error:
+            result.append((gnx, s2, error))
+    return time.time() - t1, result
+#@+node:ekr.20190802071536.3: *3* find_beautify_groups
+def find_beautify_groups(c, p0):
+    '''
+    Return a list of tuples (root, aList), grouping the nodes of p0's tree
+    that should be beautified by their nearest @<file> node.
+
+    This is equivalent to calling g.scanForAtLanguage and should_beautify
+    for each node, but it scans the directives of each node only once.
+    '''
+    groups, seen = [], set()
+    d = {}
+        # Keys are root vnodes, values are indices into groups.
+
+    def own_beautify(p, d2, is_self):
+        '''Return the effect of p's @beautify directives, or None.'''
+        if 'killbeautify' in d2:
+            return False
+        if 'beautify' in d2 and 'nobeautify' in d2:
+            # Honor whichever comes first, but only in p itself.
+            # Like should_beautify, such ancestors disable beautifying.
+            return should_beautify(p) if is_self else False
+        if 'beautify' in d2:
+            return True
+        if 'nobeautify' in d2:
+            return False
+        return None
+
+    def visit(p, root, inherited_language, inherited_beautify):
+        d2 = g.get_directives_dict(p)
+        if 'language' in d2:
+            language = g.set_language(d2['language'], 0)[0]
+        else:
+            language = inherited_language
+        flag = own_beautify(p, d2, is_self=True)
+        if flag is None:
+            flag = inherited_beautify
+        if p.isAnyAtFileNode():
+            root = p.copy()
+        if language == 'python' and flag and p.v not in seen:
+            seen.add(p.v)
+            i = d.get(root.v)
+            if i is None:
+                d[root.v] = i = len(groups)
+                groups.append((root, []))
+            groups[i][1].append(p.copy())
+        # Compute the values inherited by the children.
+        child_flag = own_beautify(p, d2, is_self=False)
+        if child_flag is None:
+            child_flag = inherited_beautify
+        for child in p.children():
+            visit(child, root, language, child_flag)
+
+    # Compute the state inherited by p0.
+    parent = p0.parent()
+    inherited_language = g.scanForAtLanguage(c, parent) if parent else c.target_language
+    inherited_beautify = True
+    for parent in p0.parents():
+        flag = own_beautify(parent, g.get_directives_dict(parent), is_self=False)
+        if flag is not None:
+            inherited_beautify = flag
+            break
+    root = p0
+    for p in p0.self_and_parents(copy=False):
+        if p.isAnyAtFileNode():
+            root = p.copy()
+            break
+    visit(p0.copy(), root, inherited_language, inherited_beautify)
+    return groups
+#@+node:ekr.20190802071536.4: *3* run_beautify_jobs
+def run_beautify_jobs(jobs, settings):
+    '''
+    Run beautify_job for each job, in separate processes if possible.
+    Return the list of results, in the order of jobs.
+    '''
+    if len(jobs) > 1:
+        try:
+            with concurrent.futures.ProcessPoolExecutor() as executor:
+                futures = [executor.submit(beautify_job, job, settings) for job in jobs]
+                return [z.result() for z in futures]
+        except Exception:
+            # Fall back to running the jobs in this process.
+            g.es_exception()
+    return [beautify_job(job, settings) for job in jobs]
 #@+node:ekr.20170202095153.1: *3* compare_ast (diabled)
 # http://stackoverflow.com/questions/3312989/
 # elegant-way-to-test-python-asts-for-equality-not-reference-or-object-identity
@@ -237,8 +414,11 @@ def scan_options():
 #@+node:ekr.20150529084212.1: *4* comment_leo_lines (leoBeautifier.py)
 def comment_leo_lines(p):
     '''Replace lines with Leonine syntax with special comments.'''
+    return comment_leo_lines_in_string(p.b)
+
+def comment_leo_lines_in_string(s0):
+    '''Replace lines of s0 with Leonine syntax with special comments.'''
     # Choose the comment string so it appears nowhere in s.
-    s0 = p.b
     n = 5
     while s0.find('#' + ('!' * n)) > -1:
         n += 1
@@ -359,7 +539,7 @@ def uncomment_special_lines(comment, i, lines, p, result, s):
         if i < len(lines) and lines[i].lstrip().startswith('pass'):
             i += 1
         else:
-            g.trace('*** no pass after %s: %s' % (kind, p.h))
+            g.trace('*** no pass after %s: %s' % (kind, p.h if p else ''))
     else:
         # A directive line.
         result.append(s)
@@ -0,0 +1,584 @@
+#! /usr/bin/env python
+#@+leo-ver=5-thin
+#@+node:ekr.20190814063705.1: * @file leoBridgeServer.py
+#@@first
+#@+<< docstring >>
+#@+node:ekr.20190814063705.2: ** << docstring >> (leoBridgeServer.py)
+#@@language rest
+#@@wrap
+'''
+A long-running headless Leo service built on the leoBridge module.
+
+The service creates one bridge, reads settings once, keeps outlines loaded
+and answers requests from any number of local clients::
+
+    python -m leo.core.leoBridgeServer [--port 8131] [--read-settings] [--load-plugins] [outlines]
+
+Each request and each response is a JSON object on a single line. A request
+contains a "command" key, an optional "id" key and the command's arguments.
+A response contains the request's id, the time in msec. the server took to
+handle the request, and either a "result" or an "error" key::
+
+    {"id": 1, "command": "nodes", "path": "x.leo", "pattern": "^@file"}
+    {"id": 1, "msec": 0.42, "result": [{"gnx": "...", "h": "@file x.py", ...}]}
+
+Commands and their arguments:
+
+- open path [reload]: Load an outline, if it isn't already loaded.
+- close path [save] [discard]: Close a loaded outline.
+- outlines: Return the paths of all loaded outlines.
+- nodes path [gnx] [pattern] [body] [limit]: Return a list of nodes.
+- write path [gnx] [all]: Write @<file> nodes. Return the paths written.
+- save path: Save the outline.
+- run path [script] [gnx]: Run a script. Return its output and g.app.scriptResult.
+- stats: Return latency statistics for each command.
+
+Commands that take a path open the outline if necessary.
+
+Each connection has its own thread. A request holds the lock of its
+outline, so requests for different outlines run concurrently. Leo's caches
+and other global state may only be used from the thread that created Leo's
+application object. Request threads pass the work of opening, closing and
+saving outlines, writing external files and running scripts, to that
+thread, which must call
+server.process_requests repeatedly.
+
+The Client class is a thread-safe client that keeps a pool of persistent
+connections.
+'''
+#@-<< docstring >>
+#@@language python
+#@@tabwidth -4
+import concurrent.futures
+import contextlib
+import io
+import itertools
+import json
+import optparse
+import os
+import queue
+import re
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+# Do not define g here. Use the g returned by the bridge.
+#@+others
+#@+node:ekr.20190814063705.3: ** class ServerError
+class ServerError(Exception):
+    '''An error reported by a Server.'''
+#@+node:ekr.20190814063705.4: ** class Outline
+class Outline:
+    '''A commander loaded by a Server.'''
+
+    def __init__(self, c, path, owned):
+        self.c = c
+        self.path = path
+        self.owned = owned
+            # False if the commander was open before the server opened it.
+        self.closed = False
+        self.lock = threading.Lock()
+            # Held while a request uses the commander.
+#@+node:ekr.20190814063705.5: ** class Stats
+class Stats:
+    '''Latency statistics for each command.'''
+
+    max_samples = 1000
+        # The number of recent latencies kept for each command.
+    #@+others
+    #@+node:ekr.20190814063705.6: *3* stats.__init__
+    def __init__(self):
+        self.d = {}
+            # Keys are commands, values are [n, total, maximum, samples].
+        self.lock = threading.Lock()
+    #@+node:ekr.20190814063705.7: *3* stats.add
+    def add(self, command, msec):
+        '''Add the latency of one request.'''
+        with self.lock:
+            aList = self.d.get(command)
+            if not aList:
+                aList = self.d[command] = [0, 0.0, 0.0, []]
+            aList[0] += 1
+            aList[1] += msec
+            aList[2] = max(aList[2], msec)
+            samples = aList[3]
+            samples.append(msec)
+            if len(samples) > 2 * self.max_samples:
+                del samples[:-self.max_samples]
+    #@+node:ekr.20190814063705.8: *3* stats.report
+    def report(self):
+        '''
+        Return a dict describing the latencies of all commands.
+        Percentiles are computed from recent requests.
+        '''
+        result = {}
+        with self.lock:
+            for command, (n, total, maximum, samples) in self.d.items():
+                samples = sorted(samples[-self.max_samples:])
+
+                def percentile(q, samples=samples):
+                    return round(samples[min(len(samples) - 1, int(q * len(samples)))], 3)
+
+                result[command] = {
+                    'n': n,
+                    'mean': round(total / n, 3),
+                    'p50': percentile(0.5),
+                    'p95': percentile(0.95),
+                    'max': round(maximum, 3),
+                }
+        return result
+    #@-others
+#@+node:ekr.20190814063705.9: ** class RequestHandler
+class RequestHandler(socketserver.StreamRequestHandler):
+    '''Handle all the requests from one connection.'''
+
+    disable_nagle_algorithm = True
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if line.strip():
+                self.wfile.write(self.server.respond(line))
+#@+node:ekr.20190814063705.10: ** class Server
+class Server(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    '''
+    A server that handles the requests of each connection in a separate thread.
+
+    bridge: A leoBridge controller.
+    g:      leoGlobals, when serving outlines from within Leo.
+    '''
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 64
+    #@+others
+    #@+node:ekr.20190814063705.11: *3* server.__init__
+    def __init__(self, host='127.0.0.1', port=8131, bridge=None, g=None):
+        self.bridge = bridge
+        self.g = bridge.globals() if bridge else g
+        assert self.g, 'Server: no bridge and no g'
+        self.lock = threading.RLock()
+            # Held while opening or closing outlines.
+        self.outlines = {}
+            # Keys are normalized paths, values are Outlines.
+        self.jobs = queue.Queue()
+            # (future, func, args) tuples for Leo's thread.
+        self.leo_thread = threading.current_thread()
+        self.stats = Stats()
+        self.thread = None
+        super().__init__((host, port), RequestHandler)
+    #@+node:ekr.20190814063705.12: *3* server.handle_error
+    def handle_error(self, request, client_address):
+        '''Over-ride TCPServer.handle_error. Ignore clients that disconnect early.'''
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+    #@+node:ekr.20190814063705.13: *3* server.respond
+    def respond(self, line):
+        '''Return the response, a line of JSON, to one request.'''
+        t1 = time.perf_counter()
+        command, request_id = None, None
+        try:
+            request = json.loads(line.decode('utf-8'))
+            request_id = request.pop('id', None)
+            command = request.pop('command', None)
+            func = getattr(self, 'do_%s' % command, None) if isinstance(command, str) else None
+            if not func:
+                raise ServerError('unknown command: %r' % command)
+            response = {'result': func(**request)}
+        except ServerError as e:
+            response = {'error': str(e)}
+        except Exception:
+            typ, val, tb = sys.exc_info()
+            response = {'error': ''.join(traceback.format_exception_only(typ, val)).strip()}
+        msec = 1000 * (time.perf_counter() - t1)
+        self.stats.add(command if isinstance(command, str) else '?', msec)
+        response['id'] = request_id
+        response['msec'] = round(msec, 3)
+        return (json.dumps(response, default=repr) + '\n').encode('utf-8')
+    #@+node:ekr.20190814063705.14: *3* server.start & stop
+    def start(self):
+        '''Serve requests in a separate thread.'''
+        self.thread = threading.Thread(target=self.serve_forever, name='leoBridgeServer')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def stop(self):
+        '''Stop serving requests.'''
+        if self.thread:
+            self.shutdown()
+            self.thread.join()
+            self.thread = None
+        self.server_close()
+    #@+node:ekr.20190814063705.39: *3* server.call & process_requests
+    def call(self, func, *args):
+        '''Call func(*args) in Leo's thread and return its result.'''
+        if threading.current_thread() is self.leo_thread:
+            return func(*args)
+        future = concurrent.futures.Future()
+        self.jobs.put((future, func, args))
+        return future.result()
+
+    def process_requests(self, timeout=0):
+        '''
+        Do all the work that request threads have passed to Leo's thread,
+        waiting at most timeout seconds for the first job.
+        Must be called only from Leo's thread.
+        '''
+        block = timeout > 0
+        while True:
+            try:
+                future, func, args = self.jobs.get(block, timeout)
+            except queue.Empty:
+                return
+            block = False
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except BaseException as e:
+                    future.set_exception(e)
+    #@+node:ekr.20190814063705.15: *3* server.commands
+    # Each command runs in the thread of the connection that sent it.
+    # Functions passed to self.call must not acquire any lock.
+    #@+node:ekr.20190814063705.16: *4* server.do_close
+    def do_close(self, path, save=False, discard=False):
+        '''
+        Close the outline. Unsaved changes are an error unless save or
+        discard is True.
+        '''
+        key = self.key(path)
+        with self.lock:
+            outline = self.outlines.get(key)
+            if not outline:
+                raise ServerError('not open: %s' % path)
+            with outline.lock:
+                c = outline.c
+                if c.isChanged():
+                    if save:
+                        self.call(self.save, c)
+                    elif not discard:
+                        raise ServerError('unsaved changes: %s' % path)
+                del self.outlines[key]
+                outline.closed = True
+                if outline.owned:
+                    self.call(self.close_commander, c)
+        return True
+    #@+node:ekr.20190814063705.17: *4* server.do_nodes
+    def do_nodes(self, path, gnx=None, pattern=None, body=False, limit=None):
+        '''
+        Return a list of dicts describing nodes in outline order.
+
+        gnx:     Return only the node with the given gnx.
+        pattern: Return only nodes whose headlines match this regex.
+        body:    Include the nodes' body text.
+        limit:   Return at most this many nodes.
+        '''
+        regex = re.compile(pattern) if pattern else None
+        result = []
+        with self.locked(path) as c:
+            positions = [self.find_gnx(c, gnx)] if gnx else c.all_unique_positions(copy=False)
+            for p in positions:
+                if regex and not regex.search(p.h):
+                    continue
+                d = {
+                    'gnx': p.gnx,
+                    'h': p.h,
+                    'level': p.level(),
+                    'children': p.numberOfChildren(),
+                }
+                if body:
+                    d['b'] = p.b
+                result.append(d)
+                if limit and len(result) >= limit:
+                    break
+        return result
+    #@+node:ekr.20190814063705.18: *4* server.do_open
+    def do_open(self, path, reload=False):
+        '''
+        Load the outline at path. Return a dict describing the outline.
+        Reloading an outline discards unsaved changes.
+        '''
+        key = self.key(path)
+        with self.lock:
+            outline = self.outlines.get(key)
+            loaded = bool(outline and not reload)
+            if outline and reload:
+                self.do_close(path, discard=True)
+            if not loaded:
+                if not os.path.exists(key):
+                    raise ServerError('file not found: %s' % path)
+                outline = self.call(self.open_outline, key)
+                self.outlines[key] = outline
+        return {'path': outline.path, 'loaded': loaded}
+    #@+node:ekr.20190814063705.19: *4* server.do_outlines
+    def do_outlines(self):
+        '''Return the paths of all loaded outlines.'''
+        with self.lock:
+            return sorted(z.path for z in self.outlines.values())
+    #@+node:ekr.20190814063705.20: *4* server.do_run
+    def do_run(self, path, script=None, gnx=None):
+        '''
+        Run a script with c, g and p defined, where p is the node with the
+        given gnx, if any. If script is None, run the script in that node.
+
+        Return a dict containing the script's output and g.app.scriptResult.
+        '''
+        with self.locked(path) as c:
+            return self.call(self.run_script, c, script, gnx)
+    #@+node:ekr.20190814063705.21: *4* server.do_save
+    def do_save(self, path):
+        '''Save the outline.'''
+        with self.locked(path) as c:
+            self.call(self.save, c)
+        return True
+    #@+node:ekr.20190814063705.22: *4* server.do_stats
+    def do_stats(self):
+        '''Return latency statistics for all commands.'''
+        return self.stats.report()
+    #@+node:ekr.20190814063705.23: *4* server.do_write
+    def do_write(self, path, gnx=None, all=False):
+        '''
+        Write @<file> nodes. Return a list of the paths written.
+
+        gnx: Write all @<file> nodes in the tree of the node with this gnx.
+        all: Write all @<file> nodes in the outline.
+
+        Otherwise, write only dirty @<file> nodes.
+        '''
+        with self.locked(path) as c:
+            return self.call(self.write_files, c, gnx, all)
+    #@+node:ekr.20190814063705.24: *3* server.helpers
+    #@+node:ekr.20190814063705.41: *4* server.close_commander
+    def close_commander(self, c):
+        '''Close c's window, discarding unsaved changes.'''
+        g = self.g
+        c.setChanged(False, redrawFlag=False)
+        g.app.closeLeoWindow(c.frame, finish_quit=False)
+    #@+node:ekr.20190814063705.25: *4* server.find_gnx
+    def find_gnx(self, c, gnx):
+        '''Return the first position of the node with the given gnx.'''
+        v = c.fileCommands.gnxDict.get(gnx)
+        p = v and c.vnode2position(v)
+        if not p:
+            raise ServerError('gnx not found: %s' % gnx)
+        return p
+    #@+node:ekr.20190814063705.26: *4* server.key
+    def key(self, path):
+        '''Return the normalized absolute path for path.'''
+        g = self.g
+        if not isinstance(path, str) or not path.strip():
+            raise ServerError('no path')
+        path = os.path.abspath(path)
+        head, ext = os.path.splitext(path)
+        if not ext:
+            path = path + '.leo'
+        return os.path.normcase(g.os_path_finalize(path))
+    #@+node:ekr.20190814063705.37: *4* server.locked
+    @contextlib.contextmanager
+    def locked(self, path):
+        '''
+        Hold the lock of the outline at path, opening the file if necessary.
+        Yield the outline's commander.
+        '''
+        outline = self.outline(path)
+        with outline.lock:
+            if outline.closed:
+                raise ServerError('closed: %s' % path)
+            yield outline.c
+    #@+node:ekr.20190814063705.27: *4* server.open_outline
+    def open_outline(self, path):
+        '''Return an Outline for path, opening the file if necessary.'''
+        g = self.g
+        for c in g.app.commanders():
+            if c.fileName() and self.key(c.fileName()) == path:
+                return Outline(c, c.fileName(), owned=False)
+        if self.bridge:
+            c = self.bridge.openLeoFile(path)
+        else:
+            c = g.openWithFileName(path)
+        if not c:
+            raise ServerError('can not open: %s' % path)
+        return Outline(c, c.fileName(), owned=True)
+    #@+node:ekr.20190814063705.28: *4* server.outline
+    def outline(self, path):
+        '''Return the Outline for path, opening the file if necessary.'''
+        with self.lock:
+            outline = self.outlines.get(self.key(path))
+        if outline:
+            return outline
+        self.do_open(path)
+        with self.lock:
+            return self.outlines[self.key(path)]
+    #@+node:ekr.20190814063705.40: *4* server.run_script
+    def run_script(self, c, script, gnx):
+        '''Run a script in Leo's thread. See do_run.'''
+        g = self.g
+        p = self.find_gnx(c, gnx) if gnx else None
+        if script is None:
+            if not p:
+                raise ServerError('no script')
+            script = g.getScript(c, p, useSelectedText=False)
+        old_p, old_cwd = c.p, os.getcwd()
+        if p:
+            c.setCurrentPosition(p)
+                # c.executeScript always passes c.p to scripts.
+        g.app.scriptResult = None
+        f = io.StringIO()
+        try:
+            with contextlib.redirect_stdout(f):
+                c.executeScript(
+                    script=script or '\n',
+                    raiseFlag=True,
+                    runPyflakes=False,
+                    useSelectedText=False)
+        except Exception:
+            raise ServerError('%s%s' % (f.getvalue(), traceback.format_exc()))
+        finally:
+            if p and c.positionExists(old_p):
+                c.setCurrentPosition(old_p)
+            os.chdir(old_cwd)
+                # c.executeScript changes the current directory.
+        result = g.app.scriptResult
+        g.app.scriptResult = None
+        return {'output': f.getvalue(), 'result': result}
+    #@+node:ekr.20190814063705.29: *4* server.save
+    def save(self, c):
+        '''Save c's outline. Raise ServerError on failure.'''
+        if not c.mFileName:
+            raise ServerError('no file name')
+        if not c.fileCommands.save(c.mFileName, silent=True):
+            raise ServerError('can not save: %s' % c.mFileName)
+    #@+node:ekr.20190825062512.6: *4* server.write_files
+    def write_files(self, c, gnx, all):
+        '''Write @<file> nodes in Leo's thread. See do_write.'''
+        g = self.g
+        at = c.atFileCommands
+        if gnx:
+            roots = [self.find_gnx(c, gnx)]
+        elif all:
+            roots = list(c.rootPosition().self_and_siblings())
+        else:
+            roots = [None]
+        old_p = c.p
+        paths = []
+        try:
+            for root in roots:
+                if root:
+                    c.setCurrentPosition(root)
+                        # at.writeAll writes the tree of c.p.
+                files, junk = at.findFilesToWrite(bool(root))
+                paths.extend(g.fullPath(c, p) for p in files)
+                at.writeAll(all=bool(root), dirty=not root)
+        finally:
+            if c.positionExists(old_p):
+                c.setCurrentPosition(old_p)
+        return paths
+    #@-others
+#@+node:ekr.20190814063705.30: ** class Client
+class Client:
+    '''
+    A thread-safe client for a Server. Requests reuse a pool of
+    persistent connections.
+    '''
+    #@+others
+    #@+node:ekr.20190814063705.31: *3* client.__init__
+    def __init__(self, port=8131, host='127.0.0.1', timeout=None):
+        self.address = host, port
+        self.idle = []
+            # (socket, file) tuples for idle connections.
+        self.ids = itertools.count(1)
+        self.lock = threading.Lock()
+        self.timeout = timeout
+    #@+node:ekr.20190814063705.32: *3* client.close
+    def close(self):
+        '''Close all idle connections.'''
+        with self.lock:
+            connections, self.idle = self.idle, []
+        for sock, f in connections:
+            f.close()
+            sock.close()
+    #@+node:ekr.20190814063705.33: *3* client.request
+    def request(self, command, **args):
+        '''
+        Send a request to the server and return its result.
+        Raise ServerError if the server reports an error.
+        '''
+        with self.lock:
+            connection = self.idle.pop() if self.idle else None
+            args['id'] = next(self.ids)
+        args['command'] = command
+        if not connection:
+            sock = socket.create_connection(self.address, timeout=self.timeout)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            connection = sock, sock.makefile('rb')
+        sock, f = connection
+        try:
+            sock.sendall((json.dumps(args) + '\n').encode('utf-8'))
+            line = f.readline()
+            if not line:
+                raise ConnectionError('connection closed by the server')
+        except Exception:
+            f.close()
+            sock.close()
+            raise
+        with self.lock:
+            self.idle.append(connection)
+        response = json.loads(line.decode('utf-8'))
+        if 'error' in response:
+            raise ServerError(response['error'])
+        return response['result']
+    #@-others
+#@+node:ekr.20190814063705.34: ** main & helpers
+def main():
+    '''Serve requests until interrupted, then report latencies.'''
+    import leo.core.leoBridge as leoBridge
+    options, paths = scanOptions()
+    bridge = leoBridge.controller(
+        gui='nullGui',
+        loadPlugins=options.load_plugins,
+        readSettings=options.read_settings,
+        silent=not options.verbose,
+        verbose=options.verbose)
+    if not bridge.isOpen():
+        print('leoBridgeServer.py: can not open the bridge')
+        return
+    server = Server(options.host, options.port, bridge=bridge)
+    for path in paths:
+        server.do_open(path)
+    print('leoBridgeServer.py: serving %s outlines on %s:%s' % (
+        len(paths), options.host, server.server_address[1]))
+    server.start()
+    try:
+        while True:
+            server.process_requests(timeout=1)
+    except KeyboardInterrupt:
+        pass
+    server.stop()
+    report(server.stats)
+#@+node:ekr.20190814063705.35: *3* report
+def report(stats):
+    '''Print latency statistics.'''
+    print('%10s %8s %10s %10s %10s %10s' % (
+        'command', 'requests', 'mean', 'p50', 'p95', 'max'))
+    for command, d in sorted(stats.report().items()):
+        print('%10s %8s %10.3f %10.3f %10.3f %10.3f msec.' % (
+            command, d['n'], d['mean'], d['p50'], d['p95'], d['max']))
+#@+node:ekr.20190814063705.36: *3* scanOptions
+def scanOptions():
+    '''Return (options, paths).'''
+    parser = optparse.OptionParser(
+        usage='usage: python leoBridgeServer.py [options] [outlines]')
+    parser.add_option('--host', dest='host', default='127.0.0.1',
+        help='address to bind to (default 127.0.0.1)')
+    parser.add_option('--port', dest='port', type='int', default=8131,
+        help='port to listen on (default 8131)')
+    parser.add_option('--load-plugins', action='store_true', dest='load_plugins')
+    parser.add_option('--read-settings', action='store_true', dest='read_settings')
+    parser.add_option('--verbose', action='store_true', dest='verbose')
+    return parser.parse_args()
+#@-others
+if __name__ == '__main__':
+    main()
+#@-leo
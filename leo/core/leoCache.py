@@ -5,6 +5,7 @@
 #@+node:ekr.20100208223942.10436: ** << imports >> (leoCache)
 import leo.core.leoGlobals as g
 import fnmatch
+import hashlib
 import pickle
 import os
 import stat
@@ -183,6 +184,87 @@ class GlobalCacher:
         dump_cache(self.db, tag2)
             # Careful: g.app.db may not be set yet.
     #@-others
+#@+node:ekr.20190801064417.1: ** class LintCacher
+class LintCacher:
+    '''
+    A singleton cache of pyflakes, pylint and flake8 results, g.app.lint_cacher.
+
+    Keys are (tool, tool version, config hash, content hash), so the
+    checkers need only check files that have actually changed.
+    '''
+
+    def __init__(self):
+        '''Ctor for the LintCacher class.'''
+        self.hits = 0
+        self.misses = 0
+        try:
+            path = join(g.app.homeLeoDir, 'db', 'lint_data')
+            self.db = SqlitePickleShare(path)
+        except Exception:
+            self.db = {}
+
+    #@+others
+    #@+node:ekr.20190801064417.2: *3* lint_cacher.clear
+    def clear(self):
+        '''Clear the lint cache.'''
+        # Careful: self.db may be a Python dict.
+        try:
+            self.db.clear()
+        except Exception:
+            g.trace('unexpected exception')
+            g.es_exception()
+            self.db = {}
+        self.hits = self.misses = 0
+    #@+node:ekr.20190801064417.3: *3* lint_cacher.close & commit
+    def close(self):
+        # Careful: self.db may be a dict.
+        if hasattr(self.db, 'conn'):
+            # pylint: disable=no-member
+            self.db.conn.commit()
+            self.db.conn.close()
+
+    def commit(self):
+        # Careful: self.db may be a dict.
+        if hasattr(self.db, 'conn'):
+            # pylint: disable=no-member
+            self.db.conn.commit()
+    #@+node:ekr.20190801064417.4: *3* lint_cacher.get & put
+    def get(self, tool, version, config, contents):
+        '''
+        Return the cached result of running the given tool on contents,
+        or None if there is no such result.
+        '''
+        val = self.db.get(self.key(tool, version, config, contents))
+        if val is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return val
+
+    def put(self, tool, version, config, contents, val):
+        '''Cache val, the result of running the given tool on contents.'''
+        self.db[self.key(tool, version, config, contents)] = val
+    #@+node:ekr.20190801064417.5: *3* lint_cacher.key & hash
+    def hash(self, s):
+        '''Return the sha1 hex digest of s, a string or bytes.'''
+        if g.isUnicode(s):
+            s = g.toEncodedString(s)
+        return hashlib.sha1(s or b'').hexdigest()
+
+    def key(self, tool, version, config, contents):
+        '''
+        Return the key for the given tool, tool version, configuration
+        and file contents. config and contents may be strings or bytes.
+        '''
+        return 'lint:::%s:::%s:::%s:::%s' % (
+            tool, version, self.hash(config), self.hash(contents))
+    #@+node:ekr.20190801064417.6: *3* lint_cacher.stats
+    def stats(self):
+        '''Return a short report of cache hits and misses.'''
+        return 'lint cache: %s hit%s, %s miss%s' % (
+            self.hits, g.plural(self.hits),
+            self.misses, '' if self.misses == 1 else 'es')
+    #@-others
 #@+node:ekr.20100208223942.5967: ** class PickleShareDB
 _sentinel = object()
 
@@ -8,6 +8,8 @@ import leo.core.leoGlobals as g
 import leo.core.leoNodes as leoNodes
     # The leoCommands ctor now does most leo.core.leo* imports.
     # This breaks circular dependencies.
+import collections
+import contextlib
 import itertools
 import os
 import re
@@ -119,6 +121,8 @@ class Commands:
         # For outline navigation.
         self.navPrefix = '' # Must always be a string.
         self.navTime = None
+        self.scriptCache = g.ScriptCache()
+            # Composed and compiled scripts for g.getScript and c.executeScriptHelper.
 
         self.sqlite_connection = None
     #@+node:ekr.20120217070122.10466: *5* c.initDebugIvars
@@ -164,8 +168,15 @@ class Commands:
     #@+node:ekr.20120217070122.10472: *5* c.initFileIvars
     def initFileIvars(self, fileName, relativeFileName):
         '''Init file-related ivars of the commander.'''
+        self.bulkEditBunch = None
+            # The state of the active c.bulkEdit, or None.
+        self.pendingDirtyVnodes = set()
+            # Vnodes whose ancestor @<file> nodes may not be dirty yet.
+            # See c.setDirtyLater.
         self.changed = False
             # True: the ouline has changed since the last save.
+        self.checkedGnxDict = None
+            # Keys are gnx's, values are vnodes, as of the last c.checkOutline.
         self.ignored_at_file_nodes = []
             # List of nodes for c.raise_error_dialogs.
         self.import_error_nodes = []
@@ -180,6 +191,8 @@ class Commands:
             #
         self.orphan_at_file_nodes = []
             # List of orphaned nodes for c.raise_error_dialogs.
+        self.uncheckedVnodes = set()
+            # Vnodes linked since the last c.checkOutline.
         self.wrappedFileName = None
             # The name of the wrapped file, for wrapper commanders.
             # Set by LM.initWrapperLeoFile
@@ -413,6 +426,7 @@ class Commands:
         c.findCommands.finishCreate()
         if not c.gui.isNullGui:
             g.registerHandler('idle', c.idle_focus_helper)
+            g.registerHandler('idle', c.idle_dirty_helper)
         if getattr(c.frame, 'menu', None):
             c.frame.menu.finishCreate()
         if getattr(c.frame, 'log', None):
@@ -450,6 +464,14 @@ class Commands:
         if c.mFileName:
             return c.os_path_finalize(c.mFileName).lower()
         return 0
+    #@+node:ekr.20190823062512.1: *4* c.idle_dirty_helper
+    def idle_dirty_helper(self, tag, keys):
+        '''An idle-time handler that marks @<file> nodes dirty.'''
+        c = self
+        if keys.get('c') != c or c.bulkEditBunch:
+            return
+        if c.resolveDirtyVnodes():
+            c.redraw_after_icons_changed()
     #@+node:ekr.20110509064011.14563: *4* c.idle_focus_helper & helpers
     idle_focus_count = 0
 
@@ -684,9 +706,9 @@ class Commands:
                 # g.inScript is a synonym for g.app.inScript.
             if c.write_script_file:
                 scriptFile = self.writeScriptFile(script)
-                exec(compile(script, scriptFile, 'exec'), d)
             else:
-                exec(script, d)
+                scriptFile = '<string>'
+            exec(c.scriptCache.compile(script, scriptFile, d.get('script_gnx')), d)
         finally:
             g.inScript = g.app.inScript = False
     #@+node:ekr.20171123135625.6: *4* c.redirectScriptOutput
@@ -864,7 +886,7 @@ class Commands:
             if p.v.expandedPositions:
                 indent = ' '*p.level()
                 print('%s%s' % (indent, p.h))
-                g.printObj(p.v.expandedPositions, indent=indent)
+                g.printObj(list(p.v.expandedPositions.values()), indent=indent)
     #@+node:ekr.20040306220230.1: *5* c.edit_widget
     def edit_widget(self, p):
         c = self
@@ -1050,17 +1072,14 @@ class Commands:
         c, v = self, p.v
         if not p.hasChildren():
             return False
-        # Always clear non-existent positions.
-        v.expandedPositions = [z for z in v.expandedPositions if c.positionExists(z)]
+        # Clear non-existent positions after the outline changes.
+        v.pruneExpandedPositions()
         if not p.isCloned():
             # Do not call p.isExpanded here! It calls this method.
             return p.v.isExpanded()
         if p.isAncestorOf(c.p):
             return True
-        for p2 in v.expandedPositions:
-            if p == p2:
-                return True
-        return False
+        return p.key() in v.expandedPositions
     #@+node:ekr.20070609122713: *5* c.visLimit
     def visLimit(self):
         '''
@@ -1085,16 +1104,14 @@ class Commands:
         assert(c == context)
         positions = []
         for immediate in v.parents:
-            if v in immediate.children:
-                n = immediate.children.index(v)
-            else:
+            n = immediate.indexOfChild(v)
+            if n < 0:
                 continue
             stack = [(v, n)]
             while immediate.parents:
                 parent = immediate.parents[0]
-                if immediate in parent.children:
-                    n = parent.children.index(immediate)
-                else:
+                n = parent.indexOfChild(immediate)
+                if n < 0:
                     break
                 stack.insert(0, (immediate, n),)
                 immediate = parent
@@ -1113,9 +1130,8 @@ class Commands:
         stack = []
         while v.parents:
             parent = v.parents[0]
-            if v in parent.children:
-                n = parent.children.index(v)
-            else:
+            n = parent.indexOfChild(v)
+            if n < 0:
                 return None
             stack.insert(0, (v, n),)
             v = parent
@@ -1195,6 +1211,7 @@ class Commands:
             return # don't update while loading.
         # Clear all dirty bits _before_ setting the caption.
         if not changedFlag:
+            c.pendingDirtyVnodes.clear()
             for v in c.all_unique_nodes():
                 if v.isDirty():
                     v.clearDirty()
@@ -1245,6 +1262,30 @@ class Commands:
 
     # For compatibiility with old scripts.
     setCurrentVnode = setCurrentPosition
+    #@+node:ekr.20190823062512.2: *5* c.setDirtyLater & c.resolveDirtyVnodes
+    def setDirtyLater(self, v):
+        '''
+        Mark v dirty now. Mark v's ancestor @<file> nodes dirty later.
+
+        Unlike p.setDirty, this is cheap enough to call on every keystroke.
+        c.resolveDirtyVnodes marks the ancestors dirty at idle time, before
+        redrawing the screen, and before writing external files.
+        '''
+        c = self
+        v.setDirty()
+        c.pendingDirtyVnodes.add(v)
+
+    def resolveDirtyVnodes(self):
+        '''
+        Mark dirty all ancestor @<file> nodes of the vnodes passed to
+        c.setDirtyLater. Return the list of vnodes that became dirty.
+        '''
+        c = self
+        if not c.pendingDirtyVnodes:
+            return []
+        vnodes = list(c.pendingDirtyVnodes)
+        c.pendingDirtyVnodes.clear()
+        return c.setVnodesDirty([], ancestors=vnodes)
     #@+node:ekr.20040305223225: *5* c.setHeadString
     def setHeadString(self, p, s):
         '''Set the p's headline and the corresponding tree widget to s.
@@ -1321,14 +1362,21 @@ class Commands:
             # Don't set the dirty bit: it would just be annoying.
     #@+node:ekr.20171124081419.1: *3* c.Check Outline...
     #@+node:ekr.20141024211256.22: *4* c.checkGnxs
-    def checkGnxs(self):
+    def checkGnxs(self, vnodes=None):
         '''
         Check the consistency of all gnx's and remove any tnodeLists.
         Reallocate gnx's for duplicates or empty gnx's.
         Return the number of structure_errors found.
+        
+        Each vnode is checked once, no matter how many clones it has.
+        
+        vnodes: check only the trees of these vnodes against the gnx's of the
+                previous check, doing a full check only if there is a problem.
         '''
         c = self
-        d = {} # Keys are gnx's; values are lists of vnodes with that gnx.
+        if vnodes is not None and c.checkNewGnxs(vnodes):
+            return g.app.structure_errors
+        d = {} # Keys are gnx's; values are sets of vnodes with that gnx.
         ni = g.app.nodeIndices
         t1 = time.time()
 
@@ -1336,10 +1384,9 @@ class Commands:
             '''Set v.fileIndex.'''
             v.fileIndex = ni.getNewIndex(v)
 
-        count, gnx_errors = 0, 0
-        for p in c.safe_all_positions(copy=False):
-            count += 1
-            v = p.v
+        gnx_errors = 0
+        vnodes = c.uniqueVnodes()
+        for v in vnodes:
             if hasattr(v, "tnodeList"):
                 delattr(v, "tnodeList")
                 v._p_changed = True
@@ -1351,7 +1398,7 @@ class Commands:
             else:
                 gnx_errors += 1
                 new_gnx(v)
-                g.es_print('empty v.fileIndex: %s new: %r' % (v, p.v.gnx), color='red')
+                g.es_print('empty v.fileIndex: %s new: %r' % (v, v.gnx), color='red')
         for gnx in sorted(d.keys()):
             aList = list(d.get(gnx))
             if len(aList) != 1:
@@ -1361,22 +1408,105 @@ class Commands:
                     gnx_errors += 1
                     g.es_print('id(v): %s gnx: %s %s' % (id(v), v.fileIndex, v.h), color='red')
                     new_gnx(v)
+        c.checkedGnxDict = {v.fileIndex: v for v in vnodes}
         ok = not gnx_errors and not g.app.structure_errors
         t2 = time.time()
         if not ok:
             g.es_print('check-outline ERROR! %s %s nodes, %s gnx errors, %s structure errors' % (
-                c.shortFileName(), count, gnx_errors, g.app.structure_errors), color='red')
+                c.shortFileName(), c.countPositions(), gnx_errors, g.app.structure_errors), color='red')
         elif c.verbose_check_outline and not g.unitTesting:
-            print('check-outline OK: %4.2f sec. %s %s nodes' % (t2 - t1, c.shortFileName(), count))
+            print('check-outline OK: %4.2f sec. %s %s nodes' % (
+                t2 - t1, c.shortFileName(), c.countPositions()))
         return g.app.structure_errors
+    #@+node:ekr.20190816062512.1: *5* c.checkNewGnxs
+    def checkNewGnxs(self, vnodes):
+        '''
+        Check the gnx's in the trees of the given vnodes against c.checkedGnxDict,
+        the gnx's found by the previous check.
+        
+        Return False if c.checkGnxs must check the entire outline.
+        '''
+        c = self
+        d = c.checkedGnxDict
+        if d is None:
+            return False
+        t1 = time.time()
+        roots = [v for v in vnodes if d.get(v.fileIndex) is not v]
+        vnodes = c.uniqueVnodes(roots)
+        for v in vnodes:
+            gnx = v.fileIndex
+            old_v = d.get(gnx)
+            if not gnx or hasattr(v, 'tnodeList') or (
+                old_v and old_v is not v and old_v.parents
+            ):
+                return False
+            d[gnx] = v
+        if g.app.structure_errors:
+            return False
+        t2 = time.time()
+        if c.verbose_check_outline and not g.unitTesting:
+            print('check-outline OK: %4.2f sec. %s %s new nodes' % (
+                t2 - t1, c.shortFileName(), len(vnodes)))
+        return True
     #@+node:ekr.20150318131947.7: *4* c.checkLinks & helpers
-    def checkLinks(self):
-        '''Check the consistency of all links in the outline.'''
+    def checkLinks(self, vnodes=None):
+        '''
+        Check the consistency of all links in the outline.
+        
+        The children and parents lists of each vnode must agree. Only if they
+        don't are positions used to find the first bad link.
+        
+        vnodes: check only the links to and from these vnodes.
+        '''
         c = self
         t1 = time.time()
-        count, errors = 0, 0
+        if vnodes is None:
+            ok = c.checkAllVnodeLinks()
+            count = c.countPositions()
+        else:
+            ok = all(c.checkVnodeLinks(v) for v in vnodes)
+            count = len(vnodes)
+        errors = 0 if ok else c.checkPositionLinks() or 1
+        t2 = time.time()
+        g.es_print('check-links: %4.2f sec. %s %s nodes' % (
+            t2 - t1, c.shortFileName(), count), color='blue')
+        return errors
+    #@+node:ekr.20190816062512.2: *5* c.checkAllVnodeLinks
+    def checkAllVnodeLinks(self):
+        '''
+        Return True if the children and parents lists of all vnodes agree:
+        each child of v must have v in its parents list once for each time it
+        appears in v.children, and every parent must be in the outline.
+        '''
+        c = self
+        down, up = collections.Counter(), collections.Counter()
+        for v in [c.hiddenRootNode] + c.uniqueVnodes():
+            down.update((v, child) for child in v.children)
+            up.update((parent, v) for parent in v.parents)
+        if down == up:
+            return True
+        for parent, child in (down - up) + (up - down):
+            g.trace('links do not match: parent: %s child: %s' % (parent, child))
+            break
+        return False
+    #@+node:ekr.20190816062512.3: *5* c.checkVnodeLinks
+    def checkVnodeLinks(self, v):
+        '''Return True if v's links to its parents and children agree with theirs.'''
+        for parent, n in collections.Counter(v.parents).items():
+            if parent.children.count(v) != n:
+                g.trace('links do not match: parent: %s child: %s' % (parent, v))
+                return False
+        for child, n in collections.Counter(v.children).items():
+            if child.parents.count(v) != n:
+                g.trace('links do not match: parent: %s child: %s' % (v, child))
+                return False
+        return True
+    #@+node:ekr.20190816062512.4: *5* c.checkPositionLinks
+    def checkPositionLinks(self):
+        '''Check all links using positions. Return the number of errors.'''
+        c = self
+        errors = 0
         for p in c.safe_all_positions():
-            count += 1
             # try:
             if not c.checkThreadLinks(p):
                 errors += 1
@@ -1391,9 +1521,6 @@ class Commands:
                 # errors += 1
                 # junk, value, junk = sys.exc_info()
                 # g.error("test failed at position %s\n%s" % (repr(p), value))
-        t2 = time.time()
-        g.es_print('check-links: %4.2f sec. %s %s nodes' % (
-            t2 - t1, c.shortFileName(), count), color='blue')
         return errors
     #@+node:ekr.20040314035615.2: *5* c.checkParentAndChildren
     def checkParentAndChildren(self, p):
@@ -1521,18 +1648,82 @@ class Commands:
                 return False
         return True
     #@+node:ekr.20031218072017.2072: *4* c.checkOutline
-    def checkOutline(self, event=None, check_links=False):
+    def checkOutline(self, event=None, check_links=False, incremental=False):
         """
         Check for errors in the outline.
         Return the count of serious structure errors.
+        
+        incremental: check only the vnodes linked since the previous check.
+                     This misses gnx's assigned to existing vnodes, so
+                     saving the outline always does a full check.
         """
         # The check-outline command sets check_links = True.
         c = self
         g.app.structure_errors = 0
-        structure_errors = c.checkGnxs()
+        vnodes = None
+        if incremental and c.checkedGnxDict is not None:
+            vnodes = [v for v in c.uncheckedVnodes if v.parents]
+        c.uncheckedVnodes = set()
+        structure_errors = c.checkGnxs(vnodes)
         if check_links and not structure_errors:
-            structure_errors += c.checkLinks()
+            structure_errors += c.checkLinks(vnodes)
         return structure_errors
+    #@+node:ekr.20190816062512.5: *4* c.countPositions
+    def countPositions(self):
+        '''Return the number of positions in the outline, without generating them.'''
+        c = self
+        d = {} # Keys are vnodes; values are the number of positions in their trees.
+        for v in c.uniqueVnodes(postorder=True):
+            d[v] = 1 + sum(d.get(child, 0) for child in v.children)
+        return sum(d.get(v, 0) for v in c.hiddenRootNode.children)
+    #@+node:ekr.20190816062512.6: *4* c.uniqueVnodes
+    def uniqueVnodes(self, roots=None, postorder=False):
+        '''
+        Return a list of the vnodes in the trees of the given roots (default:
+        all top-level vnodes), in outline order. Each vnode appears only once.
+        
+        postorder: list each vnode after its descendants.
+        
+        Like p.safeMoveToThreadNext, remove any link that would make a vnode
+        its own ancestor.
+        '''
+        c = self
+        if roots is None:
+            roots = c.hiddenRootNode.children
+        result, seen, ancestors = [], set(), set()
+        for root in list(roots):
+            if root in seen:
+                continue
+            seen.add(root)
+            ancestors.add(root)
+            if not postorder:
+                result.append(root)
+            stack = [(root, 0)]
+            while stack:
+                v, n = stack.pop()
+                if n == len(v.children):
+                    ancestors.remove(v)
+                    if postorder:
+                        result.append(v)
+                    continue
+                child = v.children[n]
+                if child in ancestors:
+                    g.app.structure_errors += 1
+                    g.error('vnode: %s is its own parent' % child)
+                    del v.children[n]
+                    v.childIndexMap = None
+                    if v in child.parents:
+                        child.parents.remove(v)
+                    stack.append((v, n))
+                    continue
+                stack.append((v, n + 1))
+                if child not in seen:
+                    seen.add(child)
+                    ancestors.add(child)
+                    if not postorder:
+                        result.append(child)
+                    stack.append((child, 0))
+        return result
     #@+node:ekr.20031218072017.1765: *4* c.validateOutline
     # Makes sure all nodes are valid.
 
@@ -2715,6 +2906,9 @@ class Commands:
     def redraw(self, p=None):
         '''Redraw the screen immediately.'''
         c = self
+        if c.bulkEditBunch:
+            return # c.endBulkEdit will redraw the screen.
+        c.resolveDirtyVnodes()
         # New in Leo 5.6: clear the redraw request.
         c.requestLaterRedraw = False
         if not p:
@@ -2744,6 +2938,7 @@ class Commands:
     def redraw_after_icons_changed(self):
         '''Update the icon for the presently selected node'''
         c = self
+        c.resolveDirtyVnodes()
         if c.enableRedrawFlag:
             c.frame.tree.redraw_after_icons_changed()
             # Do not call treeFocusHelper here.
@@ -3504,6 +3699,117 @@ class Commands:
         else:
             g.es_print('Does not exist: %s' % (dir_))
     #@+node:ekr.20171124084149.1: *3* c.Scripting utils
+    #@+node:ekr.20190822062512.1: *4* c.bulkEdit & helpers
+    @contextlib.contextmanager
+    def bulkEdit(self, undoType='Bulk Edit'):
+        '''
+        A context manager for scripts that change the outline many times:
+
+            with c.bulkEdit('Import records'):
+                for record in records:
+                    child = p.insertAsLastChild()
+                    child.h = record
+
+        Within the with statement, scripts use the usual position methods.
+        p.setDirty just remembers p.v, and c.redraw does nothing. On exit,
+        c.bulkEdit:
+
+        - marks all changed nodes and their ancestor @<file> nodes dirty,
+        - creates one undo bead, named undoType, for all changes, and
+        - redraws the outline once.
+
+        The undo bead restores the links, headlines and body text of all
+        changed nodes. Undoable commands called within the with statement
+        add their undo info to this bead instead of creating their own.
+        '''
+        c = self
+        c.beginBulkEdit(undoType)
+        try:
+            yield
+        finally:
+            c.endBulkEdit()
+    #@+node:ekr.20190822062512.2: *5* c.beginBulkEdit
+    def beginBulkEdit(self, undoType='Bulk Edit'):
+        '''Begin a bulk edit. Scripts should use c.bulkEdit instead.'''
+        c = self
+        bunch = c.bulkEditBunch
+        if bunch:
+            # Nested bulk edits become part of the outer bulk edit.
+            bunch.count += 1
+            return
+        c.endEditing()
+        c.bulkEditBunch = g.Bunch(
+            count=1,
+            ancestorVnodes=set(),
+                # Vnodes whose ancestor @<file> nodes must be marked dirty.
+            dirtyVnodes=set(),
+                # Vnodes that must be marked dirty, with their ancestor @<file> nodes.
+            treeVnodes=set(),
+                # Vnodes whose descendant @<file> nodes must be marked dirty.
+            savedVnodes=set(),
+                # Vnodes whose undo info has been saved.
+            undoData=c.undoer.beforeBulkEdit(c.p),
+            undoType=undoType,
+        )
+    #@+node:ekr.20190822062512.3: *5* c.endBulkEdit
+    def endBulkEdit(self):
+        '''End a bulk edit. Scripts should use c.bulkEdit instead.'''
+        c = self
+        bunch = c.bulkEditBunch
+        if not bunch:
+            g.trace('no bulk edit')
+            return
+        bunch.count -= 1
+        if bunch.count > 0:
+            return
+        c.bulkEditBunch = None
+        # Nodes whose links or contents have changed are dirty.
+        vnodes = bunch.dirtyVnodes | bunch.savedVnodes
+        c.setVnodesDirty(vnodes, bunch.ancestorVnodes, bunch.treeVnodes)
+        if not c.positionExists(c.p):
+            c.selectPosition(c.rootPosition())
+        if bunch.savedVnodes:
+            c.undoer.afterBulkEdit(c.p, bunch.undoType, bunch.undoData)
+        if vnodes or bunch.ancestorVnodes or bunch.treeVnodes:
+            c.setChanged(True)
+        c.redraw()
+    #@+node:ekr.20190822062512.4: *5* c.setVnodesDirty
+    def setVnodesDirty(self, vnodes, ancestors=None, trees=None):
+        '''
+        Mark all vnodes in vnodes dirty, along with their ancestor @<file>
+        nodes. Also mark dirty all @<file> nodes that are ancestors of the
+        nodes in ancestors, or descendants of the nodes in trees.
+
+        This is equivalent to calling p.setDirty or
+        p.setAllAncestorAtFileNodesDirty for each node, but each ancestor
+        and descendant is visited only once.
+
+        Return the list of vnodes that became dirty.
+        '''
+        dirtyVnodeList = [v for v in vnodes if not v.isDirty()]
+        for v in dirtyVnodeList:
+            v.setDirty()
+        # Visit all ancestors, including all parents of clones.
+        seen, todo = set(), list(vnodes) + list(ancestors or [])
+        while todo:
+            v = todo.pop()
+            if v not in seen:
+                seen.add(v)
+                if v.isAnyAtFileNode() and not v.isDirty():
+                    v.setDirty()
+                    dirtyVnodeList.append(v)
+                todo.extend(v.parents)
+        # Visit all descendants.
+        seen, todo = set(), list(trees or [])
+        while todo:
+            v = todo.pop()
+            if v not in seen:
+                seen.add(v)
+                if v.isAnyAtFileNode() and not v.isDirty():
+                    v.setDirty()
+                    dirtyVnodeList.append(v)
+                todo.extend(v.children)
+        return dirtyVnodeList
     #@+node:ekr.20160201072634.1: *4* c.cloneFindByPredicate
     def cloneFindByPredicate(self,
         generator,     # The generator used to traverse the tree.
@@ -3790,8 +4096,8 @@ class Commands:
                 if c.positionExists(p):
                     v = p.v
                     parent_v = p.stack[-1][0] if p.stack else c.hiddenRootNode
-                    if v in parent_v.children:
-                        childIndex = parent_v.children.index(v)
+                    childIndex = parent_v.indexOfChild(v)
+                    if childIndex >= 0:
                         v._cutLink(childIndex, parent_v)
         # Make sure c.hiddenRootNode always has at least one child.
         if not c.hiddenRootNode.children:
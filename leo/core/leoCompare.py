@@ -2,8 +2,10 @@
 #@+node:ekr.20180212072657.2: * @file leoCompare.py
 """Leo's base compare class."""
 import leo.core.leoGlobals as g
+import bisect
 import difflib
 import filecmp
+import hashlib
 import os
 #@+others
 #@+node:ekr.20031218072017.3633: ** class LeoCompare
@@ -454,17 +456,24 @@ class CompareLeoOutlines:
         s2 = self.get_file(fn2)
         lines1 = g.splitLines(s1)
         lines2 = g.splitLines(s2)
-        diff_list = list(difflib.unified_diff(lines1, lines2, fn1, fn2))
+        diff_list = list(unified_diff(lines1, lines2, fn1, fn2))
         diff_list.insert(0, '@language patch\n')
         self.file_node = self.create_file_node(diff_list, fn1, fn2)
-        # These will be left open
-        c1 = self.open_outline(fn1)
-        c2 = self.open_outline(fn2)
-        if c1 and c2:
+        summary1, summary2 = self.get_summaries(fn1, fn2)
+        if summary1 and summary2:
+            # Compare the outlines without opening them.
+            language = self.c.target_language
+            self.make_fast_diff_outlines(summary1, summary2, language)
+        else:
+            # These will be left open
+            c1 = self.open_outline(fn1)
+            c2 = self.open_outline(fn2)
+            if not (c1 and c2):
+                return
+            language = c2.target_language
             self.make_diff_outlines(c1, c2)
-            self.file_node.b = '%s\n@language %s\n' % (
-                self.file_node.b.rstrip(),
-                c2.target_language)
+        self.file_node.b = '%s\n@language %s\n' % (
+            self.file_node.b.rstrip(), language)
     #@+node:ekr.20180211170333.4: *3* loc.Utils
     #@+node:ekr.20180211170333.5: *4* loc.compute_dicts
     def compute_dicts(self, c1, c2):
@@ -493,35 +502,42 @@ class CompareLeoOutlines:
         for key in d:
             if kind.lower() == 'changed':
                 v1, v2 = d.get(key)
-                # Organizer node: contains diff
-                organizer = parent.insertAsLastChild()
-                organizer.h = v2.h
-                body = list(difflib.unified_diff(
-                    g.splitLines(v1.b),
-                    g.splitLines(v2.b),
-                    self.path1,
-                    self.path2,
-                ))
-                if ''.join(body).strip():
-                    body.insert(0, '@language patch\n')
-                    body.append('@language %s\n' % (c2.target_language))
-                else:
-                    body = ['Only headline has changed']
-                organizer.b = ''.join(body)
-                # Node 1:
-                p1 = organizer.insertAsLastChild()
-                p1.h = '1:' + v1.h
-                p1.b = v1.b
-                # Node 2:
-                assert v1.fileIndex == v2.fileIndex
-                p2 = organizer.insertAsLastChild()
-                p2.h = '2:' + v2.h
-                p2.b = v2.b
+                self.create_changed_node(parent, v1, v2, c2.target_language)
             else:
                 v = d.get(key)
                 p = parent.insertAsLastChild()
                 p.h = v.h
                 p.b = v.b
+    #@+node:ekr.20190805063012.3: *4* loc.create_changed_node
+    def create_changed_node(self, parent, v1, v2, language):
+        '''
+        Create an organizer node, containing the diff of v1 and v2,
+        as the last child of parent.
+        '''
+        # Organizer node: contains diff
+        organizer = parent.insertAsLastChild()
+        organizer.h = v2.h
+        body = list(unified_diff(
+            g.splitLines(v1.b),
+            g.splitLines(v2.b),
+            self.path1,
+            self.path2,
+        ))
+        if ''.join(body).strip():
+            body.insert(0, '@language patch\n')
+            body.append('@language %s\n' % (language))
+        else:
+            body = ['Only headline has changed']
+        organizer.b = ''.join(body)
+        # Node 1:
+        p1 = organizer.insertAsLastChild()
+        p1.h = '1:' + v1.h
+        p1.b = v1.b
+        # Node 2:
+        assert v1.fileIndex == v2.fileIndex
+        p2 = organizer.insertAsLastChild()
+        p2.h = '2:' + v2.h
+        p2.b = v2.b
     #@+node:ekr.20180211170333.7: *4* loc.create_file_node
     def create_file_node(self, diff_list, fn1, fn2):
         '''Create an organizer node for the file.'''
@@ -556,6 +572,24 @@ class CompareLeoOutlines:
         c.selectPosition(self.root)
         c.bodyWantsFocus()
         c.redraw()
+    #@+node:ekr.20190805063012.4: *4* loc.get_summaries
+    def get_summaries(self, fn1, fn2):
+        '''
+        Return OutlineSummary objects for fn1 and fn2, or (None, None).
+
+        Summaries don't contain the contents of external files, so they can
+        be used only if both outlines see the same external files.
+        '''
+        if g.os_path_dirname(fn1) != g.os_path_dirname(fn2):
+            return None, None
+        for frame in g.app.windowList:
+            if frame.c.fileName() in (fn1, fn2) and frame.c.changed:
+                return None, None # Diff the unsaved outline.
+        summary1 = OutlineSummary(fn1)
+        summary2 = OutlineSummary(fn2)
+        if summary1.ok and summary2.ok:
+            return summary1, summary2
+        return None, None
     #@+node:ekr.20180211170333.11: *4* loc.get_file
     def get_file(self, path):
         '''Return the contents of the file whose path is given.'''
@@ -572,6 +606,26 @@ class CompareLeoOutlines:
             (changed, 'Changed'))
         for d, kind in table:
             self.create_compare_node(c1, c2, d, kind)
+    #@+node:ekr.20190805063012.5: *4* loc.make_fast_diff_outlines
+    def make_fast_diff_outlines(self, summary1, summary2, language):
+        '''
+        Create an outline-oriented diff from two OutlineSummary objects.
+        Nodes are created as the differences are found.
+        '''
+        parents = {}
+        for kind, gnx in summary1.compare(summary2):
+            parent = parents.get(kind)
+            if not parent:
+                parent = parents[kind] = self.file_node.insertAsLastChild()
+                parent.setHeadString(kind)
+            if kind == 'Changed':
+                v1, v2 = summary1.node(gnx), summary2.node(gnx)
+                self.create_changed_node(parent, v1, v2, language)
+            else:
+                v = (summary2 if kind == 'Added' else summary1).node(gnx)
+                p = parent.insertAsLastChild()
+                p.h = v.h
+                p.b = v.b
     #@+node:ekr.20180211170333.14: *4* loc.open_outline
     def open_outline(self, fn):
         '''
@@ -585,6 +639,403 @@ class CompareLeoOutlines:
         gui = None if self.visible else g.app.nullGui
         return g.openWithFileName(fn, gui=gui)
     #@-others
+#@+node:ekr.20190805063012.6: ** class OutlineSummary
+class OutlineSummary:
+    '''
+    The headlines and body hashes of all nodes of an xml .leo file,
+    keyed by gnx.
+
+    Summaries are much faster to create than commanders. They don't
+    contain the contents of external files.
+    '''
+
+    def __init__(self, path):
+        '''Ctor for the OutlineSummary class.'''
+        self.path = path
+        self.bodies = {} # Keys are gnx's, values are body texts.
+        self.heads = {} # Keys are gnx's, values are headlines.
+        self.hashes = {} # Keys are gnx's, values are hashes of body texts.
+        self.ok = self.read()
+
+    #@+others
+    #@+node:ekr.20190805063012.7: *3* summary.compare
+    def compare(self, other):
+        '''
+        Yield (kind, gnx) tuples describing how to change self into other.
+        kind is 'Added', 'Deleted' or 'Changed'.
+        '''
+        for gnx in other.heads:
+            if gnx not in self.heads:
+                yield 'Added', gnx
+        for gnx in self.heads:
+            if gnx not in other.heads:
+                yield 'Deleted', gnx
+        for gnx in self.heads:
+            if gnx in other.heads and self.key(gnx) != other.key(gnx):
+                yield 'Changed', gnx
+    #@+node:ekr.20190805063012.8: *3* summary.key & node
+    def key(self, gnx):
+        '''Return the (headline, body hash) tuple for gnx.'''
+        return self.heads.get(gnx), self.hashes.get(gnx)
+
+    def node(self, gnx):
+        '''Return a vnode-like object for gnx.'''
+        return g.Bunch(fileIndex=gnx, h=self.heads.get(gnx, ''), b=self.bodies.get(gnx, ''))
+    #@+node:ekr.20190805063012.9: *3* summary.read
+    def read(self):
+        '''
+        Read the headlines and bodies of self.path without creating a commander.
+        Return False if self.path is not a valid xml .leo file.
+        '''
+        import xml.etree.ElementTree as ElementTree
+        if not self.path.endswith('.leo'):
+            return False # .db files.
+        gnxs = [] # A stack of gnx's of <v> elements.
+        try:
+            for event, elem in ElementTree.iterparse(self.path, events=('start', 'end')):
+                tag = elem.tag
+                if event == 'start':
+                    if tag == 'v':
+                        gnxs.append(elem.get('t'))
+                elif tag == 'vh':
+                    gnx = gnxs[-1]
+                    if gnx not in self.heads:
+                        self.heads[gnx] = elem.text or ''
+                elif tag == 'v':
+                    gnxs.pop()
+                elif tag == 't':
+                    gnx, b = elem.get('tx'), elem.text or ''
+                    self.bodies[gnx] = b
+                    self.hashes[gnx] = hashlib.sha1(g.toEncodedString(b)).hexdigest()
+                    elem.clear()
+        except Exception:
+            # Let the caller open the outline in a commander.
+            return False
+        return True
+    #@-others
+#@+node:ekr.20190804071205.1: ** class LineDiffer
+class LineDiffer:
+    '''
+    A fast, line-oriented replacement for difflib.SequenceMatcher.
+
+    Lines are interned to small ints before diffing, so all comparisons
+    are int comparisons. The 'myers' and 'patience' algorithms run in
+    O((N+M)D) time, where D is the size of the diff, so large files with
+    small diffs are fast. The 'difflib' algorithm uses SequenceMatcher
+    on the interned lines.
+
+    get_matching_blocks and get_opcodes return the same kinds of results as
+    the corresponding SequenceMatcher methods.
+    '''
+
+    algorithms = ('difflib', 'myers', 'patience')
+
+    def __init__(self, a, b, algorithm='myers'):
+        '''Ctor for the LineDiffer class.'''
+        if algorithm not in self.algorithms:
+            g.trace('unknown diff algorithm: %r' % algorithm)
+            algorithm = 'myers'
+        self.algorithm = algorithm
+        self.a, self.b = intern_lines(a, b)
+        self.matching_blocks = None
+        self.opcodes = None
+
+    #@+others
+    #@+node:ekr.20190804071205.2: *3* differ.get_matching_blocks
+    def get_matching_blocks(self):
+        '''
+        Return a list of triples (i, j, n) such that a[i:i+n] == b[j:j+n].
+        The last triple is a dummy: (len(a), len(b), 0).
+        '''
+        if self.matching_blocks is not None:
+            return self.matching_blocks
+        a, b = self.a, self.b
+        if self.algorithm == 'difflib':
+            sm = difflib.SequenceMatcher(None, a, b)
+            self.matching_blocks = sm.get_matching_blocks()
+            return self.matching_blocks
+        matches = []
+        if self.algorithm == 'patience':
+            self.patience_matches(0, len(a), 0, len(b), matches)
+        else:
+            self.myers_matches(0, len(a), 0, len(b), matches)
+        # Coalesce adjacent matches.
+        blocks = []
+        i1 = j1 = k1 = 0
+        for i2, j2, k2 in sorted(matches):
+            if i1 + k1 == i2 and j1 + k1 == j2:
+                k1 += k2
+            else:
+                if k1:
+                    blocks.append((i1, j1, k1))
+                i1, j1, k1 = i2, j2, k2
+        if k1:
+            blocks.append((i1, j1, k1))
+        blocks.append((len(a), len(b), 0))
+        self.matching_blocks = blocks
+        return blocks
+    #@+node:ekr.20190805063012.1: *3* differ.get_grouped_opcodes
+    def get_grouped_opcodes(self, n=3):
+        '''
+        Yield groups of opcodes with up to n lines of context,
+        exactly as SequenceMatcher.get_grouped_opcodes does.
+        '''
+        codes = list(self.get_opcodes())
+        if not codes:
+            codes = [('equal', 0, 1, 0, 1)]
+        # Fix up leading and trailing groups if they show no changes.
+        if codes[0][0] == 'equal':
+            tag, i1, i2, j1, j2 = codes[0]
+            codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+        if codes[-1][0] == 'equal':
+            tag, i1, i2, j1, j2 = codes[-1]
+            codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+        nn = n + n
+        group = []
+        for tag, i1, i2, j1, j2 in codes:
+            # End the current group and start a new one whenever
+            # there is a large range with no changes.
+            if tag == 'equal' and i2 - i1 > nn:
+                group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+                yield group
+                group = []
+                i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+            group.append((tag, i1, i2, j1, j2))
+        if group and not (len(group) == 1 and group[0][0] == 'equal'):
+            yield group
+    #@+node:ekr.20190804071205.3: *3* differ.get_opcodes
+    def get_opcodes(self):
+        '''
+        Return a list of 5-tuples (tag, i1, i2, j1, j2) describing how to
+        turn a into b, exactly as SequenceMatcher.get_opcodes does.
+        '''
+        if self.opcodes is not None:
+            return self.opcodes
+        i = j = 0
+        self.opcodes = answer = []
+        for ai, bj, size in self.get_matching_blocks():
+            tag = ''
+            if i < ai and j < bj:
+                tag = 'replace'
+            elif i < ai:
+                tag = 'delete'
+            elif j < bj:
+                tag = 'insert'
+            if tag:
+                answer.append((tag, i, ai, j, bj))
+            i, j = ai + size, bj + size
+            if size:
+                answer.append(('equal', ai, i, bj, j))
+        return answer
+    #@+node:ekr.20190804071205.4: *3* differ.myers_matches & myers_split
+    def myers_matches(self, alo, ahi, blo, bhi, matches):
+        '''
+        Append (i, j, n) triples to matches for a[alo:ahi] and b[blo:bhi],
+        using Myers' linear-space divide-and-conquer algorithm.
+        '''
+        a, b = self.a, self.b
+        stack = [(alo, ahi, blo, bhi)]
+        while stack:
+            alo, ahi, blo, bhi = stack.pop()
+            # Strip the common prefix.
+            i, j = alo, blo
+            while i < ahi and j < bhi and a[i] == b[j]:
+                i += 1
+                j += 1
+            if i > alo:
+                matches.append((alo, blo, i - alo))
+            alo, blo = i, j
+            # Strip the common suffix.
+            i, j = ahi, bhi
+            while i > alo and j > blo and a[i - 1] == b[j - 1]:
+                i -= 1
+                j -= 1
+            if i < ahi:
+                matches.append((i, j, ahi - i))
+            ahi, bhi = i, j
+            if alo == ahi or blo == bhi:
+                continue
+            if set(a[alo:ahi]).isdisjoint(b[blo:bhi]):
+                continue # Avoid the worst case of myers_split.
+            split = self.myers_split(alo, ahi, blo, bhi)
+            if split is None:
+                continue # Nothing in common.
+            x, y = split
+            if (x, y) in ((alo, blo), (ahi, bhi)):
+                continue # Should never happen. Guarantees termination.
+            stack.append((x, ahi, y, bhi))
+            stack.append((alo, x, blo, y))
+
+    def myers_split(self, alo, ahi, blo, bhi):
+        '''
+        Find the middle snake of a[alo:ahi] and b[blo:bhi].
+        Return the split point (x, y), or None if there is no common line.
+        '''
+        a, b = self.a, self.b
+        n, m = ahi - alo, bhi - blo
+        max_d = (n + m + 1) // 2
+        v_offset = max_d
+        v_length = 2 * max_d + 2
+        v1 = [-1] * v_length
+        v1[v_offset + 1] = 0
+        v2 = v1[:]
+        delta = n - m
+        front = delta % 2 != 0
+            # If the total number of lines is odd,
+            # the front path will collide with the reverse path.
+        k1start = k1end = k2start = k2end = 0
+        for d in range(max_d):
+            # Walk the front path one step.
+            for k1 in range(-d + k1start, d + 1 - k1end, 2):
+                k1_offset = v_offset + k1
+                if k1 == -d or (k1 != d and v1[k1_offset - 1] < v1[k1_offset + 1]):
+                    x1 = v1[k1_offset + 1]
+                else:
+                    x1 = v1[k1_offset - 1] + 1
+                y1 = x1 - k1
+                while x1 < n and y1 < m and a[alo + x1] == b[blo + y1]:
+                    x1 += 1
+                    y1 += 1
+                v1[k1_offset] = x1
+                if x1 > n:
+                    k1end += 2 # Ran off the right of the graph.
+                elif y1 > m:
+                    k1start += 2 # Ran off the bottom of the graph.
+                elif front:
+                    k2_offset = v_offset + delta - k1
+                    if 0 <= k2_offset < v_length and v2[k2_offset] != -1:
+                        # Mirror x2 onto the top-left coordinate system.
+                        if x1 >= n - v2[k2_offset]:
+                            return alo + x1, blo + y1
+            # Walk the reverse path one step.
+            for k2 in range(-d + k2start, d + 1 - k2end, 2):
+                k2_offset = v_offset + k2
+                if k2 == -d or (k2 != d and v2[k2_offset - 1] < v2[k2_offset + 1]):
+                    x2 = v2[k2_offset + 1]
+                else:
+                    x2 = v2[k2_offset - 1] + 1
+                y2 = x2 - k2
+                while x2 < n and y2 < m and a[ahi - x2 - 1] == b[bhi - y2 - 1]:
+                    x2 += 1
+                    y2 += 1
+                v2[k2_offset] = x2
+                if x2 > n:
+                    k2end += 2 # Ran off the left of the graph.
+                elif y2 > m:
+                    k2start += 2 # Ran off the top of the graph.
+                elif not front:
+                    k1_offset = v_offset + delta - k2
+                    if 0 <= k1_offset < v_length and v1[k1_offset] != -1:
+                        x1 = v1[k1_offset]
+                        y1 = v_offset + x1 - k1_offset
+                        # Mirror x2 onto the top-left coordinate system.
+                        if x1 >= n - x2:
+                            return alo + x1, blo + y1
+        return None
+    #@+node:ekr.20190804071205.5: *3* differ.patience_matches
+    def patience_matches(self, alo, ahi, blo, bhi, matches):
+        '''
+        Append (i, j, n) triples to matches for a[alo:ahi] and b[blo:bhi],
+        using the patience diff algorithm.
+
+        Lines that appear exactly once in both ranges become anchors. The
+        longest increasing run of anchors splits the ranges. Ranges without
+        unique lines fall back to the Myers algorithm.
+        '''
+        a, b = self.a, self.b
+        stack = [(alo, ahi, blo, bhi)]
+        while stack:
+            alo, ahi, blo, bhi = stack.pop()
+            if alo == ahi or blo == bhi:
+                continue
+            # Find the lines that are unique in both ranges.
+            counts = {}
+            for i in range(alo, ahi):
+                line = a[i]
+                n = counts.get(line)
+                counts[line] = (i if n is None else -1)
+            b_index = {}
+            for j in range(blo, bhi):
+                line = b[j]
+                if counts.get(line, -1) != -1:
+                    b_index[line] = (-1 if line in b_index else j)
+            pairs = [(counts[line], j) for line, j in b_index.items() if j != -1]
+            if not pairs:
+                self.myers_matches(alo, ahi, blo, bhi, matches)
+                continue
+            pairs.sort()
+            # Patience sort: find the longest increasing subsequence of j's.
+            tails, tail_js, back = [], [], []
+            for k, (i, j) in enumerate(pairs):
+                pile = bisect.bisect_left(tail_js, j)
+                back.append(tails[pile - 1] if pile else -1)
+                if pile == len(tails):
+                    tails.append(k)
+                    tail_js.append(j)
+                else:
+                    tails[pile] = k
+                    tail_js[pile] = j
+            anchors = []
+            k = tails[-1]
+            while k != -1:
+                anchors.append(pairs[k])
+                k = back[k]
+            anchors.reverse()
+            # Recurse on the ranges between anchors.
+            i0, j0 = alo, blo
+            for i, j in anchors:
+                matches.append((i, j, 1))
+                stack.append((i0, i, j0, j))
+                i0, j0 = i + 1, j + 1
+            stack.append((i0, ahi, j0, bhi))
+    #@-others
+#@+node:ekr.20190804071205.6: ** function: intern_lines
+def intern_lines(*sequences):
+    '''
+    Return a list of lists of ints, one for each sequence of lines.
+    Equal lines map to equal ints.
+    '''
+    d = {}
+    return [[d.setdefault(line, len(d)) for line in lines] for lines in sequences]
+#@+node:ekr.20190805063012.2: ** function: unified_diff
+def unified_diff(a, b, fromfile='', tofile='', n=3, lineterm='\n', algorithm='myers'):
+    '''
+    Like difflib.unified_diff, but much faster for large inputs.
+    a and b are lists of lines.
+    '''
+
+    def format_range(start, stop):
+        '''Convert a range to the "ed" format.'''
+        beginning = start + 1 # lines start numbering with one
+        length = stop - start
+        if length == 1:
+            return '%s' % beginning
+        if not length:
+            beginning -= 1 # empty ranges begin at line just before the range
+        return '%s,%s' % (beginning, length)
+
+    started = False
+    for group in LineDiffer(a, b, algorithm=algorithm).get_grouped_opcodes(n):
+        if not started:
+            started = True
+            yield '--- %s%s' % (fromfile, lineterm)
+            yield '+++ %s%s' % (tofile, lineterm)
+        first, last = group[0], group[-1]
+        yield '@@ -%s +%s @@%s' % (
+            format_range(first[1], last[2]),
+            format_range(first[3], last[4]),
+            lineterm)
+        for tag, i1, i2, j1, j2 in group:
+            if tag == 'equal':
+                for line in a[i1:i2]:
+                    yield ' ' + line
+                continue
+            if tag in ('replace', 'delete'):
+                for line in a[i1:i2]:
+                    yield '-' + line
+            if tag in ('replace', 'insert'):
+                for line in b[j1:j2]:
+                    yield '+' + line
 #@+node:ekr.20180214041049.1: ** Top-level commands and helpers
 #@+node:ekr.20180213104556.1: *3* @g.command(diff-and-open-leo-files)
 @g.command('diff-and-open-leo-files')
@@ -281,6 +281,8 @@ class ParserBaseClass:
         if not aList:
             return 'skip'
         name = aList[0]
+        g.app.config.ifEnvNames.add(name)
+            # The settings snapshot depends on this variable.
         env = os.getenv(name)
         env = env.lower().strip() if env else 'none'
         for s in aList[1:]:
@@ -1040,6 +1042,8 @@ class GlobalConfigManager:
         self.defaultFontFamily = None # Set in gui.getDefaultConfigFont.
         self.enabledPluginsFileName = None
         self.enabledPluginsString = ''
+        self.ifEnvNames = set()
+            # The names of the environment variables used by @ifenv nodes.
         self.inited = False
         self.menusList = []
         self.menusFileName = ''
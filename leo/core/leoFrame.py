@@ -627,8 +627,9 @@ class LeoBody:
         #@+node:ekr.20051026083733.7: *5* << update icons if necessary >>
         redraw_flag = False
         # Update dirty bits.
-        # p.setDirty() sets all cloned and @file dirty bits.
-        if not p.isDirty() and p.setDirty():
+        # c.setDirtyLater marks ancestor @<file> nodes dirty later.
+        if not p.isDirty():
+            c.setDirtyLater(p.v)
             redraw_flag = True
         # Update icons. p.v.iconVal may not exist during unit tests.
         val = p.computeIcon()
@@ -1952,7 +1953,7 @@ class NullTree(LeoTree):
         if not w:
             d[p.v] = w = StringTextWrapper(
                 c=self.c,
-                name='head-%d' % (1 + len(list(d.keys()))))
+                name='head-%d' % (1 + len(d)))
             w.setAllText(p.h)
         return w
     #@+node:ekr.20070228164730: *3* NullTree.editLabel
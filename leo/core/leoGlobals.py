@@ -46,6 +46,7 @@ try:
 except ImportError: # does not exist in jython.
     gettext = None
 import glob
+import hashlib
 import io
 StringIO = io.StringIO
 import imp
@@ -7483,11 +7484,18 @@ def getScript(c, p,
     w = c.frame.body.wrapper
     if not p: p = c.p
     try:
-        if g.app.inBridge:
-            s = p.b
-        elif w and p == c.p and useSelectedText and w.hasSelection():
+        selected = (
+            not g.app.inBridge and
+            w and p == c.p and useSelectedText and w.hasSelection())
+        if selected:
             s = w.getSelectedText()
         else:
+            # Use the cached script if nothing in p's tree has changed.
+            cache = c.scriptCache
+            key = cache.computeKey(c, p, forcePythonSentinels, useSentinels)
+            script = cache.getScript(p.gnx, key)
+            if script is not None:
+                return script
             s = p.b
         # Remove extra leading whitespace so the user may execute indented code.
         s = g.removeExtraLws(s, c.tab_width)
@@ -7495,6 +7503,8 @@ def getScript(c, p,
         script = g.composeScript(c, p, s,
                     forcePythonSentinels=forcePythonSentinels,
                     useSentinels=useSentinels)
+        if not selected:
+            cache.putScript(p.gnx, key, script)
     except Exception:
         g.es_print("unexpected exception in g.getScript")
         g.es_exception()
@@ -7520,6 +7530,85 @@ def composeScript(c, p, s, forcePythonSentinels=True, useSentinels=True):
     # Important, the script is an **encoded string**, not a unicode string.
     g.app.scriptDict["script2"] = script
     return script
+#@+node:ekr.20190809070415.1: *4* class g.ScriptCache
+class ScriptCache:
+    '''
+    A per-commander cache of the scripts composed by g.getScript and of the
+    code objects compiled by c.executeScriptHelper.
+
+    Keys are the gnx's of script roots. An entry remains valid only while
+    the headlines, bodies and structure of the root's tree are unchanged.
+    '''
+
+    def __init__(self):
+        '''Ctor for the ScriptCache class.'''
+        self.d = {}
+            # Keys are gnx's, values are g.Bunch(key, script, script1, code, code_key).
+        self.compile_hits = 0
+        self.compile_misses = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __repr__(self):
+        return (
+            'ScriptCache: %s entries, scripts: %s hits %s misses, '
+            'code: %s hits %s misses' % (
+            len(self.d), self.hits, self.misses,
+            self.compile_hits, self.compile_misses))
+
+    def clear(self):
+        '''Clear the cache, but not the counters.'''
+        self.d = {}
+
+    def computeKey(self, c, p, forcePythonSentinels, useSentinels):
+        '''Return a hash of everything that affects the script composed from p.'''
+        sha1 = hashlib.sha1()
+        sha1.update(g.toEncodedString(repr((
+            forcePythonSentinels, useSentinels, c.tab_width,
+            g.scanForAtLanguage(c, p), g.unitTesting))))
+        level = p.level()
+        for p2 in p.self_and_subtree(copy=False):
+            sha1.update(g.toEncodedString('\0%s\0%s\0%s\0%s' % (
+                p2.level() - level, p2.gnx, p2.h, p2.b)))
+        return sha1.hexdigest()
+
+    def getScript(self, gnx, key):
+        '''Return the cached script for gnx, or None.'''
+        bunch = self.d.get(gnx)
+        if bunch and bunch.key == key:
+            self.hits += 1
+            # Set the globals set by g.composeScript.
+            g.app.scriptDict["script1"] = bunch.script1
+            g.app.scriptDict["script2"] = bunch.script
+            return bunch.script
+        self.misses += 1
+        return None
+
+    def putScript(self, gnx, key, script):
+        '''Cache the script composed from the tree whose root has the given gnx.'''
+        self.d[gnx] = g.Bunch(
+            code=None,
+            code_key=None,
+            key=key,
+            script=script,
+            script1=g.app.scriptDict.get("script1") if script else None,
+        )
+
+    def compile(self, script, fileName, gnx=None):
+        '''
+        Return the code object compiled from script.
+        Reuse the cached code object for gnx if neither script nor fileName
+        has changed.
+        '''
+        bunch = gnx and self.d.get(gnx)
+        if bunch and bunch.code and bunch.code_key == (fileName, script):
+            self.compile_hits += 1
+            return bunch.code
+        self.compile_misses += 1
+        code = compile(script, fileName, 'exec')
+        if bunch:
+            bunch.code, bunch.code_key = code, (fileName, script)
+        return code
 #@+node:ekr.20170123074946.1: *4* g.extractExecutableString
 def extractExecutableString(c, p, s):
     '''
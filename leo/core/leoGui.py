@@ -420,6 +420,9 @@ class NullGui(LeoGui):
     def runMainLoop(self):
         """Run the null gui's main loop."""
         if self.script:
+            if not self.lastFrame:
+                # No settings file was opened: lm.readSettingsSnapshot succeeded.
+                g.app.newCommander(fileName=None, gui=self)
             frame = self.lastFrame
             g.app.log = frame.log
             self.lastFrame.c.executeScript(script=self.script)
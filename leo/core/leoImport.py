@@ -10,7 +10,6 @@ import leo.core.leoNodes as leoNodes
 import csv
 try:
     import docutils
-    import docutils.core
     # print('leoImport.py:',docutils)
 except ImportError:
     docutils = None
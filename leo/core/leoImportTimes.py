@@ -0,0 +1,111 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20190808062731.1: * @file leoImportTimes.py
+'''
+Record the time taken to import each module while Leo starts.
+
+runLeo.py calls install() before importing any other Leo module when the
+--startup-report option is given. LM.writeStartupReport writes the times.
+
+This module must not import any other Leo module.
+'''
+import sys
+import time
+timer = None
+    # The installed ImportTimer, or None.
+#@+others
+#@+node:ekr.20190808062731.2: ** class ImportTimer
+class ImportTimer:
+    '''
+    A sys.meta_path finder that times the execution of each imported module.
+
+    self.modules is a list of tuples (name, start, self_time, cumulative_time),
+    in the order in which the imports finished. The self time excludes the time
+    taken to import other modules.
+    '''
+
+    def __init__(self):
+        '''Ctor for the ImportTimer class.'''
+        self.modules = []
+        self.stack = []
+            # The time taken by nested imports, one entry per active import.
+        self.start_time = time.perf_counter()
+
+    #@+others
+    #@+node:ekr.20190808062731.3: *3* timer.find_spec
+    def find_spec(self, fullname, path, target=None):
+        '''
+        Use the other finders in sys.meta_path to find the spec, then
+        replace the spec's loader by a TimedLoader.
+        '''
+        for finder in sys.meta_path:
+            if finder is self:
+                continue
+            find_spec = getattr(finder, 'find_spec', None)
+            if not find_spec:
+                continue
+            spec = find_spec(fullname, path, target)
+            if spec is None:
+                continue
+            loader = spec.loader
+            if loader and hasattr(loader, 'exec_module'):
+                spec.loader = TimedLoader(self, loader)
+            return spec
+        return None
+    #@+node:ekr.20190808062731.4: *3* timer.install & uninstall
+    def install(self):
+        '''Time all imports from now on.'''
+        if self not in sys.meta_path:
+            sys.meta_path.insert(0, self)
+
+    def uninstall(self):
+        '''Stop timing imports.'''
+        if self in sys.meta_path:
+            sys.meta_path.remove(self)
+    #@-others
+#@+node:ekr.20190808062731.5: ** class TimedLoader
+class TimedLoader:
+    '''A wrapper for a loader that times the loader's exec_module method.'''
+
+    def __init__(self, timer, loader):
+        '''Ctor for the TimedLoader class.'''
+        self.loader = loader
+        self.timer = timer
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        create_module = getattr(self.loader, 'create_module', None)
+        return create_module(spec) if create_module else None
+
+    def exec_module(self, module):
+        timer = self.timer
+        timer.stack.append(0.0)
+        t1 = time.perf_counter()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            t2 = time.perf_counter()
+            cumulative = t2 - t1
+            nested = timer.stack.pop()
+            if timer.stack:
+                timer.stack[-1] += cumulative
+            timer.modules.append((module.__name__, t1, cumulative - nested, cumulative))
+            # Other code, including pkg_resources, must see the actual loader.
+            module.__loader__ = self.loader
+            spec = getattr(module, '__spec__', None)
+            if spec:
+                spec.loader = self.loader
+#@+node:ekr.20190808062731.6: ** install
+def install():
+    '''Create and install the global ImportTimer.'''
+    global timer
+    if not timer:
+        timer = ImportTimer()
+        timer.install()
+    return timer
+#@-others
+#@@language python
+#@@tabwidth -4
+#@@pagewidth 70
+#@-leo
@@ -916,32 +916,45 @@ class Position:
         '''Adjust position p before unlinking p2.'''
         # p will change if p2 is a previous sibling of p or
         # p2 is a previous sibling of any ancestor of p.
-        p = self; sib = p.copy()
+        p = self
         # A special case for previous siblings.
         # Adjust p._childIndex, not the stack's childIndex.
-        while sib.hasBack():
-            sib.moveToBack()
-            if sib == p2:
-                p._childIndex -= 1
-                return
+        if (p.v and p2._childIndex < p._childIndex and
+            p2._isSiblingBefore(p.v, p._childIndex, p.stack)
+        ):
+            p._childIndex -= 1
+            return
         # Adjust p's stack.
         stack = []; changed = False; i = 0
         while i < len(p.stack):
             v, childIndex = p.stack[i]
-            p3 = Position(v=v, childIndex=childIndex, stack=stack[: i])
-            while p3:
-                if p2 == p3:
-                    # 2011/02/25: compare full positions, not just vnodes.
-                    # A match with the to-be-moved node.
-                    stack.append((v, childIndex - 1),)
-                    changed = True
-                    break # terminate only the inner loop.
-                p3.moveToBack()
+            if p2._isSiblingBefore(v, childIndex, stack):
+                # 2011/02/25: compare full positions, not just vnodes.
+                # A match with the to-be-moved node.
+                stack.append((v, childIndex - 1),)
+                changed = True
             else:
                 stack.append((v, childIndex),)
             i += 1
         if changed:
             p.stack = stack
+    #@+node:ekr.20190815064512.1: *4* p._isSiblingBefore
+    def _isSiblingBefore(self, v, n, stack):
+        '''
+        Return True if p is the position (v, n, stack) or one of its previous
+        siblings, that is, if p.moveToBack would reach p from that position.
+
+        Unlike p.moveToBack, this takes constant time for wide nodes.
+        '''
+        p = self
+        i = p._childIndex
+        if not (v and p.v and 0 <= i <= n) or p.stack != stack:
+            return False
+        if i == n:
+            return p.v == v
+        parent_v = stack[-1][0] if stack else v.context.hiddenRootNode
+        children = parent_v.children
+        return n <= len(children) and children[i] == p.v
     #@+node:ekr.20080416161551.214: *4* p._linkAfter
     def _linkAfter(self, p_after):
         '''Link self after p_after.'''
@@ -1384,13 +1397,13 @@ class Position:
         """
         p = self
         p.setDirty() # Mark @file nodes dirty!
-        sib = p.copy()
-        while sib.hasNext():
-            sib.moveToNext()
-            if sib == newNode:
-                # Adjust newNode._childIndex if newNode is a following sibling of p.
+        if newNode and p.v and newNode._childIndex > p._childIndex and newNode.stack == p.stack:
+            # Adjust newNode._childIndex if newNode is a following sibling of p.
+            # Don't search p's siblings: p's parent may have many children.
+            n = newNode._childIndex
+            children = p._parentVnode().children
+            if n < len(children) and children[n] == newNode.v:
                 newNode._childIndex -= 1
-                break
         p._unlink()
     #@+node:ekr.20040303175026.3: *4* p.insertAfter
     def insertAfter(self):
@@ -1646,20 +1659,16 @@ class Position:
     #@+node:ekr.20040306220634: *4* p.VNode proxies
     #@+node:ekr.20131222112420.16371: *5* p.contract/expand/isExpanded
     def contract(self):
-        '''Contract p.v and clear p.v.expandedPositions list.'''
+        '''Contract p.v and remove p from p.v.expandedPositions.'''
         p, v = self, self.v
-        v.expandedPositions = [z for z in v.expandedPositions if z != p]
+        v.expandedPositions.pop(p.key(), None)
         v.contract()
 
     def expand(self):
         p = self
         v = self.v
-        v.expandedPositions = [z for z in v.expandedPositions if z != p]
-        for p2 in v.expandedPositions:
-            if p == p2:
-                break
-        else:
-            v.expandedPositions.append(p.copy())
+        v.pruneExpandedPositions()
+        v.expandedPositions[p.key()] = p.copy()
         v.expand()
 
     def isExpanded(self):
@@ -1759,6 +1768,13 @@ class Position:
 
         p = self
         dirtyVnodeList = []
+        bunch = p.v.context.bulkEditBunch
+        if bunch:
+            # c.endBulkEdit will mark the nodes dirty.
+            bunch.ancestorVnodes.add(p.v)
+            if setDescendentsDirty:
+                bunch.treeVnodes.add(p.v)
+            return dirtyVnodeList
         # Calculate all nodes that are joined to p or parents of such nodes.
         nodes = p.findAllPotentiallyDirtyNodes()
         if setDescendentsDirty:
@@ -1787,6 +1803,13 @@ class Position:
         enough.
         '''
         p = self; dirtyVnodeList = []
+        bunch = p.v.context.bulkEditBunch
+        if bunch:
+            # c.endBulkEdit will mark the nodes dirty.
+            bunch.dirtyVnodes.add(p.v)
+            if setDescendentsDirty:
+                bunch.treeVnodes.add(p.v)
+            return dirtyVnodeList
         if not p.v.isDirty():
             p.v.setDirty()
             dirtyVnodeList.append(p.v)
@@ -1877,6 +1900,62 @@ class PosList(list):
     #@-others
 
 Poslist = PosList # compatibility.
+#@+node:ekr.20190815064512.2: ** class ChildIndex
+class ChildIndex:
+    '''
+    A map from the children of a VNode with many children to their indices
+    in v.children. See v.indexOfChild.
+
+    v._addLink, v._addCopiedLink and v._cutLink record insertions and
+    deletions. Lookups adjust indices for the recorded changes, so the map
+    need not be rebuilt after every change.
+    '''
+    #@+others
+    #@+node:ekr.20190815064512.3: *3* ChildIndex.__init__
+    def __init__(self, children):
+        n = len(children)
+        self.children = children
+            # The list described by this map.
+        self.d = dict(zip(reversed(children), range(n - 1, -1, -1)))
+            # Keys are vnodes, values are their first indices when the map was made.
+        self.added = {}
+            # Keys are vnodes inserted later, values are tuples (index, len(self.edits)).
+        self.edits = []
+            # A list of tuples (index, delta): delta is 1 for insertions, -1 for deletions.
+        self.max_edits = max(32, int(n ** 0.5))
+            # The cost of adjusting indices vs. the cost of rebuilding the map.
+    #@+node:ekr.20190815064512.4: *3* ChildIndex.add & cut
+    def add(self, v, n):
+        '''Record the insertion of v at index n.'''
+        self.edits.append((n, 1),)
+        self.added[v] = n, len(self.edits)
+
+    def cut(self, n):
+        '''Record the deletion of the child at index n.'''
+        self.edits.append((n, -1),)
+    #@+node:ekr.20190815064512.5: *3* ChildIndex.index
+    def index(self, v):
+        '''
+        Return v's index, adjusted for all recorded insertions and deletions.
+        Return None if v is unknown or if v was deleted.
+        '''
+        data = self.added.get(v)
+        if data:
+            i, k = data
+        else:
+            i, k = self.d.get(v), 0
+            if i is None:
+                return None
+        for n, delta in self.edits[k:]:
+            if delta > 0:
+                if i >= n:
+                    i += 1
+            elif i > n:
+                i -= 1
+            elif i == n:
+                return None
+        return i
+    #@-others
 #@+node:ekr.20031218072017.3341: ** class VNode
 #@@nobeautify
 
@@ -1898,6 +1977,11 @@ class VNode:
     dirtyBit = 0x200
     writeBit = 0x400
     orphanBit = 0x800 # True: error in @<file> tree prevented it from being written.
+    # Child indices...
+    childIndexThreshold = 1000
+        # v.indexOfChild uses a ChildIndex if v has at least this many children.
+    childIndexMap = None
+        # A ChildIndex, set only for nodes with many children.
     #@-<< VNode constants >>
     #@+others
     #@+node:ekr.20031218072017.3342: *3* v.Birth & death
@@ -1927,8 +2011,10 @@ class VNode:
         self.context = context # The context containing context.hiddenRootNode.
             # Required so we can compute top-level siblings.
             # It is named .context rather than .c to emphasize its limited usage.
-        self.expandedPositions = []
-            # Positions that should be expanded.
+        self.expandedPositions = {}
+            # Keys are p.key(); values are positions that should be expanded.
+        self.expandedGeneration = 0
+            # The value of c.frame.tree.generation when v.expandedPositions was pruned.
         self.insertSpot = None
             # Location of previous insert point.
         self.scrollBarSpot = None
@@ -2198,6 +2284,34 @@ class VNode:
             self.head_unicode_warning = True
             g.internalError('not a string', repr(self._headString))
         return g.toUnicode(self._headString)
+    #@+node:ekr.20190815064512.6: *4* v.indexOfChild
+    def indexOfChild(self, child):
+        '''
+        Return the index of child in v.children, or -1 if child is not a
+        child of v. If child appears more than once, return any of its indices.
+
+        This takes constant time for nodes with many children.
+        '''
+        v = self
+        children = v.children
+        d = None
+        if len(children) >= v.childIndexThreshold:
+            d = v.childIndexMap
+            if not d or d.children is not children or len(d.edits) > d.max_edits:
+                d = v.childIndexMap = ChildIndex(children)
+            i = d.index(child)
+            if i is not None:
+                if 0 <= i < len(children) and children[i] is child:
+                    return i
+                # Something changed v.children directly. Rebuild the map later.
+                d = v.childIndexMap = None
+        try:
+            i = children.index(child)
+        except ValueError:
+            return -1
+        if d:
+            d.added[child] = i, len(d.edits)
+        return i
     #@+node:ekr.20131223064351.16351: *4* v.isNthChildOf
     def isNthChildOf(self, n, parent_v):
         '''Return True if v is the n'th child of parent_v.'''
@@ -2268,6 +2382,11 @@ class VNode:
 
         v = self
         dirtyVnodeList = []
+        bunch = v.context.bulkEditBunch
+        if bunch:
+            # c.endBulkEdit will mark the nodes dirty.
+            bunch.ancestorVnodes.add(v)
+            return dirtyVnodeList
         # Calculate all nodes that are joined to p or parents of such nodes.
         nodes = v.findAllPotentiallyDirtyNodes()
         dirtyVnodeList = [v for v in nodes
@@ -2312,6 +2431,22 @@ class VNode:
     def isExpanded(self):
         '''Return True if the VNode expansion bit is set.'''
         return (self.statusBits & self.expandedBit) != 0
+    #@+node:ekr.20190817063012.1: *5* v.pruneExpandedPositions
+    def pruneExpandedPositions(self):
+        '''
+        Remove non-existent positions from v.expandedPositions, but only if
+        the outline has changed since the last time.
+        '''
+        v = self
+        c = v.context
+        generation = c.frame.tree.generation
+        if v.expandedGeneration == generation:
+            return
+        v.expandedGeneration = generation
+        if v.expandedPositions:
+            v.expandedPositions = {
+                key: p for key, p in v.expandedPositions.items()
+                    if c.positionExists(p)}
     #@+node:ekr.20031218072017.3396: *5* v.initStatus
     def initStatus(self, status):
         self.statusBits = status
@@ -2409,6 +2544,8 @@ class VNode:
 
     def setBodyString(self, s):
         v = self
+        if v.context.bulkEditBunch:
+            v._saveBulkEditInfo()
         if isinstance(s, str):
             v._bodyString = s
             return
@@ -2425,6 +2562,8 @@ class VNode:
         # Fix bug: https://bugs.launchpad.net/leo-editor/+bug/1245535
         # API allows headlines to contain newlines.
         v = self
+        if v.context.bulkEditBunch:
+            v._saveBulkEditInfo()
         if g.isUnicode(s):
             v._headString = s.replace('\n','')
             return
@@ -2467,12 +2606,17 @@ class VNode:
     def _addCopiedLink(self, childIndex, parent_v):
         '''Adjust links after adding a link to v.'''
         v = self
+        if v.context.bulkEditBunch:
+            v._saveBulkEditInfo(parent_v)
         v.context.frame.tree.generation += 1
         parent_v.childrenModified()
             # For a plugin.
         # Update parent_v.children & v.parents.
         parent_v.children.insert(childIndex, v)
+        parent_v._addChildIndex(v, childIndex)
         v.parents.append(parent_v)
+        v.context.uncheckedVnodes.add(v)
+            # For c.checkOutline(incremental=True).
         # Set zodb changed flags.
         v._p_changed = 1
         parent_v._p_changed = 1
@@ -2480,12 +2624,17 @@ class VNode:
     def _addLink(self, childIndex, parent_v):
         '''Adjust links after adding a link to v.'''
         v = self
+        if v.context.bulkEditBunch:
+            v._saveBulkEditInfo(parent_v)
         v.context.frame.tree.generation += 1
         parent_v.childrenModified()
             # For a plugin.
         # Update parent_v.children & v.parents.
         parent_v.children.insert(childIndex, v)
+        parent_v._addChildIndex(v, childIndex)
         v.parents.append(parent_v)
+        v.context.uncheckedVnodes.add(v)
+            # For c.checkOutline(incremental=True).
         # Set zodb changed flags.
         v._p_changed = 1
         parent_v._p_changed = 1
@@ -2499,18 +2648,33 @@ class VNode:
     def _addParentLinks(self, parent):
 
         v = self
+        if v.context.bulkEditBunch:
+            v._saveBulkEditInfo()
         v.parents.append(parent)
         if len(v.parents) == 1:
             for child in v.children:
                 child._addParentLinks(parent=v)
+    #@+node:ekr.20190815064512.7: *4* v._addChildIndex
+    def _addChildIndex(self, child, n):
+        '''Update v.childIndexMap after inserting child at index n of v.children.'''
+        v = self
+        d = v.childIndexMap
+        if d and d.children is v.children:
+            d.add(child, min(n, len(v.children) - 1))
+                # list.insert appends if n is too large.
     #@+node:ekr.20090804184658.6128: *4* v._cutLink & _cutParentLinks
     def _cutLink(self, childIndex, parent_v):
         '''Adjust links after cutting a link to v.'''
         v = self
+        if v.context.bulkEditBunch:
+            v._saveBulkEditInfo(parent_v)
         v.context.frame.tree.generation += 1
         parent_v.childrenModified()
         assert parent_v.children[childIndex] == v
         del parent_v.children[childIndex]
+        d = parent_v.childIndexMap
+        if d and d.children is parent_v.children:
+            d.cut(childIndex)
         if parent_v in v.parents:
             try:
                 v.parents.remove(parent_v)
@@ -2530,10 +2694,26 @@ class VNode:
     def _cutParentLinks(self, parent):
 
         v = self
+        if v.context.bulkEditBunch:
+            v._saveBulkEditInfo()
         v.parents.remove(parent)
         if not v.parents:
             for child in v.children:
                 child._cutParentLinks(parent=v)
+    #@+node:ekr.20190822062512.5: *4* v._saveBulkEditInfo
+    def _saveBulkEditInfo(self, *vnodes):
+        '''
+        Save the undo info for v and all vnodes in vnodes before the first
+        change to their links or contents during a bulk edit. See c.bulkEdit.
+        '''
+        v = self
+        c = v.context; u = c.undoer
+        bunch = c.bulkEditBunch
+        for v in (v,) + vnodes:
+            if v not in bunch.savedVnodes:
+                bunch.savedVnodes.add(v)
+                bunch.undoData.oldTree.append(
+                    (v, u.createVnodeUndoInfo(v), u.createTnodeUndoInfo(v)))
     #@+node:ekr.20180709064515.1: *4* v._deleteAllChildren
     def _deleteAllChildren(self):
         '''
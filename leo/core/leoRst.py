@@ -17,37 +17,16 @@ available.'''
 #@+<< imports >>
 #@+node:ekr.20100908120927.5971: ** << imports >> (leoRst)
 import leo.core.leoGlobals as g
+import collections
+import concurrent.futures
+import hashlib
+import traceback
 verbose = 'plugins' in g.app.debug
-try:
-    import docutils
-    import docutils.core
-except ImportError:
-    docutils = None
-if verbose:
-    print('leoRst3.py: docutils: %s' % docutils)
-if docutils:
-    try:
-        from docutils import parsers
-        if verbose or not parsers: print('leoRst.py', parsers)
-        from docutils.parsers import rst
-        if verbose or not rst: print('leoRst.py', rst)
-        if not parsers or not rst:
-            docutils = None
-    except ImportError:
-        docutils = None
-    except Exception:
-        g.es_exception()
-        docutils = None
+docutils = None
+    # Importing docutils is slow. load_docutils imports it when needed.
 import html.parser as HTMLParser
-try:
-    import leo.plugins.mod_http as mod_http
-except ImportError:
-    mod_http = None
-except Exception:
-    # Don't let a problem with a plugin crash Leo's core!
-    # g.es_print('leoRst: can not import leo.plugins.mod_http')
-    # g.es_exception()
-    mod_http = None
+mod_http = None
+    # load_mod_http imports leo.plugins.mod_http when needed.
 import pprint
 import re
 try:
@@ -87,18 +66,92 @@ code_block.arguments = (
     1, # Number of required arguments.
     0, # Number of optional arguments.
     0) # True if final argument may contain whitespace.
-# A mapping from option name to conversion function.
-if docutils:
-    code_block.options = {
-        'language':
-        docutils.parsers.rst.directives.unchanged
-            # Return the text argument, unchanged.
-    }
-    code_block.content = 1 # True if content is allowed.
-    # Register the directive with docutils.
-    docutils.parsers.rst.directives.register_directive('code-block', code_block)
-else:
-    code_block.options = {}
+code_block.options = {}
+    # A mapping from option name to conversion function.
+    # load_docutils sets this.
+#@+node:ekr.20190808062731.8: ** load_docutils & load_mod_http
+docutils_loaded = False
+
+def load_docutils():
+    '''
+    Import docutils and register the code-block directive.
+    Return the docutils module, or None if docutils is not available.
+    '''
+    global docutils, docutils_loaded
+    if docutils_loaded:
+        return docutils
+    docutils_loaded = True
+    try:
+        import docutils
+        import docutils.core
+    except ImportError:
+        docutils = None
+    if verbose:
+        print('leoRst3.py: docutils: %s' % docutils)
+    if docutils:
+        try:
+            from docutils import parsers
+            if verbose or not parsers: print('leoRst.py', parsers)
+            from docutils.parsers import rst
+            if verbose or not rst: print('leoRst.py', rst)
+            if not parsers or not rst:
+                docutils = None
+        except ImportError:
+            docutils = None
+        except Exception:
+            g.es_exception()
+            docutils = None
+    if docutils:
+        code_block.options = {
+            'language':
+            docutils.parsers.rst.directives.unchanged
+                # Return the text argument, unchanged.
+        }
+        code_block.content = 1 # True if content is allowed.
+        # Register the directive with docutils.
+        docutils.parsers.rst.directives.register_directive('code-block', code_block)
+    return docutils
+
+mod_http_loaded = False
+
+def load_mod_http():
+    '''Import the mod_http plugin. Return the module or None.'''
+    global mod_http, mod_http_loaded
+    if mod_http_loaded:
+        return mod_http
+    mod_http_loaded = True
+    try:
+        import leo.plugins.mod_http as mod_http
+    except ImportError:
+        mod_http = None
+    except Exception:
+        # Don't let a problem with a plugin crash Leo's core!
+        # g.es_print('leoRst: can not import leo.plugins.mod_http')
+        # g.es_exception()
+        mod_http = None
+    return mod_http
+#@+node:ekr.20190803082114.6: ** publish_rst
+def publish_rst(source, writer_name, overrides):
+    '''
+    Convert the rST source with the named docutils writer.
+    Return (result, error), where error is None or an error message.
+
+    This is a pure function of its arguments, so it may run in any process.
+    '''
+    load_docutils()
+    try:
+        result = docutils.core.publish_string(source=source,
+            reader_name='standalone',
+            parser_name='restructuredtext',
+            writer_name=writer_name,
+            settings_overrides=overrides)
+        if g.isBytes(result):
+            result = g.toUnicode(result)
+        return result, None
+    except docutils.ApplicationError as error:
+        return None, 'Docutils error:\n%s' % error
+    except Exception:
+        return None, 'Unexpected docutils exception\n%s' % traceback.format_exc()
 #@+node:ekr.20090502071837.33: ** class RstCommands
 class RstCommands:
     '''
@@ -127,8 +180,24 @@ class RstCommands:
         self.c = c
         # Debugging and statistics.
         self.debug = False # Set in reloadSettings.
+        self.n_cached = 0
+            # Number of nodes written from self.fragment_cache.
+        self.n_unchanged = 0
+            # Number of files for which docutils was not called.
         self.n_written = 0
             # Number of files written.
+        # Caches.
+        self.d0_key = None
+            # A string representing self.d0, for fragmentKey.
+        self.docutils_jobs = None
+            # None, or a list of deferred calls to docutils.
+        self.fragment_cache = collections.OrderedDict()
+            # Keys are hashes computed by fragmentKey.
+            # Values are the rST sources written by writeNode.
+            # The least recently used entries come first.
+        self.fragment_cache_size = 10000
+            # The maximum number of entries in self.fragment_cache.
+        self.parallel_docutils = True # Set in reloadSettings.
         # Warning flags.
         self.silverCityWarningGiven = False
         # Settings.
@@ -186,7 +255,9 @@ class RstCommands:
 
     def reloadSettings(self):
         '''RstCommand.reloadSettings'''
-        self.debug = self.c.config.getBool('rst3-debug', default=False)
+        c = self.c
+        self.debug = c.config.getBool('rst3-debug', default=False)
+        self.parallel_docutils = c.config.getBool('rst3-parallel-docutils', default=True)
         
     #@+node:ekr.20150509035745.1: *4* rst.cmd (decorator)
     def cmd(name):
@@ -298,7 +369,7 @@ class RstCommands:
                         d[key] = val
                     break
         # Special warning for mod_http plugin.
-        if not mod_http and c.config.getBool('http-server-support'):
+        if c.config.getBool('http-server-support') and not load_mod_http():
             g.error('No http_server_support: can not import mod_http plugin')
             d['http_server_support'] = False
     #@+node:ekr.20100813041139.5920: *3* rst.Entry points
@@ -503,10 +574,21 @@ class RstCommands:
         '''Write all @rst nodes.'''
         t1 = time.time()
         self.rst_nodes = []
-        self.n_written = 0
-        self.processTopTree(self.c.p)
+        self.n_cached = self.n_unchanged = self.n_written = 0
+        self.docutils_jobs = [] if self.parallel_docutils else None
+        try:
+            self.processTopTree(self.c.p)
+            self.runDocutilsJobs()
+        finally:
+            self.docutils_jobs = None
         t2 = time.time()
         g.es_print('rst3: %s files in %4.2f sec.' % (self.n_written, t2 - t1))
+        if self.n_unchanged:
+            g.es_print('rst3: %s unchanged file%s' % (
+                self.n_unchanged, g.plural(self.n_unchanged)))
+        if self.debug:
+            g.es_print('rst3: %s cached node%s' % (
+                self.n_cached, g.plural(self.n_cached)))
         return self.rst_nodes # A list of positions.
     #@+node:ekr.20090502071837.62: *5* rst.processTopTree
     def processTopTree(self, p, justOneFile=False):
@@ -568,6 +650,7 @@ class RstCommands:
             self.stringOutput contains docutils output if docutils called.
         '''
         self.n_written += 1
+        self.d0_key = None
         self.topNode = p.copy()
         self.topLevel = p.level()
         self.initSettings(p.copy()) # 2017/02/19
@@ -591,6 +674,35 @@ class RstCommands:
                 callDocutils=callDocutils,
                 toString=toString,
                 writeIntermediateFile=writeIntermediateFile)
+    #@+node:ekr.20190803082114.1: *5* rst.runDocutilsJobs
+    def runDocutilsJobs(self):
+        '''
+        Call docutils for all deferred jobs, in separate processes if
+        possible. Docutils' conversions are independent of each other.
+        '''
+        jobs, self.docutils_jobs = self.docutils_jobs or [], None
+        if not jobs:
+            return
+        args = [(job.source, job.writer_name, job.overrides) for job in jobs]
+        results = None
+        if len(jobs) > 1:
+            try:
+                with concurrent.futures.ProcessPoolExecutor() as executor:
+                    futures = [executor.submit(publish_rst, *z) for z in args]
+                    results = [z.result() for z in futures]
+            except Exception:
+                # Fall back to calling docutils in this process.
+                g.es_exception()
+        if results is None:
+            results = [publish_rst(*z) for z in args]
+        for job, (s, error) in zip(jobs, results):
+            if error:
+                g.error(error)
+            elif self.writeDocutilsOutput(job.fn, s, job.ext, job.key):
+                # The options of job.p are no longer available.
+                if not job.silent:
+                    f = g.blue if job.verbose else g.pr
+                    f('wrote: %s' % self.c.os_path_finalize(job.fn))
     #@+node:ekr.20100822092546.5835: *5* rst.write_slides & helper
     def write_slides(self, p, toString=False):
         '''Convert p's children to slides.'''
@@ -1038,10 +1150,55 @@ class RstCommands:
         ):
             p.moveToThreadNext()
         else:
-            self.http_addNodeMarker(p)
-            self.writeHeadline(p)
-            self.writeBody(p)
+            key = self.fragmentKey(p)
+            if key is None:
+                self.http_addNodeMarker(p)
+                self.writeHeadline(p)
+                self.writeBody(p)
+            else:
+                s = self.fragment_cache.get(key)
+                if s is None:
+                    outputFile, self.outputFile = self.outputFile, StringIO()
+                    try:
+                        self.writeHeadline(p)
+                        self.writeBody(p)
+                        s = self.outputFile.getvalue()
+                    finally:
+                        self.outputFile = outputFile
+                    self.fragment_cache[key] = s
+                    while len(self.fragment_cache) > self.fragment_cache_size:
+                        # Forget the least recently used fragments.
+                        self.fragment_cache.popitem(last=False)
+                else:
+                    self.fragment_cache.move_to_end(key)
+                    self.n_cached += 1
+                self.write(s)
             p.moveToThreadNext()
+    #@+node:ekr.20190803082114.2: *7* rst.fragmentKey
+    def fragmentKey(self, p):
+        '''
+        Return a hash of everything that affects the rST that writeNode
+        writes for p, or None if the result must not be cached.
+        '''
+        if (
+            self.atAutoWrite or
+            self.getOption(p, 'http_server_support') or
+            self.getOption(p, 'expand_noweb_references')
+        ):
+            return None
+        if self.d0_key is None:
+            self.d0_key = repr(sorted(self.d0.items()))
+        # The options in effect at p. See getOption.
+        options = [sorted(self.scriptSettingsDict.items())]
+        root = self.root if self.root and p.isAncestorOf(self.root) else p
+        for p2 in root.self_and_parents(copy=False):
+            options.append(sorted(self.dd.get(p2.v, {}).items()))
+        options.append(sorted(self.dd.get(p.v, {}).items()))
+        data = repr((
+            p.h, p.b, p.level() - self.topLevel, p == self.topNode,
+            self.code_block_string, self.encoding, self.d0_key, options,
+        ))
+        return hashlib.sha1(g.toEncodedString(data)).hexdigest()
     #@+node:ekr.20090502071837.86: *6* rst.writePreformat
     def writePreformat(self, p):
         '''Write p's body text lines as if preformatted.
@@ -1382,6 +1539,9 @@ class RstCommands:
             self.getOption(p, 'http_server_support') and
             self.getOption(p, 'generate_rst')
         ):
+            if not load_mod_http():
+                g.error('No http_server_support: can not import mod_http plugin')
+                return
             self.set_initial_http_attributes(filename, p)
             self.find_anchors(p)
             if justOneFile:
@@ -1487,19 +1647,32 @@ class RstCommands:
             if not toString:
                 self.createIntermediateFile(fn, p, self.source)
         if callDocutils and ext in ('.htm', '.html', '.tex', '.pdf', '.s5', '.odt'):
-            self.stringOutput = s = self.writeToDocutils(p, self.source, ext)
-            if s and isHtml:
-                self.stringOutput = s = self.addTitleToHtml(s)
-            if not s:
-                return
             if toString:
-                if not g.isUnicode(s):
-                    s = g.toUnicode(s, 'utf-8')
-            else:
-                # Fixes bug 923301: Unicode error when executing 'rst3' command
-                s = g.toEncodedString(s, 'utf-8')
-                with open(fn, 'wb') as f:
-                    f.write(s)
+                self.stringOutput = s = self.writeToDocutils(p, self.source, ext)
+                if s and isHtml:
+                    self.stringOutput = s = self.addTitleToHtml(s)
+                return
+            args = self.getDocutilsArgs(p, ext)
+            if not args:
+                return
+            # Don't call docutils if the source and args are unchanged.
+            key = self.docutilsKey(self.source, ext, args)
+            if self.isUnchangedOutput(fn, key):
+                self.n_unchanged += 1
+                return
+            writer, writer_name, overrides = args
+            if self.docutils_jobs is not None and writer is None:
+                # runDocutilsJobs will call docutils.
+                self.docutils_jobs.append(g.Bunch(
+                    ext=ext, fn=fn, key=key, overrides=overrides,
+                    silent=self.getOption(p, 'silent'),
+                    source=self.source,
+                    verbose=self.getOption(p, 'verbose'),
+                    writer_name=writer_name,
+                ))
+                return
+            s = self.writeToDocutils(p, self.source, ext, args=args)
+            if self.writeDocutilsOutput(fn, s, ext, key):
                 self.report(fn, p)
                 # self.http_endTree(fn,p,justOneFile=justOneFile)
     #@+node:ekr.20100813041139.5913: *5* rst.addTitleToHtml
@@ -1532,6 +1705,29 @@ class RstCommands:
         if not ok:
             g.error('did not create:', theDir)
         return ok
+    #@+node:ekr.20190803082114.3: *5* rst.docutilsKey & isUnchangedOutput
+    def docutilsKey(self, source, ext, args):
+        '''Return a hash of everything that affects docutils' output.'''
+        writer, writer_name, overrides = args
+        stylesheet = overrides.get('stylesheet')
+        if stylesheet and g.os_path_exists(stylesheet):
+            mtime = g.os_path_getmtime(stylesheet)
+        else:
+            mtime = None
+        data = repr((
+            source, ext, writer_name, sorted(overrides.items()), mtime,
+            docutils.__version__,
+        ))
+        return hashlib.sha1(g.toEncodedString(data)).hexdigest()
+
+    def isUnchangedOutput(self, fn, key):
+        '''
+        Return True if fn was written from sources with the given key
+        and has not been changed since.
+        '''
+        if not g.os_path_exists(fn):
+            return False
+        return self.c.db.get('rst3-docutils:%s' % fn) == (key, g.os_path_getmtime(fn))
     #@+node:ekr.20100813041139.5912: *5* rst.createIntermediateFile
     def createIntermediateFile(self, fn, p, s):
         '''Write s to to the file whose name is fn.'''
@@ -1542,10 +1738,58 @@ class RstCommands:
         with open(fn, 'w', encoding=self.encoding) as f:
             f.write(s)
         self.report(fn, p)
-    #@+node:ekr.20090502071837.65: *5* rst.writeToDocutils (sets argv) & helper
-    def writeToDocutils(self, p, s, ext):
+    #@+node:ekr.20190803082114.4: *5* rst.writeDocutilsOutput
+    def writeDocutilsOutput(self, fn, s, ext, key):
+        '''
+        Write s, the output of docutils, to fn.
+        Return True if fn was written.
+        '''
+        if s and ext in ('.html', '.htm'):
+            s = self.addTitleToHtml(s)
+        self.stringOutput = s
+        if not s:
+            return False
+        # Fixes bug 923301: Unicode error when executing 'rst3' command
+        s = g.toEncodedString(s, 'utf-8')
+        with open(fn, 'wb') as f:
+            f.write(s)
+        self.c.db['rst3-docutils:%s' % fn] = (key, g.os_path_getmtime(fn))
+        return True
+    #@+node:ekr.20090502071837.65: *5* rst.writeToDocutils (sets argv) & helpers
+    def writeToDocutils(self, p, s, ext, args=None):
         '''Send s to docutils using the writer implied by ext and return the result.'''
-        if not docutils:
+        if args is None:
+            args = self.getDocutilsArgs(p, ext)
+        if not args:
+            return None
+        writer, writer_name, overrides = args
+        try:
+            # All paths now come through here.
+            result = None # Ensure that result is defined.
+            result = docutils.core.publish_string(source=s,
+                    reader_name='standalone',
+                    parser_name='restructuredtext',
+                    writer=writer,
+                    writer_name=writer_name,
+                    settings_overrides=overrides)
+            if g.isBytes(result):
+                result = g.toUnicode(result)
+        except docutils.ApplicationError as error:
+            # g.error('Docutils error (%s):' % (error.__class__.__name__))
+            g.error('Docutils error:')
+            g.blue(error)
+        except Exception:
+            g.es_print('Unexpected docutils exception')
+            g.es_exception()
+        return result
+    #@+node:ekr.20190803082114.5: *6* rst.getDocutilsArgs
+    def getDocutilsArgs(self, p, ext):
+        '''
+        Return (writer, writer_name, overrides), the arguments to
+        docutils.core.publish_string implied by p's options and ext.
+        Return None on errors.
+        '''
+        if not load_docutils():
             g.error('writeToDocutils: docutils not present')
             return None
         openDirectory = self.c.frame.openDirectory
@@ -1613,25 +1857,7 @@ class RstCommands:
             g.es_print('open path:', openDirectory)
             if rel_stylesheet_path:
                 g.es_print('relative path:', rel_stylesheet_path)
-        try:
-            # All paths now come through here.
-            result = None # Ensure that result is defined.
-            result = docutils.core.publish_string(source=s,
-                    reader_name='standalone',
-                    parser_name='restructuredtext',
-                    writer=writer,
-                    writer_name=writer_name,
-                    settings_overrides=overrides)
-            if g.isBytes(result):
-                result = g.toUnicode(result)
-        except docutils.ApplicationError as error:
-            # g.error('Docutils error (%s):' % (error.__class__.__name__))
-            g.error('Docutils error:')
-            g.blue(error)
-        except Exception:
-            g.es_print('Unexpected docutils exception')
-            g.es_exception()
-        return result
+        return writer, writer_name, overrides
     #@+node:ekr.20090502071837.66: *6* rst.handleMissingStyleSheetArgs
     def handleMissingStyleSheetArgs(self, p, s=None):
         '''
@@ -25,11 +25,15 @@ Settings:
 - @string shadow_prefix (default: x): prefix of shadow files.
   This prefix allows the shadow file and the original file to have different names.
   This is useful for name-based tools like py.test.
+
+- @string shadow-diff (default: myers): the diff algorithm used to propagate
+  changes from public files to private files: myers, patience or difflib.
 '''
 #@-<< docstring >>
 #@+<< imports >>
 #@+node:ekr.20080708094444.52: ** << imports >> (leoShadow)
 import leo.core.leoGlobals as g
+import leo.core.leoCompare as leoCompare
 import difflib
 import os
 import pprint
@@ -54,6 +58,7 @@ class ShadowController:
         # File encoding.
         self.encoding = c.config.default_derived_file_encoding
         # Configuration: set in reloadSettings.
+        self.shadow_diff = None
         self.shadow_subdir = None
         self.shadow_prefix = None
         self.shadow_in_home_dir = None
@@ -69,6 +74,7 @@ class ShadowController:
     def reloadSettings(self):
         '''ShadowController.reloadSettings.'''
         c = self.c
+        self.shadow_diff = c.config.getString('shadow-diff') or 'myers'
         self.shadow_subdir = c.config.getString('shadow-subdir') or '.leo_shadow'
         self.shadow_prefix = c.config.getString('shadow-prefix') or ''
         self.shadow_in_home_dir = c.config.getBool('shadow-in-home-dir', default=False)
@@ -223,7 +229,7 @@ class ShadowController:
         #@-<< docstring >>
         x = self
         x.init_ivars(new_public_lines, old_private_lines, marker)
-        sm = difflib.SequenceMatcher(None, x.a, x.b)
+        sm = leoCompare.LineDiffer(x.a, x.b, algorithm=x.shadow_diff)
         # Ensure leading sentinels are put first.
         x.put_sentinels(0)
         x.sentinels[0] = []
@@ -8,8 +8,6 @@ Run the unit tests in test.leo using the Execute Script command.
 #@+node:ekr.20051104075904.1: ** << imports >> (leoTest)
 import leo.core.leoGlobals as g
 import leo.core.leoGui as leoGui # For UnitTestGui.
-import cProfile as profile
-import doctest
 import gc
 import logging
 import logging.handlers
@@ -18,7 +16,6 @@ import os
 # import re
 import sys
 import time
-import timeit
 import tokenize
 import unittest
 try:
@@ -858,6 +855,7 @@ class TestManager:
     # Called from @button profile in unitTest.leo.
 
     def runProfileOnNode(self, p, outputPath=None):
+        import cProfile as profile
         # Work around a Python distro bug: can fail on Ubuntu.
         try:
             import pstats
@@ -879,6 +877,7 @@ class TestManager:
     # Called from @button timeit in unitTest.leo.
 
     def runTimerOnNode(self, p, count):
+        import timeit
         c = self.c
         s = p.b.rstrip() + '\n'
         # A kludge so we the statement below can get c and p.
@@ -903,6 +902,7 @@ class TestManager:
     # It would be better, perhaps, to use @common nodes in unitTest.leo.
     #@+node:ekr.20051104075904.99: *4* TM.createUnitTestsFromDoctests
     def createUnitTestsFromDoctests(self, modules, verbose=True):
+        import doctest
         created = False # True if suite is non-empty.
         suite = unittest.makeSuite(unittest.TestCase)
         for module in list(modules):
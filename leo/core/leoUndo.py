@@ -199,6 +199,10 @@ class Undoer:
     #@+node:ekr.20060127113243: *4* u.pushBead
     def pushBead(self, bunch):
         u = self
+        if u.c.bulkEditBunch:
+            # c.endBulkEdit will push a single bead for all changes.
+            u.addToBulkEdit(bunch)
+            return
         # New in 4.4b2:  Add this to the group if it is being accumulated.
         bunch2 = u.bead >= 0 and u.bead < len(u.beads) and u.beads[u.bead]
         if bunch2 and hasattr(bunch2, 'kind') and bunch2.kind == 'beforeGroup':
@@ -210,6 +214,42 @@ class Undoer:
             u.beads[u.bead:] = [bunch]
             # Recalculate the menu labels.
             u.setUndoTypes()
+    #@+node:ekr.20190825062512.1: *5* u.addToBulkEdit
+    def addToBulkEdit(self, bunch):
+        '''
+        Add the undo info in bunch, a bead created during a bulk edit, to
+        the bead that c.endBulkEdit will push. See c.bulkEdit.
+        '''
+        u = self; c = u.c
+        bulk = c.bulkEditBunch
+        # Use the saved info for all vnodes in the bead's tree.
+        for data in bunch.get('oldTree') or []:
+            v = data[0]
+            if v not in bulk.savedVnodes:
+                bulk.savedVnodes.add(v)
+                bulk.undoData.oldTree.append(data)
+        # The bead's node has already changed: restore the old values.
+        p = bunch.get('p')
+        if p and p.v and p.v not in bulk.savedVnodes:
+            v = p.v
+            vInfo, tInfo = u.createVnodeUndoInfo(v), u.createTnodeUndoInfo(v)
+            if bunch.get('oldHead') is not None:
+                tInfo.headString = bunch.oldHead
+            if bunch.get('oldBody') is not None:
+                tInfo.bodyString = bunch.oldBody
+            if bunch.get('oldMarked') is not None:
+                bits = v.statusBits & ~v.markedBit
+                if bunch.oldMarked:
+                    bits |= v.markedBit
+                vInfo.statusBits = tInfo.statusBits = bits
+            bulk.savedVnodes.add(v)
+            bulk.undoData.oldTree.append((v, vInfo, tInfo))
+        # Other changed nodes.
+        for z in bunch.get('dirtyVnodeList') or []:
+            v = getattr(z, 'v', z)
+                # Some commands use positions.
+            if v:
+                v._saveBulkEditInfo()
     #@+node:ekr.20050126081529: *4* u.recognizeStartOfTypingWord
     def recognizeStartOfTypingWord(self,
         old_lines, old_row, old_col, old_ch,
@@ -434,6 +474,26 @@ class Undoer:
         u.c.setChanged(True)
     #@+node:ekr.20031218072017.3608: *3* u.Externally visible entries
     #@+node:ekr.20050318085432.4: *4* u.afterX...
+    #@+node:ekr.20190822062512.6: *5* u.afterBulkEdit
+    def afterBulkEdit(self, p, command, bunch):
+        '''Create an undo node for c.bulkEdit using the bunch created by beforeBulkEdit.'''
+        u = self; c = u.c
+        if u.redoing or u.undoing: return
+        # Set the types & helpers.
+        bunch.kind = 'bulk'
+        bunch.undoType = command
+        bunch.undoHelper = u.undoBulkEdit
+        bunch.redoHelper = u.redoBulkEdit
+        # v._saveBulkEditInfo has set oldTree.
+        bunch.newChanged = c.isChanged()
+        bunch.newP = p.copy()
+        bunch.newTree = [
+            (v, u.createVnodeUndoInfo(v), u.createTnodeUndoInfo(v))
+                for v, vInfo, tInfo in bunch.oldTree]
+        # Discard any beads that did not use u.pushBead.
+        u.bead = bunch.oldBead
+        del u.beads[u.bead + 1:]
+        u.pushBead(bunch)
     #@+node:ekr.20050315134017.4: *5* u.afterChangeGroup
     def afterChangeGroup(self, p, undoType, reportFlag=False, dirtyVnodeList=None):
         '''Create an undo node for general tree operations using d created by beforeChangeGroup'''
@@ -750,6 +810,14 @@ class Undoer:
         u.setUndoTypes()
 
     #@+node:ekr.20050318085432.3: *4* u.beforeX...
+    #@+node:ekr.20190822062512.7: *5* u.beforeBulkEdit
+    def beforeBulkEdit(self, p):
+        u = self
+        bunch = u.createCommonBunch(p)
+        bunch.oldBead = u.bead
+        bunch.oldTree = []
+            # v._saveBulkEditInfo adds the info for each changed vnode.
+        return bunch
     #@+node:ekr.20050315134017.7: *5* u.beforeChangeGroup
     def beforeChangeGroup(self, p, command, verboseUndoGroup=True):
         '''Prepare to undo a group of undoable operations.'''
@@ -936,6 +1004,10 @@ class Undoer:
         if oldText == newText:
             u.setUndoTypes() # Must still recalculate the menu labels.
             return None
+        if c.bulkEditBunch:
+            # c.endBulkEdit will push a single bead for all changes.
+            u.addToBulkEdit(g.Bunch(p=p.copy(), oldBody=oldText))
+            return None
         #@-<< return if there is nothing to do >>
         #@+<< init the undo params >>
         #@+node:ekr.20040324061854.1: *5* << init the undo params >>
@@ -1142,9 +1214,11 @@ class Undoer:
             u.pushBead(bunch)
         else:
             bunch = old_d
-        bunch.dirtyVnodeList = p.setAllAncestorAtFileNodesDirty()
+        # Don't call p.setAllAncestorAtFileNodesDirty on every keystroke.
+        c.setDirtyLater(p.v)
         # Bug fix: Leo 4.4.6: always add p to the list.
-        bunch.dirtyVnodeList.append(p.copy())
+        # Undo and redo call p.setDirty, which marks p's ancestors dirty.
+        bunch.dirtyVnodeList = [p.copy()]
         bunch.leading = u.leading
         bunch.trailing = u.trailing
         bunch.newNewlines = u.newNewlines
@@ -1202,6 +1276,15 @@ class Undoer:
         u.bead += 1
         u.setUndoTypes()
     #@+node:ekr.20110519074734.6092: *3* u.redo helpers
+    #@+node:ekr.20190822062512.8: *4* u.redoBulkEdit
+    def redoBulkEdit(self):
+        u = self; c = u.c
+        u.restoreTree(u.newTree)
+        c.frame.tree.generation += 1
+        c.setVnodesDirty([v for v, vInfo, tInfo in u.newTree])
+        c.selectPosition(u.newP)
+        # This is required.  Otherwise c.redraw will revert the change!
+        c.frame.tree.setHeadline(c.p, c.p.h)
     #@+node:ekr.20050424170219: *4* u.redoClearRecentFiles
     def redoClearRecentFiles(self):
         u = self; c = u.c
@@ -1480,6 +1563,15 @@ class Undoer:
         u.bead -= 1
         u.setUndoTypes()
     #@+node:ekr.20110519074734.6093: *3* u.undo helpers
+    #@+node:ekr.20190822062512.9: *4* u.undoBulkEdit
+    def undoBulkEdit(self):
+        u = self; c = u.c
+        u.restoreTree(u.oldTree)
+        c.frame.tree.generation += 1
+        c.setVnodesDirty([v for v, vInfo, tInfo in u.oldTree])
+        c.selectPosition(u.p)
+        # This is required.  Otherwise c.redraw will revert the change!
+        c.frame.tree.setHeadline(c.p, c.p.h)
     #@+node:ekr.20050424170219.1: *4* u.undoClearRecentFiles
     def undoClearRecentFiles(self):
         u = self; c = u.c
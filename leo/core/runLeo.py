@@ -21,6 +21,10 @@ path = os.getcwd()
 if path not in sys.path:
     # print('appending %s to sys.path' % path)
     sys.path.append(path)
+# Time all imports for --startup-report. See LM.writeStartupReport.
+if any(z.startswith('--startup-report') for z in sys.argv):
+    import leo.core.leoImportTimes as leoImportTimes
+    leoImportTimes.install()
 # Import leoGlobals, but do NOT set g.
 import leo.core.leoGlobals as leoGlobals
 # Create g.app.
@@ -116,34 +116,55 @@ class backlinkController:
     def fixIDs(self, c):
 
         update = {}
-
-        for v in c.all_unique_nodes():
-            # collect old -> new ID mapping
-            if (hasattr(v, 'unknownAttributes') and
-                '_bklnk' in v.u and
-                'id' in v.u['_bklnk']
-            ):
-                update[v.u['_bklnk']['id']] = v.gnx
+        linked = []  # just the vnodes with link info.
 
         for v in c.all_unique_nodes():
             if (hasattr(v, 'unknownAttributes') and '_bklnk' in v.u):
-
+                linked.append(v)
+                # collect old -> new ID mapping
                 if 'id' in v.u['_bklnk']:
-                    # remove old id
-                    del v.u['_bklnk']['id']
-
-                if 'links' in v.u['_bklnk']:
-                    v.u['_bklnk']['links'] = [
-                        i for i in v.u['_bklnk']['links']
-                        if i[1] not in update
-                    ]
-                    v.u['_bklnk']['links'].extend([
-                        (i[0], update[i[1]]) for i in v.u['_bklnk']['links']
-                        if i[1] in update])
+                    update[v.u['_bklnk']['id']] = v.gnx
+
+        if not update:
+            return  # nothing to fix
+
+        for v in linked:
+            if 'id' in v.u['_bklnk']:
+                # remove old id
+                del v.u['_bklnk']['id']
+
+            if 'links' in v.u['_bklnk']:
+                v.u['_bklnk']['links'] = [
+                    i for i in v.u['_bklnk']['links']
+                    if i[1] not in update
+                ]
+                v.u['_bklnk']['links'].extend([
+                    (i[0], update[i[1]]) for i in v.u['_bklnk']['links']
+                    if i[1] in update])
+    #@+node:ekr.20190825062512.10: *3* checkIndex & outlineState
+    def checkIndex(self):
+        """
+        Update self.vnode and self.linkedNodes if the outline's structure
+        has changed, so that links on pasted or imported nodes are found.
+        """
+        state = self.outlineState()
+        if state == self.indexState:
+            return
+        self.indexState = state
+        for v in self.c.all_unique_nodes():
+            self.vnode[v.gnx] = v
+            if v.u and '_bklnk' in v.u:
+                self.linkedNodes.add(v.gnx)
+
+    def outlineState(self):
+        """Return a value that changes when nodes are added to the outline."""
+        c = self.c
+        return c.frame.tree.generation, len(c.fileCommands.gnxDict)
     #@+node:ekr.20090616105756.3944: *3* deleteLink
     def deleteLink(self, on, to, type_):
         """delete a link from 'on' to 'to' of type 'type_'"""
 
+        self.checkIndex()
         vid = on.gnx #X unknownAttributes['_bklnk']['id']
         links = on.unknownAttributes['_bklnk']['links']
 
@@ -230,6 +251,7 @@ class backlinkController:
                 v.u['_bklnk'][entry] = []
 
         self.vnode[v.gnx] = v
+        self.linkedNodes.add(v.gnx)
     #@+node:ekr.20090616105756.3947: *3* initIvars
     def initIvars(self):
         """initialize, called by __init__ and loadLinks(Int)"""
@@ -237,7 +259,9 @@ class backlinkController:
         self.linkDestination = None
         self.linkSource = None
         self.linkMark = None
-        self.vnode = {}
+        self.vnode = {}  # map from ids to vnodes
+        self.linkedNodes = set()  # ids of vnodes which may have link info.
+        self.indexState = None  # outline state when self.vnode was updated
         self.messageUsed = False
     #@+node:ekr.20090616105756.3948: *3* linkAction
     def linkAction(self, dir_, newChild=False):
@@ -333,6 +357,7 @@ class backlinkController:
         self.updateTabInt()
     #@+node:ekr.20090616105756.3953: *3* linksFrom
     def linksFrom(self, v, type_='S'):
+        self.checkIndex()
         ans = []
         if not (v.u and '_bklnk' in v.u and 'links' in v.u['_bklnk']):
             return ans
@@ -414,13 +439,16 @@ class backlinkController:
         self.initIvars()  # clears self.vnode
 
         idsSeen = set()  # just the vnodes with link info.
+        linkedTo = {}  # map from ids to the set of ids in their links
 
         # make map from linked node's ids to their vnodes
-        for p in c.all_positions():
-            v = p.v
+        # clones have only one vnode, so visit each vnode once
+        for v in c.all_unique_nodes():
             self.vnode[v.gnx] = v
             if v.u and '_bklnk' in v.u:
                 idsSeen.add(v.gnx)
+        self.linkedNodes.update(idsSeen)
+        self.indexState = self.outlineState()
 
         for vnode in idsSeen:  # just the vnodes with link info.
             if 'links' not in self.vnode[vnode].u['_bklnk']:
@@ -445,13 +473,13 @@ class backlinkController:
                 other = self.vnode[link[1]]
                 if '_bklnk' not in other.u or 'links' not in other.u['_bklnk']:
                     self.initBacklink(other)
-                if not [
-                    i for i in other.u['_bklnk']['links']
-                        if i[1] == vnode
-                ]:
+                if link[1] not in linkedTo:
+                    linkedTo[link[1]] = set(i[1] for i in other.u['_bklnk']['links'])
+                if vnode not in linkedTo[link[1]]:
                     # we are not in the other's list
                     direc = {'U':'U', 'S':'D', 'D':'S'}[link[0]]
                     other.u['_bklnk']['links'].append((direc, vnode))
+                    linkedTo[link[1]].add(vnode)
 
                 newlinks.append((link[0], link[1]))
 
@@ -479,30 +507,30 @@ class backlinkController:
         """
 
         c = self.c
-        hits = [[]]  # hits/including before the current node
-
-        current = c.p.v
-
-        for v in c.all_unique_nodes():
-
-            if '_bklnk' in v.u and (
-              v.u['_bklnk']['links'] or v.u['_bklnk'].get('urls')):
-                hits[-1].append(v)
-            # forgo this optimization in favor of total count
-            # if len(hits) > 1 and hits[-1]):
-            #     break  # got one after the current node
-            if v == current:
-                hits.append([])  # hits after the current node
+        hits = []  # positions of all nodes with links, in outline order
+        self.checkIndex()
+        for gnx in list(self.linkedNodes):
+            v = self.vnode.get(gnx)
+            if not (v and '_bklnk' in v.u and (
+              v.u['_bklnk'].get('links') or v.u['_bklnk'].get('urls'))):
+                self.linkedNodes.discard(gnx)
+                continue
+            p = self.vnodePosition(v)
+            if p:  # deleted nodes have no position
+                hits.append(p)
+        hits.sort(key=lambda p: p.sort_key(p))
 
-        total = sum(map(len, hits))
+        total = len(hits)
         g.es("%d nodes with links" % total)
-        if hits[1]:
-            c.selectPosition(c.vnode2position(hits[1][0]))
-            return
         if total == 0:
             return
+        current = c.p.sort_key(c.p)
+        for p in hits:
+            if p.sort_key(p) > current:  # after the current node
+                c.selectPosition(p)
+                return
         g.es("Search wrapped")
-        c.selectPosition(c.vnode2position(hits[0][0]))
+        c.selectPosition(hits[0])
     #@+node:ekr.20090616105756.3962: *3* positionExistsSomewhere
     def positionExistsSomewhere(self,p,root=None):
         """A local copy of c.positionExists so that when the
@@ -657,6 +685,7 @@ class backlinkController:
         c = self.c
         p = c.p
         v = p.v
+        self.checkIndex()
         self.messageUsed = False
         self.ui.enableDelete(False)
         self.deleteMode = False
@@ -676,7 +705,8 @@ class backlinkController:
                 try:
                     otherV = self.vnode[other]
                     otherP = self.vnodePosition(otherV)
-                    dests.append((linkType, otherP))
+                    if otherP:  # deleted nodes have no position
+                        dests.append((linkType, otherP))
                 except KeyError:
                     self.showMessage('Lost link(s) deleted', other, color='red')
                     links.remove(data)
@@ -727,7 +757,11 @@ class backlinkController:
     #@+node:ekr.20090616105756.3969: *3* vnodePosition
     def vnodePosition(self,v):
         """Return a position for vnode v, if there is one"""
-        return self.c.vnode2position(v)
+        # Both calls follow v's parents, so this takes time
+        # proportional to the depth of v, not the size of the outline.
+        p = self.c.vnode2position(v)
+        # The parents of nodes in deleted trees are also deleted.
+        return p if p and self.c.positionExists(p) else None
     #@-others
 #@+node:ekr.20090616105756.3939: ** class backlinkQtUI
 if g.app.gui.guiName() == "qt":
@@ -39,6 +39,14 @@ If you set up the FileSystem backend it into a folder that is sync'ed
 externally, as shown above, it can serve as a cloud adapter for services like
 DropBox, Google Drive, OneDrive, etc. etc.
 
+Both backends accept a `format: delta` line. By default a subtree is stored as
+a single <ID>.json file, rewritten completely on every write. In the delta
+format each node is stored in its own file in the <ID> folder, named by a hash
+of the node and its descendants, and <ID>.json just names the top node's file.
+Writes only create files for changed nodes and their ancestors, and background
+checks only read <ID>.json, so large trees sync in time proportional to the
+edits. Both formats can always be read.
+
 In addition to the Git and FileSystem cloud types it should be possible to add
 many others - AWS, WebDAV, sFTP, whatever.
 
@@ -142,6 +150,7 @@ class LeoCloudIOBase:
         self.v = p.v
         self.c = c
         self.lc_id = kwargs['ID']
+        self.delta = kwargs.get('format', '').lower() == 'delta'
 
     def get_subtree(self, lc_id):
         """get_subtree - get a Leo subtree from the cloud
@@ -163,8 +172,104 @@ class LeoCloudIOBase:
             v (vnode): subtree to put
         """
         # pylint: disable=no-member
-        # self.put_data
-        self.put_data(lc_id, LeoCloud.to_dict(v))
+        # self.put_data, self.put_delta
+        if self.delta:
+            self.put_delta(lc_id, v)
+        else:
+            self.put_data(lc_id, LeoCloud.to_dict(v))
+
+    def get_hash(self, lc_id):
+        """get_hash - get the hash of a subtree without getting the subtree
+
+        Args:
+            lc_id (str(?)): resource to check
+
+        Returns:
+            str: recursive_hash() of the subtree, or None if unknown
+        """
+        return None
+
+    def read_data(self, folder, lc_id):
+        """read_data - read a subtree stored in either format
+
+        Args:
+            folder (str): folder containing lc_id.json
+            lc_id (str(?)): resource to get
+
+        Returns:
+            dict of subtree
+        """
+        filepath = os.path.join(folder, lc_id+'.json')
+        with open(filepath) as data:
+            data = json.load(data)
+        if data.get('format') != 'delta':
+            return data
+        nodes_dir = os.path.join(folder, lc_id)
+
+        def load(key):
+            with open(os.path.join(nodes_dir, key+'.json')) as node:
+                d = json.load(node)
+            d['children'] = [load(child) for child in d['children']]
+            return d
+
+        return load(data['root'])
+
+    def read_hash(self, folder, lc_id):
+        """read_hash - read the hash of a subtree stored in the delta format
+
+        Args:
+            folder (str): folder containing lc_id.json
+            lc_id (str(?)): resource to check
+
+        Returns:
+            str: hash, or None for missing or single file subtrees
+        """
+        filepath = os.path.join(folder, lc_id+'.json')
+        if not os.path.exists(filepath):
+            return None
+        with open(filepath) as data:
+            data = json.load(data)
+        return data.get('hash') if data.get('format') == 'delta' else None
+
+    def write_delta(self, folder, lc_id, v):
+        """write_delta - write a subtree in the delta format
+
+        Only files for new or changed nodes are written, and files
+        no longer used by the subtree are removed.
+
+        Args:
+            folder (str): folder for lc_id.json
+            lc_id (str(?)): place to put it
+            v (vnode): subtree to put
+
+        Returns:
+            tuple: (written, removed) lists of file names in the lc_id folder
+        """
+        nodes = {}
+        root = LeoCloud.delta_key(v, nodes)
+        nodes_dir = os.path.join(folder, lc_id)
+        if not os.path.exists(nodes_dir):
+            os.makedirs(nodes_dir)
+        existing = set(os.listdir(nodes_dir))
+        written = []
+        for key, data in nodes.items():
+            name = key+'.json'
+            if name not in existing:
+                with open(os.path.join(nodes_dir, name), 'w') as out:
+                    out.write(data)
+                written.append(name)
+        removed = sorted(existing - set(key+'.json' for key in nodes))
+        for name in removed:
+            os.remove(os.path.join(nodes_dir, name))
+        # write the index last, so readers never see missing nodes
+        index = {
+            'format': 'delta',
+            'hash': LeoCloud.recursive_hash(v, [], include_current=False),
+            'root': root,
+        }
+        with open(os.path.join(folder, lc_id+'.json'), 'w') as out:
+            out.write(LeoCloud.to_json(index))
+        return written, removed
 
 
 class LeoCloudIOFileSystem(LeoCloudIOBase):
@@ -191,9 +296,11 @@ class LeoCloudIOFileSystem(LeoCloudIOBase):
         Returns:
             object loaded from JSON
         """
-        filepath = os.path.join(self.basepath, lc_id+'.json')
-        with open(filepath) as data:
-            return json.load(data)
+        return self.read_data(self.basepath, lc_id)
+
+    def get_hash(self, lc_id):
+        """get_hash - get the hash of a subtree, see LeoCloudIOBase"""
+        return self.read_hash(self.basepath, lc_id)
 
     def put_data(self, lc_id, data):
         """put - store data in the Leo Cloud
@@ -206,6 +313,15 @@ class LeoCloudIOFileSystem(LeoCloudIOBase):
         with open(filepath, 'w') as out:
             return out.write(LeoCloud.to_json(data))
 
+    def put_delta(self, lc_id, v):
+        """put_delta - store a subtree in the delta format
+
+        Args:
+            lc_id (str(?)): place to put it
+            v (vnode): subtree to put
+        """
+        self.write_delta(self.basepath, lc_id, v)
+
 
 class LeoCloudIOGit(LeoCloudIOBase):
     """Leo Cloud IO layer that just loads / saves local files.
@@ -245,9 +361,11 @@ class LeoCloudIOGit(LeoCloudIOBase):
 
         :returns: object loaded from JSON
         """
-        filepath = os.path.join(self.local, lc_id+'.json')
-        with open(filepath) as data:
-            return json.load(data)
+        return self.read_data(self.local, lc_id)
+
+    def get_hash(self, lc_id):
+        """get_hash - get the hash of a subtree, see LeoCloudIOBase"""
+        return self.read_hash(self.local, lc_id)
 
     def put_data(self, lc_id, data):
         """put - store data in the Leo Cloud
@@ -263,6 +381,19 @@ class LeoCloudIOGit(LeoCloudIOBase):
         self._run_git('git -C "%s" commit -mupdates' % self.local)
         self._run_git('git -C "%s" push' % self.local)
 
+    def put_delta(self, lc_id, v):
+        """put_delta - store a subtree in the delta format
+
+        Args:
+            lc_id (str(?)): place to put it
+            v (vnode): subtree to put
+        """
+        self.write_delta(self.local, lc_id, v)
+        # add -A stages the removed node files too
+        self._run_git('git -C "%s" add -A "%s" "%s"' % (self.local, lc_id, lc_id+'.json'))
+        self._run_git('git -C "%s" commit -mupdates' % self.local)
+        self._run_git('git -C "%s" push' % self.local)
+
 
 class LeoCloud:
     def __init__(self, c):
@@ -272,6 +403,8 @@ class LeoCloud:
         self.c = c
         self.bg_finished = False  # used for background thread
         self.bg_results = []      # results from background thread
+        # commands and headline edits can change v.u in place
+        g.registerHandler(('command2', 'headkey2'), self.node_changed)
 
         # we're here via open2 hook, but too soon to load from cloud,
         # so defer
@@ -298,12 +431,16 @@ class LeoCloud:
             c = v.context
             p = c.vnode2position(v)
             lc_io = getattr(v, '_leo_cloud_io', None) or self.io_from_node(p)
-            subtree = lc_io.get_subtree(lc_io.lc_id)
-            remote_hash = self.recursive_hash(subtree, [], include_current=False)
+            # the delta format stores the hash, so the subtree needn't be read
+            remote_hash = lc_io.get_hash(lc_io.lc_id)
+            if remote_hash is None:
+                subtree = lc_io.get_subtree(lc_io.lc_id)
+                remote_hash = self.recursive_hash(subtree, [], include_current=False)
             self.bg_results.append((v, local_hash == remote_hash))
             if False and local_hash != remote_hash:
                 # disabled dev. / debug code
                 # record difference for inspection
+                subtree = lc_io.get_subtree(lc_io.lc_id)
                 tmpdir = tempfile.mkdtemp()
                 with open(os.path.join(tmpdir, 'leo_cloug_local.json'), 'w') as out:
                     out.write(self.to_json(self.to_dict(v)))
@@ -333,6 +470,35 @@ class LeoCloud:
         if from_background:
             self.load_clouds(from_background=from_background)
 
+    @staticmethod
+    def delta_key(v, nodes):
+        """
+        delta_key - return the key of v's subtree in the delta format
+
+        Args:
+            v (vnode): subtree to convert
+            nodes (dict): key -> JSON of node, for every node in the subtree
+
+        Returns:
+            str: sha1 hash of v's JSON, which includes its children's keys
+
+        The key and JSON of each node are cached on the node, and reused while
+        its h and b are the same objects and its children's keys are unchanged,
+        until invalidate() forgets them.
+        """
+        child_keys = [LeoCloud.delta_key(child, nodes) for child in v.children]
+        cache = getattr(v, '_leo_cloud_delta', None)
+        if (cache and cache[0] is v._headString and
+            cache[1] is v._bodyString and cache[2] == child_keys
+        ):
+            key, data = cache[3], cache[4]
+        else:
+            data = LeoCloud.to_json({'b': v.b, 'h': v.h, 'u': v.u, 'children': child_keys})
+            key = sha1(data.encode('utf-8')).hexdigest()
+            v._leo_cloud_delta = (v._headString, v._bodyString, child_keys, key, data)
+        nodes[key] = data
+        return key
+
     def find_at_leo_cloud(self, p):
         """find_at_leo_cloud - find @leo_cloud node
 
@@ -541,14 +707,76 @@ class LeoCloud:
         that sorts keys, i.e. json.dumps(s, sort_keys=True)
 
         Trailing newlines are ignored in body text.
+
+        Hashes are cached on each node, see _hash_text(), so only changed
+        nodes and their ancestors are rehashed.
         """
         childs = []
         hashes = [LeoCloud.recursive_hash(child, childs) for child in nd.children]
         if include_current:
-            hashes.extend([nd.h + nd.b.rstrip('\n') + json.dumps(LeoCloud._ua_clean(nd.u), sort_keys=True)])
-        whole_hash = sha1(''.join(hashes).encode('utf-8')).hexdigest()
+            text = LeoCloud._hash_text(nd)
+            cache = getattr(nd, '_leo_cloud_hash', None)
+            if cache and cache[0] is text and cache[1] == hashes:
+                whole_hash = cache[2]
+            else:
+                whole_hash = sha1(''.join(hashes + [text]).encode('utf-8')).hexdigest()
+                nd._leo_cloud_hash = (text, hashes, whole_hash)
+        else:
+            whole_hash = sha1(''.join(hashes).encode('utf-8')).hexdigest()
         tree.append([whole_hash, childs])
         return whole_hash
+
+    @staticmethod
+    def _hash_text(nd):
+        """
+        _hash_text - the text recursive_hash() hashes for nd's h/b/u
+
+        Args:
+            nd (vnode): node to hash
+
+        Returns:
+            str: text, cached on nd while its h and b are the same objects,
+            until invalidate() forgets it
+        """
+        cache = getattr(nd, '_leo_cloud_text', None)
+        if cache and cache[0] is nd._headString and cache[1] is nd._bodyString:
+            return cache[2]
+        text = nd.h + nd.b.rstrip('\n') + json.dumps(LeoCloud._ua_clean(nd.u), sort_keys=True)
+        nd._leo_cloud_text = (nd._headString, nd._bodyString, text)
+        return text
+
+    @staticmethod
+    def invalidate(v):
+        """
+        invalidate - forget the cached hashes of v and its ancestors
+
+        Args:
+            v (vnode): changed node
+
+        Plugins often change v.u in place, which the caches can't detect.
+        node_changed() calls this for the nodes that commands and headline
+        edits change, scripts that change v.u in place should call it too.
+        """
+        for attr in ('_leo_cloud_text', '_leo_cloud_hash', '_leo_cloud_delta'):
+            if hasattr(v, attr):
+                delattr(v, attr)
+        # the ancestors' own h/b/u text is still valid
+        seen, todo = set(), list(v.parents)
+        while todo:
+            v = todo.pop()
+            if id(v) in seen:
+                continue
+            seen.add(id(v))
+            for attr in ('_leo_cloud_hash', '_leo_cloud_delta'):
+                if hasattr(v, attr):
+                    delattr(v, attr)
+            todo.extend(v.parents)
+
+    def node_changed(self, tag, keys):
+        """node_changed - command2 / headkey2 hook, invalidate the changed node"""
+        p = keys.get('p')
+        if keys.get('c') == self.c and p:
+            self.invalidate(p.v)
     def save_clouds(self):
         """check for clouds to save when outline is saved"""
         skipped = []
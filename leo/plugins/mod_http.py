@@ -6,10 +6,18 @@
 #@+node:ekr.20050111111238: ** << docstring >>
 #@@language rest
 #@@wrap
-'''An http plug-in for LEO, based on AsyncHttpServer.py.
+'''An http plug-in for LEO.
 
-Adapted and extended from the Python Cookbook:
-http://aspn.activestate.com/ASPN/Cookbook/Python/Recipe/259148
+The server handles each request in a separate thread, so it can serve many
+clients at once. Only Leo's main thread accesses Leo's outlines: request
+threads pass work to the main thread, then send the results.
+
+Pages showing outlines are cached. The server sends an ETag header for
+each such page, and answers requests containing a matching
+If-None-Match header with 304 (Not Modified).
+
+leo/test/mod-http-benchmark.py measures the number of requests per second
+the server can handle.
 
 This plug-in has three distinct behaviors:
 
@@ -35,6 +43,8 @@ Settings
     address to bind to, see notes below
 ``@int  http_port = 8130``
     port to use (1 3 0 ~= L E O)
+``@int http_timeout = 10``
+    delay, in msec., between checks for requests waiting for Leo's main thread
 ``@bool http_allow_remote_exec = False``
     must be changed to True for remote code execution
 ``@string rst_http_attributename = 'rst_http_attribute'``
@@ -216,9 +226,9 @@ which node is selected.
 # pylint: disable=deprecated-method
     # parse_qs
 import leo.core.leoGlobals as g
-import asynchat
-import asyncore
-import cgi
+import collections
+import concurrent.futures
+import hashlib
 import json
 import http.server
 SimpleHTTPRequestHandler = http.server.SimpleHTTPRequestHandler
@@ -227,10 +237,13 @@ StringIO = io.StringIO
 BytesIO = io.BytesIO
 import urllib.parse as urlparse
 import os
-import select
-import shutil
+import queue
 import socket
+import socketserver
+import sys
+import threading
 import time
+import traceback
 from xml.sax.saxutils import quoteattr
 #@-<< imports >>
 #@+<< data >>
@@ -239,7 +252,12 @@ browser_encoding = 'utf-8' # To do: Can we query the browser for this?
     # This encoding must match the character encoding used in your browser.
     # If it does not, non-ascii characters will look very strange.
 
-sockets_to_close = []
+page_cache = collections.OrderedDict()
+    # Keys are urls, values are g.Bunch(body, etag).
+    # The least recently used pages come first.
+    # Accessed only from Leo's main thread.
+page_cache_size = 100
+    # The maximum number of pages in page_cache.
 #@-<< data >>
 #@+others
 #@+node:ekr.20060830091349: ** init & helpers (mod_http.py)
@@ -251,13 +269,11 @@ def init():
         getGlobalConfiguration()
         if config.http_active:
             try:
-                Server(config.http_ip, config.http_port, RequestHandler)
+                start_server(config.http_ip, config.http_port)
             except socket.error as e:
                 g.es("mod_http server initialization failed (%s:%s): %s" % (
                     config.http_ip, config.http_port, e))
                 return False
-            asyncore.read = a_read
-            g.registerHandler("idle", plugin_wrapper)
             g.es("http serving enabled at %s:%s" % (
                 config.http_ip, config.http_port), color="purple")
     g.plugin_signon(__name__)
@@ -268,7 +284,7 @@ def getGlobalConfiguration():
     # timeout.
     newtimeout = g.app.config.getInt("http-timeout")
     if newtimeout is not None:
-        config.http_timeout = newtimeout / 1000.0
+        config.http_timeout = newtimeout
     # ip.
     newip = g.app.config.getString("http-ip")
     if newip:
@@ -287,11 +303,29 @@ def getGlobalConfiguration():
         config.rst2_http_attributename = new_rst2_http_attributename
 #@+node:EKR.20040517080250.45: *3* plugin_wrapper
 def plugin_wrapper(tag, keywords):
+    '''Handle pending requests at idle time if g.IdleTime is not available.'''
     if g.app.killed:
         return
-    # first = True
-    while loop(config.http_timeout):
-        pass
+    if config.server:
+        config.server.process_requests()
+#@+node:ekr.20190810064203.1: *3* start_server
+def start_server(ip, port):
+    '''
+    Start the http server and arrange for Leo's main thread to handle
+    the server's requests. Return the server.
+    '''
+    server = Server(ip, port, RequestHandler)
+    server.start()
+    config.server = server
+    timer = g.IdleTime(
+        lambda timer: server.process_requests(),
+        delay=max(1, config.http_timeout or 10),
+        tag='mod_http.process_requests')
+    if timer:
+        timer.start()
+    else:
+        g.registerHandler("idle", plugin_wrapper)
+    return server
 #@+node:bwmulder.20050326191345.1: *3* onFileOpen (not used) (mod_http.py)
 def onFileOpen(tag, keywords):
     c = keywords.get("new_c")
@@ -299,9 +333,7 @@ def onFileOpen(tag, keywords):
     wasactive = config.http_active
     getConfiguration(c)
     if config.http_active and not wasactive: # Ok for unit testing:
-        Server('', config.http_port, RequestHandler)
-        asyncore.read = a_read
-        g.registerHandler("idle", plugin_wrapper)
+        start_server('', config.http_port)
         g.es("http serving enabled on port %s, " % (
             config.http_port),
             color="purple")
@@ -311,7 +343,7 @@ def getConfiguration(c):
     # timeout.
     newtimeout = c.config.getInt("http-timeout")
     if newtimeout is not None:
-        config.http_timeout = newtimeout / 1000.0
+        config.http_timeout = newtimeout
     # port.
     newport = c.config.getInt("http-port")
     if newport:
@@ -344,108 +376,110 @@ def getData(setting):
 class config:
     enabled = None # True when security check re http-allow-remote-exec passes.
     http_active = False
-    http_timeout = 0
+    http_timeout = 10
+        # Msec. between checks for requests waiting for Leo's main thread.
     http_ip = '127.0.0.1'
     http_port = 8130
     rst2_http_attributename = 'rst_http_attribute'
-#@+node:EKR.20040517080250.4: ** class delayedSocketStream
-class delayedSocketStream(asyncore.dispatcher_with_send):
-    #@+others
-    #@+node:EKR.20040517080250.5: *3* __init__
-    def __init__(self, sock):
-        # pylint: disable=super-init-not-called
-        self._map = asyncore.socket_map
-        self.socket = sock
-        self.socket.setblocking(0)
-        self.closed = 1 # compatibility with SocketServer
-        self.buffer = []
-    #@+node:EKR.20040517080250.6: *3* write
-    def write(self, data):
-        self.buffer.append(data)
-    #@+node:EKR.20040517080250.7: *3* initiate_sending
-    def initiate_sending(self):
-        # Create a bytes string.
-        aList = [g.toEncodedString(z) for z in self.buffer]
-        self.out_buffer = b''.join(aList)
-        del self.buffer
-        self.set_socket(self.socket, None)
-        self.socket.setblocking(0)
-        self.connected = 1
-        try:
-            self.addr = self.socket.getpeername()
-        except socket.error:
-            # The addr isn't crucial
-            pass
-    #@+node:EKR.20040517080250.8: *3* handle_read
-    def handle_read(self):
-        pass
-    #@+node:EKR.20040517080250.9: *3* writable
-    def writable(self):
-        result = (not self.connected) or len(self.out_buffer)
-        if not result:
-            sockets_to_close.append(self)
-        return result
-    #@-others
+    server = None
+        # The running Server, if any.
 #@+node:EKR.20040517080250.20: ** class leo_interface
 class leo_interface:
     # pylint: disable=no-member
         # .path, .send_error, .send_response and .end_headers
         # appear to be undefined.
     #@+others
-    #@+node:bwmulder.20050322224921: *3* send_head & helpers
-    def send_head(self):
-        """Common code for GET and HEAD commands.
+    #@+node:bwmulder.20050322224921: *3* compute_response & helpers
+    def compute_response(self):
+        """
+        Compute the response to a GET or HEAD request for self.path.
 
-         This sends the response code and MIME headers.
+        Return a g.Bunch(code, message, mime_type, body, etag). body is a
+        bytes object. etag is None or the page's ETag.
 
-         Return value is either a file object (which has to be copied
-         to the outputfile by the caller unless the command was HEAD,
-         and must be closed by the caller under all circumstances), or
-         None, in which case the caller has nothing further to do.
+        Called only from Leo's main thread.
+        """
+        # self.path is provided by the RequestHandler class.
+        self.leo_actions = LeoActions(self)
+        path = self.split_leo_path(self.path)
+        if path[0] == '_':
+            f = self.leo_actions.get_response()
+        elif len(path) == 1 and path[0] == 'favicon.ico':
+            f = self.leo_actions.get_favicon()
+        elif path == '/':
+            f = self.write_leo_windowlist()
+        else:
+            try:
+                window, root = self.find_window_and_root(path)
+                if window is None:
+                    return error_response(404, "File not found")
+                if root is None:
+                    return error_response(404, "No root node")
+                return self.get_leo_tree_response(window, root)
+            except nodeNotFound:
+                return error_response(404, "Node not found")
+            except noLeoNodePath:
+                g.es("No Leo node path:", path)
+                # Is there something better we can do here?
+                return error_response(404, "Node not found")
+        if f is None:
+            return error_response(403, "Forbidden")
+        return g.Bunch(
+            body=g.toEncodedString(f.getvalue(), browser_encoding),
+            code=200,
+            etag=None,
+            message=None,
+            mime_type=getattr(f, "mime_type", "text/html"),
+        )
+    #@+node:ekr.20190810064203.2: *4* get_leo_tree_response & page_key
+    def get_leo_tree_response(self, window, root):
+        """
+        Return the response for the page showing root and its siblings.
 
-         """
-        try:
-            # self.path is provided by the RequestHandler class.
-            path = self.split_leo_path(self.path)
-            if path[0] == '_':
-                f = self.leo_actions.get_response()
-            elif len(path) == 1 and path[0] == 'favicon.ico':
-                f = self.leo_actions.get_favicon()
-            elif path == '/':
-                f = self.write_leo_windowlist()
-            else:
-                try:
-                    window, root = self.find_window_and_root(path)
-                    if window is None:
-                        self.send_error(404, "File not found")
-                        return None
-                    if root is None:
-                        self.send_error(404, "No root node")
-                        return None
-                    f = StringIO()
-                    self.write_leo_tree(f, window, root)
-                except nodeNotFound:
-                    self.send_error(404, "Node not found")
-                    return None
-                except noLeoNodePath:
-                    g.es("No Leo node path:", path)
-                    # Is there something better we can do here?
-                    self.send_error(404, "Node not found")
-                    return None
-            if f is None:
-                return None
-            length = f.tell()
-            f.seek(0)
-            self.send_response(200)
-            self.send_header("Content-type", getattr(f, "mime_type", "text/html"))
-            self.send_header("Content-Length", str(length))
-            self.end_headers()
-            return f
-        except Exception:
-            import traceback
-            traceback.print_exc()
-            raise
-        return None
+        Pages are cached. The cached page and its ETag remain valid as long
+        as page_key returns the same key. page_cache holds at most
+        page_cache_size pages.
+        """
+        etag = '"%s"' % self.page_key(window, root)
+        if etag == self.headers.get('If-None-Match'):
+            return g.Bunch(body=b'', code=304, etag=etag, message=None, mime_type=None)
+        bunch = page_cache.get(self.path)
+        if bunch and bunch.etag == etag:
+            page_cache.move_to_end(self.path)
+        else:
+            f = StringIO()
+            self.write_leo_tree(f, window, root)
+            bunch = g.Bunch(
+                body=g.toEncodedString(f.getvalue(), browser_encoding),
+                etag=etag)
+            page_cache[self.path] = bunch
+            page_cache.move_to_end(self.path)
+            while len(page_cache) > page_cache_size:
+                # Forget the least recently used pages.
+                page_cache.popitem(last=False)
+        return g.Bunch(
+            body=bunch.body,
+            code=200,
+            etag=etag,
+            message=None,
+            mime_type="text/html",
+        )
+
+    def page_key(self, window, root):
+        """Return a hash of everything that write_leo_tree writes."""
+        sha1 = hashlib.sha1()
+        for s in (
+            window.shortFileName(),
+            getData('http_stylesheet'),
+            getData('user_http_stylesheet'),
+            getData('http_script'),
+        ):
+            sha1.update(g.toEncodedString('\0%s' % s))
+        for sib in root.self_and_siblings(copy=False):
+            for p in sib.self_and_subtree(copy=False):
+                sha1.update(g.toEncodedString('\0%s\0%s\0%s\0%s\0%s' % (
+                    p.level(), p.gnx, p.computeIcon(), p.h, p.b)))
+        return sha1.hexdigest()
     #@+node:EKR.20040517080250.26: *4* find_window_and_root
     def find_window_and_root(self, path):
         """
@@ -468,7 +502,7 @@ class leo_interface:
             return '/'
         if path.startswith("/"):
             path = path[1:]
-        return path.split('/')
+        return [urlparse.unquote(z) for z in path.split('/')]
     #@+node:ekr.20161001114512.1: *4* write_leo_tree & helpers
     def write_leo_tree(self, f, window, root):
         '''Wriite the entire html file to f.'''
@@ -874,10 +908,9 @@ class LeoActions:
     def get_favicon(self):
         path = g.os_path_join(g.computeLeoDir(), 'Icons', 'LeoApp16.ico')
         try:
-            f = StringIO()
-            f2 = open(path)
-            s = f2.read()
-            f.write(s)
+            with open(path, 'rb') as f2:
+                f = BytesIO(f2.read())
+            f.mime_type = 'image/x-icon'
             return f
         except Exception:
             return None
@@ -976,111 +1009,62 @@ class noLeoNodePath(Exception):
     """
     pass
 #@+node:EKR.20040517080250.13: ** class RequestHandler
-class RequestHandler(
-    leo_interface,
-    asynchat.async_chat,
-    SimpleHTTPRequestHandler
-):
+class RequestHandler(leo_interface, SimpleHTTPRequestHandler):
+    """
+    Handle one connection to the server, in a thread created by the server.
+
+    leo_interface.compute_response runs in Leo's main thread. All other
+    methods run in the request's thread.
+    """
     # pylint: disable=too-many-ancestors
-    # pylint: disable=super-init-not-called
+    protocol_version = 'HTTP/1.1'
+        # Allow persistent connections: all responses have a Content-Length.
+    timeout = 60
+        # Close idle connections after this many seconds.
+    chunk_size = 64 * 1024
+        # Large pages are sent in pieces of this size.
     #@+others
-    #@+node:EKR.20040517080250.14: *3* __init__
-    def __init__(self, conn, addr, server):
-        self.leo_actions = LeoActions(self)
-        super().__init__(conn)
-        self.client_address = addr
-        self.connection = conn
-        self.server = server
-        self.wfile = delayedSocketStream(self.socket)
-        # Sets the terminator. When it is received, this means that the
-        # http request is complete, control will be passed to self.found_terminator
-        self.term = g.toEncodedString('\r\n\r\n')
-        self.set_terminator(self.term)
-        self.buffer = BytesIO()
-        # Set self.use_encoding and self.encoding.
-        # This is used by asyn_chat.
-        self.use_encoding = True
-        self.encoding = 'utf-8'
-    #@+node:EKR.20040517080250.15: *3* copyfile
-    def copyfile(self, source, outputfile):
-        """Copy all data between two file objects.
-
-        The SOURCE argument is a file object open for reading
-        (or anything with a read() method) and the DESTINATION
-        argument is a file object open for writing (or
-        anything with a write() method).
-
-        The only reason for overriding this would be to change
-        the block size or perhaps to replace newlines by CRLF
-        -- note however that this the default server uses this
-        to copy binary data as well.
-         """
-        shutil.copyfileobj(source, outputfile, length=255)
-    #@+node:EKR.20040517080250.16: *3* log_message
+    #@+node:EKR.20040517080250.16: *3* log_message & log_error
     def log_message(self, format, *args):
-        """Log an arbitrary message.
-
-         This is used by all other logging functions.  Override
-         it if you have specific logging wishes.
-
-         The first argument, FORMAT, is a format string for the
-         message to be logged.  If the format string contains
-         any % escapes requiring parameters, they should be
-         specified as subsequent arguments (it's just like
-         printf!).
+        """
+        Log an arbitrary message.
 
-         The client host and current date/time are prefixed to
-         every message.
+        Logging every request would flood Leo's log pane, so only errors are
+        logged by default. Use --trace=plugins to log all requests.
+        """
+        if 'plugins' in g.app.debug:
+            self.log_error(format, *args)
 
-         """
+    def log_error(self, format, *args):
+        """Log an error in Leo's log pane."""
         message = "%s - - [%s] %s\n" % (
             self.address_string(),
             self.log_date_time_string(),
             format % args)
-        g.es(message)
-    #@+node:EKR.20040517080250.17: *3* collect_incoming_data
-    def collect_incoming_data(self, data):
-        """Collects the data arriving on the connexion"""
-        self.buffer.write(data)
-    #@+node:EKR.20040517080250.18: *3* prepare_POST
-    def prepare_POST(self):
-        """Prepare to read the request body"""
-        bytesToRead = int(self.headers.getheader('content-length'))
-        # set terminator to length (will read bytesToRead bytes)
-        self.set_terminator(bytesToRead)
-        self.buffer = StringIO()
-        # control will be passed to a new found_terminator
-        self.found_terminator = self.handle_post_data
-    #@+node:EKR.20040517080250.19: *3* handle_post_data
-    def handle_post_data(self):
-        """Called when a POST request body has been read"""
-        self.rfile = StringIO(self.buffer.getvalue())
-        self.do_POST()
-        self.finish()
-    #@+node:EKR.20040517080250.31: *3* do_GET
+        self.server.call_soon(g.es, message)
+    #@+node:EKR.20040517080250.31: *3* do_GET, do_HEAD & do_POST
     def do_GET(self):
-        """Begins serving a GET request"""
-        # nothing more to do before handle_data()
-        self.handle_data()
-    #@+node:EKR.20040517080250.32: *3* do_POST
+        """Serve a GET request."""
+        self.send_leo_response(head=False)
+
+    def do_HEAD(self):
+        """Serve a HEAD request."""
+        self.send_leo_response(head=True)
+
     def do_POST(self):
-        """Begins serving a POST request. The request data must be readable
-         on a file-like object called self.rfile"""
-        ctype, pdict = cgi.parse_header(self.headers.getheader('content-type'))
-        length = int(self.headers.getheader('content-length'))
-        if ctype == 'multipart/form-data':
-            query = cgi.parse_multipart(self.rfile, pdict)
-        elif ctype == 'application/x-www-form-urlencoded':
-            qs = self.rfile.read(length)
-            query = cgi.parse_qs(qs, keep_blank_values=1)
+        """
+        Serve a POST request. Decode the request's url-encoded data into
+        the QUERY dictionary, then continue as for GET.
+        """
+        length = int(self.headers.get('content-length') or 0)
+        data = self.rfile.read(length) if length else b''
+        ctype = self.headers.get('content-type') or ''
+        if ctype.startswith('application/x-www-form-urlencoded'):
+            parsed = urlparse.parse_qs(g.toUnicode(data), keep_blank_values=1)
         else:
-            query = '' # Unknown content-type
-        # some browsers send 2 more bytes...
-        [ready_to_read, x, y] = select.select([self.connection], [], [], 0)
-        if ready_to_read:
-            self.rfile.read(2)
-        self.QUERY.update(self.query(query))
-        self.handle_data()
+            parsed = {} # Unknown content-type
+        self.QUERY = self.query(parsed)
+        self.send_leo_response(head=False)
     #@+node:EKR.20040517080250.33: *3* query
     def query(self, parsedQuery):
         """Returns the QUERY dictionary, similar to the result of cgi.parse_qs
@@ -1096,93 +1080,130 @@ class RequestHandler(
             else:
                 res[item] = value[0] if value else ''
         return res
-    #@+node:EKR.20040517080250.34: *3* handle_data
-    def handle_data(self):
-        """Class to override"""
-        f = self.send_head()
-        if f:
-            self.copyfile(f, self.wfile)
-    #@+node:ekr.20110522152535.18254: *3* handle_read_event (NEW)
-    def handle_read_event(self):
-        '''Over-ride SimpleHTTPRequestHandler.handle_read_event.'''
-        asynchat.async_chat.handle_read_event(self)
-    #@+node:EKR.20040517080250.35: *3* handle_request_line (aka found_terminator)
-    def handle_request_line(self):
-        """Called when the http request line and headers have been received"""
-        # prepare attributes needed in parse_request()
-        self.rfile = BytesIO(self.buffer.getvalue())
-        self.raw_requestline = self.rfile.readline()
-        self.parse_request()
-        # if there is a Query String, decodes it in a QUERY dictionary
-        self.path_without_qs, self.qs = self.path, ''
-        if self.path.find('?') >= 0:
-            self.qs = self.path[self.path.find('?') + 1:]
-            self.path_without_qs = self.path[: self.path.find('?')]
-        self.QUERY = self.query(cgi.parse_qs(self.qs, 1))
-        if self.command in ['GET', 'HEAD']:
-            # if method is GET or HEAD, call do_GET or do_HEAD and finish
-            method = "do_" + self.command
-            if hasattr(self, method):
-                f = getattr(self, method)
-                f()
-                self.finish()
-        elif self.command == "POST":
-            # if method is POST, call prepare_POST, don't finish before
-            self.prepare_POST()
-        else:
-            self.send_error(501, "Unsupported method (%s)" % self.command)
-    #@+node:ekr.20110522152535.18256: *3* found_terminator
-    def found_terminator(self):
-        # pylint: disable=method-hidden
-        # Control may be passed to another found_terminator.
-        self.handle_request_line()
-    #@+node:EKR.20040517080250.36: *3* finish
-    def finish(self):
-        """Reset terminator (required after POST method), then close"""
-        self.set_terminator(self.term)
-        self.wfile.initiate_sending()
-        # self.close()
+    #@+node:EKR.20040517080250.34: *3* send_leo_response
+    def send_leo_response(self, head):
+        """
+        Send the response computed by Leo's main thread.
+        Send the body in pieces, so large pages don't take much extra memory.
+        """
+        try:
+            response = self.server.call_in_main_thread(self.compute_response)
+        except concurrent.futures.TimeoutError:
+            response = error_response(503, "Leo is busy")
+        except Exception:
+            self.server.call_soon(g.es_print, traceback.format_exc())
+            response = error_response(500, "Internal error")
+        if response.code >= 400:
+            self.send_error(response.code, response.message)
+            return
+        self.send_response(response.code)
+        if response.etag:
+            self.send_header("ETag", response.etag)
+        if response.code == 304:
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = response.body
+        self.send_header("Content-type", response.mime_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if head:
+            return
+        view = memoryview(body)
+        for i in range(0, len(body), self.chunk_size):
+            self.wfile.write(view[i: i + self.chunk_size])
     #@-others
 #@+node:EKR.20040517080250.37: ** class Server
-class Server(asyncore.dispatcher):
-    """Copied from http_server in medusa"""
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """
+    An http server that handles each request in a separate thread.
+
+    Only Leo's main thread may access Leo's data. Request threads call
+    server.call_in_main_thread, and Leo's main thread calls
+    server.process_requests periodically.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+        # Don't wait for request threads when Leo exits.
+    request_queue_size = 1024
+    main_thread_timeout = 60
+        # Seconds to wait for Leo's main thread.
     #@+others
     #@+node:EKR.20040517080250.38: *3* __init__
     def __init__(self, ip, port, handler):
-        self.ip = ip
-        self.port = port
-        self.handler = handler
-        super().__init__()
-        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.set_reuse_addr()
-        self.bind((ip, port))
-        # lower this to 5 if your OS complains
-        self.listen(1024)
-    #@+node:EKR.20040517080250.39: *3* handle_accept
-    def handle_accept(self):
+        self.jobs = queue.Queue()
+            # (future, func, args) tuples for Leo's main thread.
+        self.thread = None
+        super().__init__((ip, port), handler)
+    #@+node:ekr.20190810064203.3: *3* server_bind
+    def server_bind(self):
+        """Over-ride HTTPServer.server_bind. Don't call socket.getfqdn: it can be slow."""
+        socketserver.TCPServer.server_bind(self)
+        self.server_name, self.server_port = self.server_address[: 2]
+    #@+node:ekr.20190810064203.9: *3* handle_error
+    def handle_error(self, request, client_address):
+        """Over-ride TCPServer.handle_error. Ignore clients that disconnect early."""
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+    #@+node:ekr.20190810064203.4: *3* call_in_main_thread & call_soon
+    def call_in_main_thread(self, func, *args):
+        """
+        Call func(*args) in Leo's main thread and return its result.
+        Wait at most main_thread_timeout seconds.
+        """
+        if threading.current_thread() is threading.main_thread():
+            return func(*args)
+        future = concurrent.futures.Future()
+        self.jobs.put((future, func, args))
         try:
-            # pylint: disable=unpacking-non-sequence
-            # The following except statements catch this.
-            conn, addr = self.accept()
-        except socket.error:
-            self.log_info('warning: server accept() threw an exception', 'warning')
-            return
-        except TypeError:
-            self.log_info('warning: server accept() threw EWOULDBLOCK', 'warning')
-            return
-        # creates an instance of the handler class to handle the request/response
-        # on the incoming connexion
-        self.handler(conn, addr, self)
+            return future.result(timeout=self.main_thread_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def call_soon(self, func, *args):
+        """Call func(*args) in Leo's main thread. Don't wait for the result."""
+        self.jobs.put((None, func, args))
+    #@+node:ekr.20190810064203.5: *3* process_requests
+    def process_requests(self):
+        """
+        Do all the work that request threads have passed to Leo's main thread.
+        Must be called only from Leo's main thread.
+        """
+        while True:
+            try:
+                future, func, args = self.jobs.get_nowait()
+            except queue.Empty:
+                return
+            if future is None:
+                try:
+                    func(*args)
+                except Exception:
+                    g.es_exception()
+            elif future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args))
+                except Exception as e:
+                    future.set_exception(e)
+    #@+node:ekr.20190810064203.6: *3* start & stop
+    def start(self):
+        """Start serving in a separate thread."""
+        self.thread = threading.Thread(
+            target=self.serve_forever, name='mod_http', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop serving and close the server's socket."""
+        self.shutdown()
+        self.server_close()
+        if config.server is self:
+            config.server = None
     #@-others
 #@+node:ekr.20140920145803.17997: ** functions
-#@+node:EKR.20040517080250.47: *3* a_read (asynchore override)
-def a_read(obj):
-    try:
-        obj.handle_read_event()
-    except asyncore.ExitNow:
-        raise
-    except Exception:
-        obj.handle_error()
+#@+node:ekr.20190810064203.7: *3* error_response
+def error_response(code, message):
+    """Return a g.Bunch describing an http error."""
+    return g.Bunch(body=b'', code=code, etag=None, message=message, mime_type=None)
 #@+node:ekr.20110522152535.18252: *3* escape
 def escape(s):
     s = s.replace('&', "&amp;")
@@ -1217,67 +1238,12 @@ def escape(s):
     # s = g.toEncodedString(s,encoding=browser_encoding,reportErrors=False)
     # StringIO.write(self, s)
     return s
-#@+node:EKR.20040517080250.44: *3* loop (asynchore override)
-def loop(timeout=5.0, use_poll=0, map=None):
-    """
-    Override the loop function of asynchore.
-    We poll only until there is not read or
-    write request pending.
-    """
-    return poll(timeout)
 #@+node:bwmulder.20050322135114: *3* node_reference
 def node_reference(vnode):
     """
     Use by the rst3 plugin.
     """
     return leo_interface().node_reference(vnode)
-#@+node:EKR.20040517080250.40: *3* poll
-def poll(timeout=0.0):
-    global sockets_to_close
-    map = asyncore.socket_map
-    if not map:
-        return False
-    while 1:
-        r = []; w = []; e = []
-        for fd, obj in map.items():
-            if obj.readable():
-                r.append(fd)
-            if obj.writable():
-                w.append(fd)
-        if not sockets_to_close: # Set by writeable()
-            break
-        for s in sockets_to_close:
-            s.close()
-        sockets_to_close = []
-    if [] == r == w == e:
-        time.sleep(timeout)
-    else:
-        #@+<< try r, w, e = select.select >>
-        #@+node:EKR.20040517080250.41: *4* << try r, w, e = select.select >>
-        try:
-            r, w, e = select.select(r, w, e, timeout)
-        except select.error: # as err:
-            # if err[0] != EINTR:
-                # raise
-            # else:
-                # return False
-            return False # EKR: EINTR is undefined.
-        #@-<< try r, w, e = select.select >>
-    for fd in r:
-        #@+<< asyncore.read(map.get(fd)) >>
-        #@+node:EKR.20040517080250.42: *4* << asyncore.read(map.get(fd)) >>
-        obj = map.get(fd)
-        if obj is not None:
-            asyncore.read(obj)
-        #@-<< asyncore.read(map.get(fd)) >>
-    for fd in w:
-        #@+<< asyncore.write(map.get(fd)) >>
-        #@+node:EKR.20040517080250.43: *4* << asyncore.write(map.get(fd)) >>
-        obj = map.get(fd)
-        if obj is not None:
-            asyncore.write(obj)
-        #@-<< asyncore.write(map.get(fd)) >>
-    return len(r) > 0 or len(w) > 0
 #@+node:bwmulder.20050322132919: *3* rst_related functions
 #@+node:bwmulder.20050322132919.2: *4* get_http_attribute
 def get_http_attribute(p):
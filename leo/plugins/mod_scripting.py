@@ -368,10 +368,10 @@ class AtButtonCallback:
         
         gnx = self.gnx
         # First, search self.c for the gnx.
-        for p in self.c.all_positions():
-            if p.gnx == gnx:
-                script = self.controller.getScript(p)
-                return script
+        p = self.find_position(self.c, gnx)
+        if p:
+            script = self.controller.getScript(p)
+            return script
         # See if myLeoSettings.leo is open.
         for c in g.app.commanders():
             if c.shortFileName().endswith('myLeoSettings.leo'):
@@ -380,11 +380,19 @@ class AtButtonCallback:
             c = None
         if c:
             # Search myLeoSettings.leo file for the gnx.
-            for p in c.all_positions():
-                if p.gnx == gnx:
-                    script = self.controller.getScript(p)
-                    return script
+            p = self.find_position(c, gnx)
+            if p:
+                script = self.controller.getScript(p)
+                return script
         return self.script
+    #@+node:ekr.20190809070415.2: *4* AtButtonCallback.find_position
+    def find_position(self, c, gnx):
+        '''Return a position of the node in c with the given gnx, or None.'''
+        v = c.fileCommands.gnxDict.get(gnx)
+        if not v:
+            return None
+        p = c.vnode2position(v)
+        return p if p and c.positionExists(p) else None
     #@-others
 #@+node:ekr.20060328125248.6: ** class ScriptingController
 class ScriptingController:
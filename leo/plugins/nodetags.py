@@ -27,6 +27,15 @@ the following API::
         remove the tag 'baz' from p if it is in the tag list
 
 Internally, tags are stored in `p.v.unknownAttributes['__node_tags']` as a set.
+The controller keeps an index of the gnxs of the nodes having each tag, and a
+sorted list of all tags, so queries take time proportional to the number of
+matches, not the size of the outline. The index is cached in c.db.
+
+The first query after a paste, import, undo, redo or execute-script command, or
+after a change to the outline's structure, rebuilds the index, so it finds
+tagged nodes added by pasting, importing or scripts. A script that changes
+`__node_tags` of existing nodes directly and then queries tags before it ends
+should call tc.initialize_taglist() first.
 
 UI
 ==
@@ -98,6 +107,8 @@ whitespace (calling .strip()).
 #@+node:peckj.20140804103733.9241: ** << imports >>
 import leo.core.leoGlobals as g
 import leo.core.leoNodes as leoNodes
+import bisect
+import os
 import re
 from leo.core.leoQt import QtWidgets, QtCore
 #@-<< imports >>
@@ -125,6 +136,10 @@ def onCreate (tag, keys):
 class TagController:
     
     TAG_LIST_KEY = '__node_tags'
+    CACHE_KEY = 'nodetags-index'
+    RESCAN_COMMANDS = ('execute-script', 'import', 'paste', 'redo', 'undo')
+        # The prefixes of the commands that can change tags
+        # without calling add_tag or remove_tag.
 
     #@+others
     #@+node:peckj.20140804103733.9262: *3* tag_c.__init__
@@ -132,56 +147,217 @@ class TagController:
         
         self.c = c
         self.taglist = []
-        self.initialize_taglist()
+            # A sorted list of all tags.
+        self.tag_gnxes = {}
+            # Keys are tags, values are sets of the gnxs of tagged nodes.
+        self.index_state = None
+            # The state of the outline when the index was created.
+        self.stale = False
+            # True: a command in RESCAN_COMMANDS has run since the index was created.
+        self.initialize_taglist(use_cache=True)
         c.theTagController = self
-        self.ui = LeoTagWidget(c)
-        c.frame.log.createTab('Tags', widget=self.ui)
-        self.ui.update_all()
+        g.registerHandler('command2', self.command2_hook)
+        g.registerHandler('save2', self.save2_hook)
+        if QtWidgets and g.app.gui.guiName().startswith('qt'):
+            self.ui = LeoTagWidget(c)
+            c.frame.log.createTab('Tags', widget=self.ui)
+            self.ui.update_all()
+        else:
+            self.ui = None
     #@+node:peckj.20140804103733.9263: *3* tag_c.initialize_taglist
-    def initialize_taglist(self):
-        taglist = []
-        for p in self.c.all_unique_positions():
-            for tag in self.get_tags(p):
-                if tag not in taglist:
-                    taglist.append(tag)
-        self.taglist = taglist
+    def initialize_taglist(self, use_cache=False):
+        '''
+        Create the tag index, from c.db if use_cache is True and the outline
+        has not changed since the index was cached.
+        
+        Call this method after changing tags without using add_tag and remove_tag.
+        '''
+        if use_cache and self.load_index():
+            self.index_state, self.stale = self.outline_state(), False
+            return
+        self.scan_outline()
+        self.save_index()
+    #@+node:ekr.20190812063417.1: *3* tag_c.index
+    #@+node:ekr.20190812063417.2: *4* tag_c.add_to_index & remove_from_index
+    def add_to_index(self, tag, gnx):
+        '''Add the node with the given gnx to the index for tag.'''
+        gnxes = self.tag_gnxes.get(tag)
+        if gnxes is None:
+            gnxes = self.tag_gnxes[tag] = set()
+            bisect.insort(self.taglist, tag)
+        gnxes.add(gnx)
 
+    def remove_from_index(self, tag, gnx):
+        '''Remove the node with the given gnx from the index for tag.'''
+        gnxes = self.tag_gnxes.get(tag)
+        if gnxes is None:
+            return
+        gnxes.discard(gnx)
+        if not gnxes:
+            # The tag is no longer used.
+            del self.tag_gnxes[tag]
+            i = bisect.bisect_left(self.taglist, tag)
+            if i < len(self.taglist) and self.taglist[i] == tag:
+                del self.taglist[i]
+    #@+node:ekr.20190825062512.3: *4* tag_c.check_index & outline_state
+    def check_index(self):
+        '''
+        Rebuild the index if a command in RESCAN_COMMANDS has run or if the
+        outline's structure has changed since the index was created.
+        '''
+        if self.stale or self.index_state != self.outline_state():
+            self.scan_outline()
+
+    def outline_state(self):
+        '''Return a value that changes when nodes are added to the outline.'''
+        c = self.c
+        return c.frame.tree.generation, len(c.fileCommands.gnxDict)
+    #@+node:ekr.20190825062512.4: *4* tag_c.scan_outline
+    def scan_outline(self):
+        '''Create the index from the tags of all nodes.'''
+        c = self.c
+        self.index_state, self.stale = self.outline_state(), False
+        self.taglist, self.tag_gnxes = [], {}
+        for v in c.all_unique_nodes():
+            for tag in v.u.get(self.TAG_LIST_KEY, []):
+                self.add_to_index(tag, v.gnx)
+    #@+node:ekr.20190812063417.3: *4* tag_c.in_outline
+    def in_outline(self, v):
+        '''
+        Return True if v is in the outline.
+        
+        The index retains deleted nodes, so undoing a delete needs no work.
+        '''
+        root = self.c.hiddenRootNode
+        seen, todo = set(), [v]
+        while todo:
+            v = todo.pop()
+            if v is root:
+                return True
+            if id(v) not in seen:
+                seen.add(id(v))
+                todo.extend(v.parents)
+        return False
+    #@+node:ekr.20190812063417.4: *4* tag_c.index_key, load_index & save_index
+    def index_key(self):
+        '''Return the key that validates the cached index, or None.'''
+        fn = self.c.fileName()
+        if not fn or not g.os_path_exists(fn):
+            return None
+        return fn, g.os_path_getmtime(fn), os.path.getsize(fn)
+
+    def load_index(self):
+        '''Load the index from c.db. Return True if the cached index is valid.'''
+        c = self.c
+        key = self.index_key()
+        if not key or c.changed:
+            return False
+        try:
+            data = c.db.get(self.CACHE_KEY)
+        except Exception:
+            data = None
+        if not data or data.get('key') != key:
+            return False
+        gnxDict = c.fileCommands.gnxDict
+        self.tag_gnxes = {}
+        for tag, gnxes in data.get('tags', {}).items():
+            gnxes = set(z for z in gnxes if z in gnxDict)
+            if gnxes:
+                self.tag_gnxes[tag] = gnxes
+        self.taglist = sorted(self.tag_gnxes)
+        return True
+
+    def save_index(self):
+        '''Save the index in c.db if the outline has been saved.'''
+        c = self.c
+        key = self.index_key()
+        if not key or c.changed:
+            return
+        gnxDict = c.fileCommands.gnxDict
+        tags = {}
+        for tag, gnxes in self.tag_gnxes.items():
+            # Deleted nodes are not in the saved outline.
+            gnxes = [z for z in gnxes if z in gnxDict and self.in_outline(gnxDict[z])]
+            if gnxes:
+                tags[tag] = gnxes
+        try:
+            c.db[self.CACHE_KEY] = {'key': key, 'tags': tags}
+        except Exception:
+            g.es_exception()
+    #@+node:ekr.20190812063417.5: *4* tag_c.matching_tags
+    def matching_tags(self, pattern):
+        '''
+        Return the list of tags matching the given pattern, with * as a wildcard.
+        
+        Only the tags starting with the pattern's literal prefix are searched.
+        '''
+        pattern = pattern.replace('*', '.*')
+        regex = re.compile(pattern)
+        prefix = []
+        if '|' not in pattern:
+            for ch in pattern:
+                if ch in '.^$*+?{}[]\\()':
+                    if ch in '*?{' and prefix:
+                        prefix.pop()
+                            # The previous character is optional.
+                    break
+                prefix.append(ch)
+        prefix = ''.join(prefix)
+        result = []
+        taglist = self.taglist
+        i = bisect.bisect_left(taglist, prefix)
+        while i < len(taglist) and taglist[i].startswith(prefix):
+            if regex.match(taglist[i]):
+                result.append(taglist[i])
+            i += 1
+        return result
+    #@+node:ekr.20190812063417.6: *4* tag_c.command2_hook & save2_hook
+    def command2_hook(self, tag, keywords):
+        '''Rebuild the index when it is next used if the command can change tags.'''
+        label = keywords.get('label') or ''
+        if keywords.get('c') == self.c and label.startswith(self.RESCAN_COMMANDS):
+            self.stale = True
+
+    def save2_hook(self, tag, keywords):
+        '''Cache the index after saving the outline.'''
+        if keywords.get('c') == self.c:
+            self.save_index()
     #@+node:peckj.20140804103733.9264: *3* tag_c.outline-level
     #@+node:peckj.20140804103733.9268: *4* tag_c.get_all_tags
     def get_all_tags(self):
         ''' return a list of all tags in the outline '''
+        self.check_index()
         return self.taglist
     #@+node:peckj.20140804103733.9267: *4* tag_c.update_taglist
     def update_taglist(self, tag):
         ''' ensures the outline's taglist is consistent with the state of the nodes in the outline '''
-        if tag not in self.taglist:
-            self.taglist.append(tag)
-        nodelist = self.get_tagged_nodes(tag)
-        if not nodelist:
-            self.taglist.remove(tag)
-        self.ui.update_all()
+        # add_tag and remove_tag keep the index up to date.
+        if self.ui:
+            self.ui.update_all()
     #@+node:peckj.20140804103733.9258: *4* tag_c.get_tagged_nodes
     def get_tagged_nodes(self, tag):
         ''' return a list of *positions* of nodes containing the tag, with * as a wildcard '''
+        c = self.c
+        gnxDict = c.fileCommands.gnxDict
         nodelist = []
-        # replace * with .* for regex compatibility
-        tag = tag.replace('*', '.*')
-        regex = re.compile(tag)
-        for p in self.c.all_unique_positions():
-            for tag in self.get_tags(p):
-                if regex.match(tag):
-                    nodelist.append(p.copy())
-                    break
+        for gnx in self.get_tagged_gnxes(tag):
+            p = c.vnode2position(gnxDict[gnx])
+            if p:
+                nodelist.append(p)
+        # Return the positions in outline order.
+        nodelist.sort(key=lambda p: p.sort_key(p))
         return nodelist
     #@+node:vitalije.20170811150914.1: *4* tag_c.get_tagged_gnxes
     def get_tagged_gnxes(self, tag):
-        c = self.c
-        tag = tag.replace('*', '.*')
-        regex = re.compile(tag)
-        for p in c.all_unique_positions():
-            for t in self.get_tags(p):
-                if regex.match(t):
-                    yield p.v.gnx
+        self.check_index()
+        gnxDict = self.c.fileCommands.gnxDict
+        gnxes = set()
+        for t in self.matching_tags(tag):
+            gnxes |= self.tag_gnxes[t]
+        for gnx in gnxes:
+            v = gnxDict.get(gnx)
+            if v and self.in_outline(v):
+                yield gnx
     #@+node:peckj.20140804103733.9265: *3* tag_c.individual nodes
     #@+node:peckj.20140804103733.9259: *4* tag_c.get_tags
     def get_tags(self, p):
@@ -197,6 +373,7 @@ class TagController:
         tags = set(p.v.u.get(self.TAG_LIST_KEY, set([])))
         tags.add(tag)
         p.v.u[self.TAG_LIST_KEY] = tags
+        self.add_to_index(tag, p.v.gnx)
         self.c.setChanged(True)
         self.update_taglist(tag)
     #@+node:peckj.20140804103733.9261: *4* tag_c.remove_tag
@@ -207,6 +384,7 @@ class TagController:
             # in case JSON storage (leo_cloud plugin) converted to list.
         if tag in tags:
             tags.remove(tag)
+            self.remove_from_index(tag, v.gnx)
         if tags:
             v.u[self.TAG_LIST_KEY] = tags
         else:
@@ -443,7 +621,6 @@ if QtWidgets:
                 'paste-retaining-clones',
             ]
             if keywords.get('label') in paste_cmds:
-                self.tc.initialize_taglist()
                 self.update_all()
         #@+node:tbnorth.20170313095036.1: *5* tag_w.sf.find_setting
         #Plugins:2-->User interface:21-->@file settings_finder.py:11-->class SettingsFinder:2-->sf.find_setting:5
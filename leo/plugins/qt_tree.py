@@ -219,7 +219,7 @@ class LeoQtTree(leoFrame.LeoTree):
             v = p.v
             if (v.children and (
                 # Use slower test for clones:
-                len(v.parents) > 1 and p in v.expandedPositions or
+                len(v.parents) > 1 and p.key() in v.expandedPositions or
                 # Use a quick test for non-clones:
                 len(v.parents) <= 1  and (v.statusBits & v.expandedBit) != 0
             )):
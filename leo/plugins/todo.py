@@ -483,7 +483,8 @@ class todoController:
     @redrawer
     def loadAllIcons(self, tag=None, k=None, clear=None):
         """Load icons to represent cleo state"""
-        for p in self.c.all_positions():
+        # Icons are set on vnodes, so clones need be visited only once.
+        for p in self.c.all_unique_positions():
             self.loadIcons(p, clear=clear)
     #@+node:tbrown.20090119215428.16: *3* loadIcons
     @redrawer
@@ -557,6 +558,7 @@ class todoController:
         ):
 
             del node.unknownAttributes[udict]
+            self.invalidate_totals(node)
     #@+node:tbrown.20090119215428.21: *4* hasUD
     def hasUD (self,node,udict="annotate"):
 
@@ -622,6 +624,10 @@ class todoController:
 
         isDefault = self.testDefault(attrib, val)
 
+        if attrib in ('progress', 'time_req') and self.getat(node, attrib) != val:
+            # The next recalc_time recalculates node and its ancestors.
+            self.invalidate_totals(node)
+
         if (not hasattr(node,'unknownAttributes') or
             "annotate" not in node.unknownAttributes or
             not isinstance(node.unknownAttributes["annotate"], dict)
@@ -689,7 +695,7 @@ class todoController:
     def clear_all(self, recurse=False, all=False):
 
         if all:
-            what = self.c.all_positions()
+            what = self.c.all_unique_positions()
         elif recurse:
             what = self.c.currentPosition().self_and_subtree()
         else:
@@ -732,15 +738,25 @@ class todoController:
             self.setat(v, 'progress', 0)
     #@+node:tbrown.20090119215428.34: *4* show_times
     @redrawer
-    def show_times(self, p=None, show=False):
+    def show_times(self, p=None, show=False, vnodes=None):
+        """Show or hide the times in the headlines of p and its descendants.
+        If vnodes is not None, update only the headlines of those vnodes."""
 
         def rnd(x): return re.sub('.0$', '', '%.1f' % x)
 
         if p is None:
             p = self.c.currentPosition()
 
-        for nd in p.self_and_subtree():
-            self.c.setHeadString(nd, re.sub(' <[^>]*>$', '', nd.headString()))
+        if vnodes is None:
+            positions = p.self_and_subtree()
+        else:
+            # Headlines belong to vnodes, so any position will do.
+            positions = [self.c.vnode2position(v) for v in vnodes]
+
+        for nd in positions:
+            if not nd:
+                continue
+            h = re.sub(' <[^>]*>$', '', nd.headString())
 
             tr = self.getat(nd.v, 'time_req')
             pr = self.getat(nd.v, 'progress')
@@ -759,22 +775,60 @@ class todoController:
                 ans += '>'
 
                 if show:
-                    self.c.setHeadString(nd, nd.headString()+ans)
+                    h = h + ans
                 self.loadIcons(nd)  # update progress icon
 
-    #@+node:tbrown.20090119215428.35: *4* recalc_time
+            if h != nd.headString():
+                # Don't dirty nodes whose times have not changed.
+                # Like c.setHeadString, but times don't affect @path
+                # directives, so descendant @<file> nodes stay clean.
+                nd.initHeadString(h)
+                nd.setDirty(setDescendentsDirty=False)
+                self.c.frame.tree.setHeadline(nd, h)
+
+    #@+node:tbrown.20090119215428.35: *4* recalc_time & helpers
     def recalc_time(self, p=None, clear=False):
+        """Recalculate time_req and progress for p and its descendants.
+        Return (time_totl, time_done) for p.
+
+        Only nodes whose time_req, progress or children have changed are
+        recalculated, along with their ancestors."""
 
         if p is None:
             p = self.c.currentPosition()
 
+        if clear:
+            totals = [self.recalc_time(cn.copy(), clear) for cn in p.children()]
+            return self.recalc_node(p.v, totals, clear)
+
+        return self.recalc_project(p)[0]
+    #@+node:ekr.20190825062512.11: *5* recalc_project
+    def recalc_project(self, p):
+        """Recalculate time_req and progress for p and its descendants.
+        Return ((time_totl, time_done), vnodes), where vnodes is the list
+        of the vnodes whose totals changed.
+
+        The whole subtree is checked only if the outline's structure has
+        changed since the last call for p."""
+
         v = p.v
+        generation = self.c.frame.tree.generation
+        verify = getattr(v, '_cached_generation', None) != generation
+        seen = {}
+        totals = self.recalc_vnode(v, seen, verify)[0]
+        v._cached_generation = generation
+        return totals, [z for z in seen if seen[z][1]]
+    #@+node:ekr.20190820062512.1: *5* recalc_node
+    def recalc_node(self, v, totals, clear=False):
+        """Set time_req and progress for v from the totals of its children.
+        totals is a list of (time_totl, time_done), one for each child.
+        Return (time_totl, time_done) for v."""
+
         time_totl = None
         time_done = None
 
         # get values from children, if any
-        for cn in p.children():
-            ans = self.recalc_time(cn.copy(), clear)
+        for ans in totals:
             if time_totl is None:
                 time_totl = ans[0]
             else:
@@ -813,6 +867,66 @@ class todoController:
                     self.setat(v, 'progress', 0)
 
         return (time_totl, time_done)
+    #@+node:ekr.20190820062512.2: *5* recalc_vnode
+    def recalc_vnode(self, v, seen, verify=False):
+        """Return ((time_totl, time_done), changed) for v.
+
+        v._cached_totals is (children, own, (time_totl, time_done)), where
+        children is the list of the gnx's of v.children and own is v's own
+        (time_req, progress) when the totals were calculated.
+        invalidate_totals sets children to None for a changed node and its
+        ancestors, so valid totals are used without visiting v's subtree.
+
+        If verify is True, the whole subtree is visited, and the cache is
+        used only if children and own are unchanged. This notices structure
+        changes and changes made by other code writing v.u['annotate'].
+
+        seen contains the results for vnodes already visited, so clones are
+        visited only once."""
+
+        if v in seen:
+            return seen[v]
+        cached = getattr(v, '_cached_totals', None)
+        if cached and cached[0] is not None and not verify:
+            seen[v] = result = cached[2], False
+            return result
+        results = [self.recalc_vnode(child, seen, verify) for child in v.children]
+        children = [z.gnx for z in v.children]
+        if (cached and cached[0] == children and cached[1] == self.own_times(v) and
+            not any(z[1] for z in results)
+        ):
+            result = cached[2], False
+        else:
+            totals = self.recalc_node(v, [z[0] for z in results])
+            # Set the cache *after* recalc_node calls setat.
+            v._cached_totals = children, self.own_times(v), totals
+            result = totals, cached is None or cached[2] != totals
+        seen[v] = result
+        return result
+    #@+node:ekr.20190825062512.12: *5* invalidate_totals
+    def invalidate_totals(self, v):
+        """Mark the cached totals of v and its ancestors as invalid.
+        The old totals are kept, so recalc_vnode can tell if they change."""
+
+        seen, todo = set(), [v]
+        while todo:
+            v = todo.pop()
+            if v in seen:
+                continue
+            seen.add(v)
+            cached = getattr(v, '_cached_totals', None)
+            if cached:
+                v._cached_totals = None, cached[1], cached[2]
+            todo.extend(v.parents)
+    #@+node:ekr.20190825062512.8: *5* own_times
+    def own_times(self, v):
+        """Return (time_req, progress) as stored in v.u['annotate']."""
+
+        d = getattr(v, 'unknownAttributes', None)
+        d = d and d.get('annotate')
+        if not isinstance(d, dict):
+            return None, None
+        return d.get('time_req'), d.get('progress')
     #@+node:tbrown.20090119215428.36: *4* clear_time_req
     @redrawer
     @projectChanger
@@ -837,10 +951,14 @@ class todoController:
                 project = nd.copy()
 
         if project:
-            self.recalc_time(project)
+            totals, vnodes = self.recalc_project(project)
             if project.headString().find('@project time') > -1:
-                self.show_times(project, show=True)
+                if not getattr(project.v, '_cached_shown', False):
+                    vnodes = None  # Show all times the first time.
+                self.show_times(project, show=True, vnodes=vnodes)
+                project.v._cached_shown = True
             else:
+                project.v._cached_shown = False
                 self.show_times(p, show=True)
         else:
             self.show_times(p, show=False)
@@ -17,6 +17,16 @@ class BaseWriter:
         at = self.at
         at.os(s[: -1] if s.endswith('\n') else s)
         at.onl()
+    #@+node:ekr.20190824062512.10: ** basewriter.put_chunks
+    def put_chunks(self, chunks):
+        '''
+        Write all strings in chunks, an iterable, using at.os, then write a
+        newline. Unlike put, this does not need the entire text at once.
+        '''
+        at = self.at
+        for s in chunks:
+            at.os(s)
+        at.onl()
     #@+node:ekr.20150626092140.1: ** basewriter.put_node_sentinel
     def put_node_sentinel(self, p, delim, delim2=''):
         '''Put an @+node sentinel for node p.'''
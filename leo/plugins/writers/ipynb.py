@@ -61,13 +61,10 @@ class Export_IPYNB(basewriter.BaseWriter):
         self.root = root
         try:
             nb = self.make_notebook()
-            s = self.convert_notebook(nb)
+            self.put_chunks(self.iterencode_notebook(nb))
         except Exception:
             g.es_exception()
             return False
-        if not s:
-            return False
-        self.put(g.toUnicode(s))
         return True
     #@+node:ekr.20180409081735.1: *3* ipy_w.cell_type
     def cell_type(self, p):
@@ -146,6 +143,14 @@ class Export_IPYNB(basewriter.BaseWriter):
         if key:
             return d.get(key)
         return d
+    #@+node:ekr.20190824062512.11: *3* ipy_w.iterencode_notebook
+    def iterencode_notebook(self, nb):
+        '''Like convert_notebook, but yield the json text in chunks.'''
+        # Do *not* catch exceptions here.
+        encoder = json.JSONEncoder(
+            sort_keys=True,
+            indent=4, separators=(',', ': '))
+        return encoder.iterencode(nb)
     #@+node:ekr.20180407191219.1: *3* ipy_w.make_notebook
     def make_notebook(self):
         '''Create a JSON notebook'''
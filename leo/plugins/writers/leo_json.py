@@ -24,11 +24,11 @@ class JSON_Writer(basewriter.BaseWriter):
         }
         # pylint: disable=no-member
         # pylint confuses this module with the stdlib json module
-        s = json.dumps(d,
+        encoder = json.JSONEncoder(
             sort_keys=True,
             indent=2, # Pretty print.
             separators=(',', ': '))
-        self.put(s)
+        self.put_chunks(encoder.iterencode(d))
         root.setVisited()
         return True
     #@+node:ekr.20160504085408.1: *3* json.vnode_dict
@@ -0,0 +1,102 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20190824062512.13: * @file ../test/at-auto-write-benchmark.py
+'''
+Benchmark writing a large @auto-md node.
+
+Usage: python at-auto-write-benchmark.py [number of nodes] [lines per node]
+
+The defaults are 5000 nodes with 20 lines each. The file is written
+twice, so the second write finds the file unchanged.
+
+Writes are timed, and their peak memory measured, with at.writeAtAutoStream
+and with at.replaceFile, which keeps both the old and new contents of the
+file in memory.
+'''
+# pylint: disable=invalid-name
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# Switches...
+n_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+n_lines = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+# Import stuff...
+leo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if leo_dir not in sys.path:
+    sys.path.insert(0, leo_dir)
+import leo.core.leoBridge as leoBridge
+controller = leoBridge.controller(
+    gui='nullGui',
+    loadPlugins=False,
+    readSettings=False,
+    silent=True,
+    verbose=False)
+g = controller.globals()
+c = controller.openLeoFile(None)
+#@+others
+#@+node:ekr.20190824062512.14: ** create
+def create(fileName):
+    '''Create an @auto-md node with n_nodes children.'''
+    root = c.rootPosition()
+    root.h = '@auto-md %s' % fileName
+    line = 'A line of text in a very large markdown file.\n'
+    for i in range(n_nodes):
+        child = root.insertAsLastChild()
+        child.h = 'node %s' % i
+        child.b = line * n_lines
+    return root
+#@+node:ekr.20190824062512.15: ** old_write
+def old_write(root):
+    '''Emulate at.writeOneAtAutoNode before at.writeAtAutoStream.'''
+    at = c.atFileCommands
+    fileName = at.initWriteIvars(root, root.atAutoNodeName(),
+        defaultDirectory = g.setDefaultDirectory(c, root, importing=True),
+        sentinels=False,
+    )
+    if not at.precheck(fileName, root):
+        return False
+    if c.persistenceController:
+        c.persistenceController.update_before_write_foreign_file(root)
+    contents = at.writeAtAutoContents(fileName, root)
+    at.replaceFile(contents, at.encoding, fileName, root)
+    return True
+#@+node:ekr.20190824062512.16: ** run
+def run(name, write, root):
+    '''Time two writes of root and measure their peak memory.'''
+    fileName = root.atAutoNodeName()
+    for kind in ('changed', 'unchanged'):
+        if kind == 'changed' and os.path.exists(fileName):
+            os.remove(fileName)
+        tracemalloc.start()
+        t1 = time.perf_counter()
+        ok = write(root)
+        t2 = time.perf_counter()
+        junk, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert ok, name
+        print('%6s: %9s %6.2f sec. peak memory: %6.1f MB' % (
+            name, kind, t2 - t1, peak / 1024 / 1024))
+    with open(fileName, 'rb') as f:
+        return f.read()
+#@+node:ekr.20190824062512.17: ** main
+def main():
+    if not g.app.writersDispatchDict:
+        g.app.loadManager.createAllImporetersData()
+    directory = tempfile.mkdtemp()
+    try:
+        root = create(os.path.join(directory, 'benchmark.md'))
+        contents1 = run('stream', c.atFileCommands.writeOneAtAutoNode, root)
+        contents2 = run('old', old_write, root)
+        assert contents1 == contents2
+        print('file size: %6.1f MB' % (len(contents1) / 1024 / 1024))
+    finally:
+        shutil.rmtree(directory)
+#@-others
+main()
+#@@language python
+#@@tabwidth -4
+#@-leo
@@ -0,0 +1,105 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20190822062512.11: * @file ../test/bulk-edit-benchmark.py
+'''
+Benchmark structural changes made one at a time and within c.bulkEdit.
+
+Usage: python bulk-edit-benchmark.py [number of nodes]
+
+The default is 1000 nodes. The script inserts the nodes in an @file tree,
+moves them, then deletes half of them. Each change creates an undo bead and
+redraws the screen, as Leo's commands do. The changes are timed as they
+are, then within c.bulkEdit.
+'''
+# pylint: disable=invalid-name
+import os
+import sys
+import time
+
+# Switches...
+n_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+
+# Import stuff...
+leo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if leo_dir not in sys.path:
+    sys.path.insert(0, leo_dir)
+import leo.core.leoBridge as leoBridge
+controller = leoBridge.controller(
+    gui='nullGui',
+    loadPlugins=False,
+    readSettings=False,
+    silent=True,
+    verbose=False)
+g = controller.globals()
+c = controller.openLeoFile(None)
+#@+others
+#@+node:ekr.20190822062512.12: ** create
+def create(name):
+    '''Create an @file node with two organizer nodes.'''
+    root = c.lastTopLevel().insertAfter()
+    root.h = '@file %s.py' % name
+    root.insertAsLastChild().h = 'target'
+    root.insertAsLastChild().h = 'source'
+    return root
+#@+node:ekr.20190822062512.13: ** edit
+def edit(root):
+    '''
+    Insert n_nodes children of root, move them, then delete every other
+    one, as undoable commands do.
+    '''
+    u = c.undoer
+    source = root.getLastChild()
+    for i in range(n_nodes):
+        undoData = u.beforeInsertNode(source)
+        p = source.insertAsLastChild()
+        p.h = 'node %s' % i
+        p.setDirty()
+        u.afterInsertNode(p, 'Insert Node', undoData)
+        c.redraw(p)
+    target = root.firstChild()
+    while source.hasChildren():
+        p = source.firstChild()
+        undoData = u.beforeMoveNode(p)
+        p.moveToLastChildOf(target)
+        p.setDirty()
+        u.afterMoveNode(p, 'Move Node', undoData)
+        c.redraw(p)
+    p = target.firstChild()
+    while p:
+        next = p.next()
+        if next:
+            undoData = u.beforeDeleteNode(next)
+            next.doDelete(newNode=p)
+            u.afterDeleteNode(p, 'Delete Node', undoData)
+            c.redraw(p)
+        p.moveToNext()
+    return [z.h for z in target.children()]
+#@+node:ekr.20190822062512.14: ** run
+def run(name, bulk):
+    '''Time the changes to a new @file node.'''
+    root = create(name)
+    c.selectPosition(root)
+    c.endEditing()
+    n_beads = len(c.undoer.beads)
+    t1 = time.perf_counter()
+    if bulk:
+        with c.bulkEdit('Bulk Edit'):
+            result = edit(root)
+    else:
+        result = edit(root)
+    t2 = time.perf_counter()
+    assert root.isDirty()
+    print('%8s: %6s nodes %8.2f sec. %5s undo beads' % (
+        name, n_nodes, t2 - t1, len(c.undoer.beads) - n_beads))
+    c.undoer.clearUndoState()
+    return result
+#@+node:ekr.20190822062512.15: ** main
+def main():
+    result1 = run('per-node', bulk=False)
+    result2 = run('bulk', bulk=True)
+    assert result1 == result2, (len(result1), len(result2))
+    assert len(result1) == (n_nodes + 1) // 2, len(result1)
+#@-others
+main()
+#@@language python
+#@@tabwidth -4
+#@-leo
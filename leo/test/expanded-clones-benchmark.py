@@ -0,0 +1,100 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20190817063012.2: * @file ../test/expanded-clones-benchmark.py
+'''
+Benchmark drawing an outline in which many clones are expanded.
+
+Usage: python expanded-clones-benchmark.py [number of clones] [number of redraws]
+
+The defaults are 500 clones and 10 redraws. Each clone has 10 children,
+and every clone is expanded.
+
+A redraw visits all visible positions, as the tree code does. Redraws are
+timed with v.expandedPositions and with the list of positions Leo used to
+keep, which was pruned and searched linearly.
+'''
+# pylint: disable=invalid-name
+import os
+import sys
+import time
+
+# Switches...
+n_clones = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+n_redraws = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+
+# Import stuff...
+leo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if leo_dir not in sys.path:
+    sys.path.insert(0, leo_dir)
+import leo.core.leoBridge as leoBridge
+controller = leoBridge.controller(
+    gui='nullGui',
+    loadPlugins=False,
+    readSettings=False,
+    silent=True,
+    verbose=False)
+g = controller.globals()
+c = controller.openLeoFile(None)
+#@+others
+#@+node:ekr.20190817063012.3: ** create
+def create():
+    '''Create n_clones expanded clones, each in its own organizer node.'''
+    root = c.rootPosition()
+    root.h = 'cloned'
+    for i in range(10):
+        root.insertAsLastChild().h = 'child %s' % i
+    for i in range(n_clones - 1):
+        organizer = c.lastTopLevel().insertAfter()
+        organizer.h = 'organizer %s' % i
+        root.clone().moveToLastChildOf(organizer)
+    for p in c.all_positions():
+        if p.hasChildren():
+            p.expand()
+    c.selectPosition(c.lastTopLevel())
+#@+node:ekr.20190817063012.4: ** old_should_be_expanded
+def old_should_be_expanded(p):
+    '''Emulate c.shouldBeExpanded with a list of expanded positions.'''
+    v = p.v
+    if not p.hasChildren():
+        return False
+    aList = [z for z in v.expandedPositions.values() if c.positionExists(z)]
+    if not p.isCloned():
+        return v.isExpanded()
+    if p.isAncestorOf(c.p):
+        return True
+    for p2 in aList:
+        if p == p2:
+            return True
+    return False
+#@+node:ekr.20190817063012.5: ** redraw
+def redraw(should_be_expanded):
+    '''Visit all visible positions. Return the number of positions.'''
+    n = 0
+    p = c.rootPosition()
+    while p:
+        n += 1
+        if should_be_expanded(p):
+            p.moveToFirstChild()
+        else:
+            p.moveToNodeAfterTree()
+    return n
+#@+node:ekr.20190817063012.6: ** run
+def run(name, should_be_expanded):
+    '''Time n_redraws redraws.'''
+    t1 = time.perf_counter()
+    for i in range(n_redraws):
+        n = redraw(should_be_expanded)
+    t2 = time.perf_counter()
+    print('%6s: %6s visible nodes %8.2f msec. per redraw' % (
+        name, n, 1000 * (t2 - t1) / n_redraws))
+    return n
+#@+node:ekr.20190817063012.7: ** main
+def main():
+    create()
+    n1 = run('dict', c.shouldBeExpanded)
+    n2 = run('list', old_should_be_expanded)
+    assert n1 == n2 == n_clones * 12 - 1, (n1, n2)
+#@-others
+main()
+#@@language python
+#@@tabwidth -4
+#@-leo
@@ -0,0 +1,111 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20190810064203.10: * @file ../test/mod-http-benchmark.py
+'''
+A load test for the mod_http plugin's server.
+
+Usage: python mod-http-benchmark.py [outline] [requests] [clients]
+
+The defaults are leo/doc/CheatSheet.leo, 1000 requests and 8 clients.
+
+The benchmark serves the outline from a leoBridge process. The main thread
+handles Leo's part of each request, as Leo's idle-time timer does. Each
+client uses a persistent connection. The benchmark reports requests/sec.
+for full pages and for conditional requests that get 304 responses.
+'''
+# pylint: disable=invalid-name
+import http.client
+import os
+import sys
+import threading
+import time
+import urllib.parse
+
+# Switches...
+leo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(leo_dir, 'leo', 'doc', 'CheatSheet.leo')
+n_requests = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+n_clients = int(sys.argv[3]) if len(sys.argv) > 3 else 8
+
+# Import stuff...
+if leo_dir not in sys.path:
+    sys.path.insert(0, leo_dir)
+import leo.core.leoBridge as leoBridge
+controller = leoBridge.controller(
+    gui='nullGui',
+    loadPlugins=False,
+    readSettings=False,
+    silent=True,
+    verbose=False)
+g = controller.globals()
+c = controller.openLeoFile(path)
+g.app.windowList.append(c.frame)
+    # The server finds outlines in g.app.windowList.
+import leo.plugins.mod_http as mod_http
+#@+others
+#@+node:ekr.20190810064203.11: ** client
+def client(port, url, n, etag, results):
+    '''Make n requests for url using a persistent connection.'''
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    headers = {'If-None-Match': etag} if etag else {}
+    statuses = []
+    for i in range(n):
+        conn.request('GET', url, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        statuses.append(response.status)
+    conn.close()
+    results.extend(statuses)
+#@+node:ekr.20190810064203.12: ** run
+def run(server, url, etag, kind):
+    '''Run the clients, handling requests in this thread until all are done.'''
+    results = []
+    n = max(1, n_requests // n_clients)
+    threads = [
+        threading.Thread(target=client, args=(server.server_port, url, n, etag, results))
+            for i in range(n_clients)]
+    t1 = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    while any(z.is_alive() for z in threads):
+        server.process_requests()
+        time.sleep(0.0005)
+    t2 = time.perf_counter()
+    statuses = sorted(set(results))
+    print('%12s: %5s requests, %6.3f sec., %8.1f requests/sec. status: %s' % (
+        kind, len(results), t2 - t1, len(results) / (t2 - t1), statuses))
+#@+node:ekr.20190810064203.13: ** main
+def main():
+    server = mod_http.Server('127.0.0.1', 0, mod_http.RequestHandler)
+    server.start()
+    url = '/' + urllib.parse.quote(c.frame.shortFileName())
+    # Make one request to get the ETag.
+    results = []
+    t1 = time.perf_counter()
+    thread = threading.Thread(target=lambda: results.append(
+        conditional_get(server.server_port, url)))
+    thread.start()
+    while thread.is_alive():
+        server.process_requests()
+        time.sleep(0.0005)
+    t2 = time.perf_counter()
+    etag, length = results[0]
+    print('%s: %s nodes, %s bytes, first request: %6.3f sec.' % (
+        c.shortFileName(), len(list(c.all_unique_positions())), length, t2 - t1))
+    print('%s clients' % n_clients)
+    run(server, url, None, 'full pages')
+    run(server, url, etag, 'unchanged')
+    server.stop()
+#@+node:ekr.20190810064203.14: ** conditional_get
+def conditional_get(port, url):
+    '''Return (etag, length) for url.'''
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    conn.request('GET', url)
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return response.getheader('ETag'), len(body)
+#@-others
+main()
+#@@language python
+#@@tabwidth -4
+#@-leo
@@ -0,0 +1,85 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20190804071205.9: * @file ../test/shadow-diff-benchmark.py
+'''
+Benchmark the diff algorithms used to update @shadow files.
+
+Usage: python shadow-diff-benchmark.py [number of lines]
+
+The default is 50000 lines.
+'''
+# pylint: disable=invalid-name
+import os
+import random
+import sys
+import time
+
+# Switches...
+n_lines = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+n_changes = 250 # The number of changed, inserted and deleted lines.
+seed = 1 # Makes runs comparable.
+
+# Import stuff...
+leo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if leo_dir not in sys.path:
+    sys.path.insert(0, leo_dir)
+import leo.core.leoBridge as leoBridge
+import leo.core.leoCompare as leoCompare
+
+controller = leoBridge.controller(
+    gui='nullGui',
+    loadPlugins=False,
+    readSettings=False,
+    silent=True,
+    verbose=False)
+g = controller.globals()
+c = controller.openLeoFile(None)
+x = c.shadowController
+#@+others
+#@+node:ekr.20190804071205.10: ** make_lines
+def make_lines():
+    '''
+    Return (new_public_lines, old_private_lines, marker).
+    Lines repeat, as they do in real source files.
+    '''
+    random.seed(seed)
+    marker = x.Marker(('#', '', ''))
+    old_private_lines, old_public_lines = [], []
+    for i in range(n_lines):
+        if i % 50 == 0:
+            old_private_lines.append('#@+node:ekr.1.%s: ** node %s\n' % (i, i))
+        line = '    line %s = %s\n' % (i % 1000, random.randint(0, 9))
+        old_private_lines.append(line)
+        old_public_lines.append(line)
+    new_public_lines = old_public_lines[:]
+    for i in range(n_changes):
+        n = random.randrange(len(new_public_lines))
+        kind = i % 3
+        if kind == 0:
+            new_public_lines[n] = 'changed line %s\n' % i
+        elif kind == 1:
+            new_public_lines.insert(n, 'inserted line %s\n' % i)
+        else:
+            del new_public_lines[n]
+    return new_public_lines, old_private_lines, marker
+#@+node:ekr.20190804071205.11: ** main
+def main():
+    new_public_lines, old_private_lines, marker = make_lines()
+    print('%s lines, %s changes' % (n_lines, n_changes))
+    expected = None
+    for algorithm in leoCompare.LineDiffer.algorithms:
+        x.shadow_diff = algorithm
+        t1 = time.process_time()
+        results = x.propagate_changed_lines(
+            new_public_lines, old_private_lines, marker)
+        t2 = time.process_time()
+        public_lines, junk = x.separate_sentinels(results, marker)
+        assert public_lines == new_public_lines, algorithm
+        if expected is None:
+            expected = results
+        print('%8s: %6.3f sec. %s' % (
+            algorithm, t2 - t1, 'same' if results == expected else 'different'))
+#@-others
+main()
+#@@language python
+#@@tabwidth -4
+#@-leo
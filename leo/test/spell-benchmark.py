@@ -0,0 +1,135 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20190812090318.7: * @file ../test/spell-benchmark.py
+'''
+Compare the latency of spelling suggestions from the deletion index with
+the suggestions from all edits of misspelled words.
+
+Usage: python spell-benchmark.py [dictionary] [n]
+
+The default dictionary is ~/.leo/main_spelling_dict.txt. Without it, the
+words of Leo's documentation and sources are used. n (default 20) long words
+are misspelled by replacing one letter and transposing two others.
+'''
+# pylint: disable=invalid-name
+import glob
+import os
+import random
+import re
+import sys
+import time
+
+# Switches...
+leo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+fn = sys.argv[1] if len(sys.argv) > 1 else os.path.expanduser('~/.leo/main_spelling_dict.txt')
+n_words = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+n_old = min(n_words, 5)
+    # The old algorithm can take seconds per word.
+
+# Import stuff...
+if leo_dir not in sys.path:
+    sys.path.insert(0, leo_dir)
+import leo.core.leoBridge as leoBridge
+controller = leoBridge.controller(
+    gui='nullGui',
+    loadPlugins=False,
+    readSettings=False,
+    silent=True,
+    verbose=False)
+g = controller.globals()
+import leo.commands.spellCommands as spellCommands
+#@+others
+#@+node:ekr.20190812090318.8: ** get_words
+def get_words():
+    '''Return (fn, words), where fn is None if words don't come from a dictionary file.'''
+    if os.path.exists(fn):
+        wrapper = spellCommands.DefaultWrapper.__new__(spellCommands.DefaultWrapper)
+        return fn, wrapper.read_words('main', fn)
+    words = set()
+    patterns = ('leo/doc/*.txt', 'leo/core/*.py', 'leo/plugins/*.py')
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(leo_dir, pattern)):
+            with open(path, 'rb') as f:
+                s = g.toUnicode(f.read())
+            words.update(re.findall(r'\b[a-zA-Z]{2,}\b', s))
+    return None, words
+#@+node:ekr.20190812090318.9: ** misspell
+def misspell(words):
+    '''Return a list of misspelled long words.'''
+    random.seed(1)
+    candidates = sorted(z for z in words if len(z) >= 10 and z.isalpha())
+    result = []
+    for word in random.sample(candidates, min(len(candidates), 4 * n_words)):
+        i = random.randrange(len(word))
+        word = word[:i] + random.choice('aeiouxyz') + word[i+1:]
+        j = random.randrange(len(word) - 1)
+        word = word[:j] + word[j+1] + word[j] + word[j+2:]
+        if word not in words:
+            result.append(word)
+        if len(result) == n_words:
+            break
+    return result
+#@+node:ekr.20190812090318.10: ** old_suggest
+def old_suggest(d, word):
+    '''The suggestions from all edits of word.'''
+
+    def known(words):
+        return [z for z in list(set(words)) if z in d.words]
+
+    return known(d.edits1(word)) or known(d.edits2(word))
+#@+node:ekr.20190825062512.13: ** case_only
+def case_only(d, word, result, old_result):
+    '''
+    Return True if the index's suggestions differ from the old ones only
+    because the edits insert and replace only lowercase letters.
+    '''
+    if not result:
+        return False
+    n = d.distance(word, result[0], d.max_distance)
+    if any(d.distance(word, z, d.max_distance) <= n and z not in result for z in old_result):
+        return False
+    missed = [z for z in result if z not in old_result]
+    return all(any(ch.isupper() for ch in z) for z in missed)
+#@+node:ekr.20190812090318.11: ** main
+def main():
+    path, words = get_words()
+    print('%s words from %s' % (len(words), path or 'Leo sources'))
+    d = spellCommands.DefaultDict()
+    d.add_words_from_dict('main', path, words)
+    t1 = time.perf_counter()
+    d.init_index()
+    t2 = time.perf_counter()
+    print('create index: %6.3f sec. %s keys' % (t2 - t1, len(d.index)))
+    if path:
+        d2 = spellCommands.DefaultDict()
+        d2.add_words_from_dict('main', path, words)
+        t1 = time.perf_counter()
+        d2.init_index()
+        t2 = time.perf_counter()
+        print('cached index: %6.3f sec.' % (t2 - t1))
+    misspelled = misspell(d.words)
+    t1 = time.perf_counter()
+    results = [d.suggest(z) for z in misspelled]
+    t2 = time.perf_counter()
+    print('index: %4s words %8.2f msec. per word' % (
+        len(misspelled), 1000 * (t2 - t1) / max(1, len(misspelled))))
+    t1 = time.perf_counter()
+    old_results = [sorted(set(old_suggest(d, z))) for z in misspelled[:n_old]]
+    t2 = time.perf_counter()
+    print('edits: %4s words %8.2f msec. per word' % (
+        n_old, 1000 * (t2 - t1) / max(1, n_old)))
+    n_case = 0
+    for word, result, old_result in zip(misspelled, results, old_results):
+        if result == old_result:
+            pass
+        elif case_only(d, word, result, old_result):
+            n_case += 1
+        else:
+            print('different suggestions for %s:\n%s\n%s' % (word, result, old_result))
+    if n_case:
+        print('%s of %s words get closer suggestions from the index: '
+            'the edits only use lowercase letters' % (n_case, n_old))
+#@-others
+main()
+#@@language python
+#@@tabwidth -4
+#@-leo
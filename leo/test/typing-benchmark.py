@@ -0,0 +1,90 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20190823062512.4: * @file ../test/typing-benchmark.py
+'''
+Benchmark typing in a deeply nested node that is cloned many times.
+
+Usage: python typing-benchmark.py [depth] [number of clones] [number of keystrokes]
+
+The defaults are a depth of 20, 100 clones and 200 keystrokes. Each clone
+is at the bottom of its own chain of depth organizer nodes below an @file
+node.
+
+Each keystroke calls LeoBody.onBodyChanged, as Leo's body pane does.
+Keystrokes are timed with c.setDirtyLater and with the code Leo used
+before, which called p.setAllAncestorAtFileNodesDirty for each keystroke.
+'''
+# pylint: disable=invalid-name
+import os
+import sys
+import time
+
+# Switches...
+depth = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+n_clones = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+n_keys = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+
+# Import stuff...
+leo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if leo_dir not in sys.path:
+    sys.path.insert(0, leo_dir)
+import leo.core.leoBridge as leoBridge
+controller = leoBridge.controller(
+    gui='nullGui',
+    loadPlugins=False,
+    readSettings=False,
+    silent=True,
+    verbose=False)
+g = controller.globals()
+c = controller.openLeoFile(None)
+#@+others
+#@+node:ekr.20190823062512.5: ** create
+def create():
+    '''Create n_clones clones, each at the bottom of a deep tree.'''
+    cloned = c.rootPosition()
+    cloned.h = 'cloned'
+    for i in range(n_clones):
+        p = c.lastTopLevel().insertAfter()
+        p.h = '@file typing-benchmark-%s.py' % i
+        for j in range(depth):
+            p = p.insertAsLastChild()
+            p.h = 'organizer %s' % j
+        cloned.clone().moveToLastChildOf(p)
+    # Type into the last clone.
+    p = c.lastTopLevel()
+    while p.hasChildren():
+        p.moveToLastChild()
+    c.selectPosition(p)
+    return p
+#@+node:ekr.20190823062512.6: ** old_setDirtyLater
+def old_setDirtyLater(v):
+    '''Emulate the code Leo used before c.setDirtyLater.'''
+    v.setDirty()
+    c.p.setAllAncestorAtFileNodesDirty()
+#@+node:ekr.20190823062512.7: ** run
+def run(name):
+    '''Time n_keys keystrokes in c.p.'''
+    w = c.frame.body.wrapper
+    body = c.frame.body
+    t1 = time.perf_counter()
+    for i in range(n_keys):
+        oldText = w.getAllText()
+        w.insert('end', 'x')
+        body.onBodyChanged('Typing', oldText=oldText)
+    c.redraw()
+    t2 = time.perf_counter()
+    assert all(p.isDirty() for p in c.all_unique_positions()
+        if p.isAnyAtFileNode())
+    print('%4s: %8.3f msec. per keystroke' % (name, 1000 * (t2 - t1) / n_keys))
+#@+node:ekr.20190823062512.8: ** main
+def main():
+    create()
+    c.setChanged(False)
+    run('new')
+    c.setChanged(False)
+    c.setDirtyLater = old_setDirtyLater
+    run('old')
+#@-others
+main()
+#@@language python
+#@@tabwidth -4
+#@-leo
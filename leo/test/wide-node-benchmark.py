@@ -0,0 +1,105 @@
+#@+leo-ver=5-thin
+#@+node:ekr.20190815064512.8: * @file ../test/wide-node-benchmark.py
+'''
+Benchmark outline operations on a node with many children.
+
+Usage: python wide-node-benchmark.py [number of children] [number of operations]
+
+The defaults are 50000 children and 200 operations of each kind.
+
+Lookups are timed with and without the map from children to their indices.
+'''
+# pylint: disable=invalid-name
+import os
+import random
+import sys
+import time
+
+# Switches...
+n_children = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+n_ops = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+seed = 1 # Makes runs comparable.
+
+# Import stuff...
+leo_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+if leo_dir not in sys.path:
+    sys.path.insert(0, leo_dir)
+import leo.core.leoBridge as leoBridge
+controller = leoBridge.controller(
+    gui='nullGui',
+    loadPlugins=False,
+    readSettings=False,
+    silent=True,
+    verbose=False)
+g = controller.globals()
+import leo.core.leoNodes as leoNodes
+c = controller.openLeoFile(None)
+parent = c.rootPosition()
+#@+others
+#@+node:ekr.20190815064512.9: ** create
+def create():
+    '''Create the children of the parent node.'''
+    parent.h = 'organizer'
+    t1 = time.perf_counter()
+    for i in range(n_children):
+        child = parent.insertAsLastChild()
+        child.h = 'child %s' % i
+    t2 = time.perf_counter()
+    print('%s children: %6.3f sec.' % (n_children, t2 - t1))
+#@+node:ekr.20190815064512.10: ** nth
+def nth():
+    '''Return a random child.'''
+    return parent.nthChild(random.randrange(parent.numberOfChildren()))
+#@+node:ekr.20190815064512.11: ** operations
+def select():
+    c.selectPosition(nth())
+
+def vnode2position():
+    p = nth()
+    assert c.vnode2position(p.v) == p
+
+def positionExists():
+    assert c.positionExists(nth())
+
+def insert():
+    nth().insertAfter()
+
+def move():
+    nth().moveToNthChildOf(parent, random.randrange(parent.numberOfChildren()))
+
+def moveAfter():
+    p, p2 = nth(), nth()
+    if p != p2:
+        p.moveAfter(p2)
+
+def delete():
+    p = nth()
+    if p.hasNext():
+        p.doDelete(newNode=p.next())
+    else:
+        p.doDelete()
+#@+node:ekr.20190815064512.12: ** run
+def run(name, f):
+    '''Time n_ops calls to f.'''
+    random.seed(seed)
+    t1 = time.perf_counter()
+    for i in range(n_ops):
+        f()
+    t2 = time.perf_counter()
+    print('%16s: %8.3f msec. per operation' % (name, 1000 * (t2 - t1) / n_ops))
+#@+node:ekr.20190815064512.13: ** main
+def main():
+    create()
+    threshold = leoNodes.VNode.childIndexThreshold
+    leoNodes.VNode.childIndexThreshold = n_children + n_ops + 1
+    run('vnode2position (no map)', vnode2position)
+    leoNodes.VNode.childIndexThreshold = threshold
+    for f in (vnode2position, positionExists, select, insert, move, moveAfter, delete):
+        run(f.__name__, f)
+    assert parent.numberOfChildren() == n_children
+    c.checkOutline()
+#@-others
+main()
+#@@language python
+#@@tabwidth -4
+#@-leo